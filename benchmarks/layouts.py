@@ -0,0 +1,106 @@
+"""
+benchmarks/layouts.py
+*********************
+Generate synthetic filesystem layouts for the benchmarks: deep project
+directory trees, VENV_DIR directories with many environments and wheel
+directories with many wheels.
+"""
+import os
+import zipfile
+
+
+def make_tree(root, depth, name='level'):
+    """
+    Create a directory tree depth levels deep under root
+
+    Args:
+        root: directory to create the tree in
+        depth: number of levels to create
+
+    Keyword Args:
+        name: prefix of the directory names for each level
+
+    Returns the path to the deepest directory
+    """
+    path = os.path.join(root, *['{}{}'.format(name, u) for u in range(depth)])
+    os.makedirs(path)
+    return path
+
+
+def make_virtualenv_dir(root, count, versions=('2.7', '3.6')):
+    """
+    Create a VENV_DIR style directory with count environments named
+    project<n>-<version>, each with an empty bin and site-packages folder
+
+    Args:
+        root: directory to create the environments in
+        count: total number of environments to create
+
+    Keyword Args:
+        versions: python versions to cycle through for the environments
+
+    Returns the list of environment names
+    """
+    names = []
+    for i in range(count):
+        version = versions[i % len(versions)]
+        name = 'project{}-{}'.format(i // len(versions), version)
+        os.makedirs(os.path.join(root, name, 'bin'))
+        os.makedirs(os.path.join(root, name, 'lib', 'python{}'.format(version), 'site-packages'))
+        names.append(name)
+    return names
+
+
+def make_wheel(wheels_dir, name, version, tag, requires=()):
+    """
+    Create a minimal pure python wheel containing a single module
+
+    Args:
+        wheels_dir: directory to write the wheel to
+        name: distribution name
+        version: distribution version
+        tag: wheel tag (e.g. py3-none-any)
+
+    Keyword Args:
+        requires: list of requirement strings written as Requires-Dist
+
+    Returns the path to the wheel
+    """
+    dist_info = '{}-{}.dist-info'.format(name, version)
+    wheel_path = os.path.join(wheels_dir, '{}-{}-{}.whl'.format(name, version, tag))
+    metadata = 'Metadata-Version: 2.1\nName: {}\nVersion: {}\n'.format(name, version)
+    metadata += ''.join('Requires-Dist: {}\n'.format(u) for u in requires)
+    files = {'{}.py'.format(name): 'VALUE = {!r}\n'.format(version),
+             '{}/METADATA'.format(dist_info): metadata,
+             '{}/WHEEL'.format(dist_info): 'Wheel-Version: 1.0\nGenerator: benchmarks\nRoot-Is-Purelib: true\nTag: {}\n'.format(tag)}
+    record = ''.join('{},,\n'.format(u) for u in sorted(files))
+    files['{}/RECORD'.format(dist_info)] = record + '{}/RECORD,,\n'.format(dist_info)
+    with zipfile.ZipFile(wheel_path, 'w') as wheel:
+        for filename, content in sorted(files.items()):
+            wheel.writestr(filename, content)
+    return wheel_path
+
+
+def make_wheelhouse(root, count, python_version, other_version='2.7'):
+    """
+    Create a wheel directory with count wheels, half of which match the python
+    version and half of which target another version
+
+    Args:
+        root: directory to create the wheels in
+        count: number of wheels to create
+        python_version: python version string the matching wheels target
+
+    Keyword Args:
+        other_version: python version string the non-matching wheels target
+
+    Returns the list of wheel paths matching the python version
+    """
+    matching = []
+    for i in range(count):
+        version = python_version if i % 2 == 0 else other_version
+        tag = 'cp{0}-cp{0}m-linux_x86_64'.format(version.replace('.', '')) if i % 4 < 2 else 'py{}-none-any'.format(version.split('.')[0])
+        wheel = make_wheel(root, 'package{}'.format(i), '1.0.{}'.format(i), tag)
+        if version == python_version:
+            matching.append(wheel)
+    return matching
@@ -0,0 +1,339 @@
+"""
+benchmarks/run.py
+*****************
+Benchmark find_virtualenv, check_input_path, default wheel selection and
+create against synthetic filesystem layouts, and the time taken by each create backend.
+
+virtualenv and pip are stubbed (subprocess.call is replaced), so create is
+measured without the cost of the external tools, except in the backends
+benchmark which creates real environments. Each result records the
+timings along with the number of filesystem probes (stat, lstat, listdir,
+scandir) and subprocess launches, and the results are written as JSON so that
+runs can be compared:
+
+    python benchmarks/run.py -o before.json
+    python benchmarks/run.py -o after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import layouts  # noqa E402
+from virtualenv_helpers import backends  # noqa E402
+from virtualenv_helpers import create as create_module  # noqa E402
+from virtualenv_helpers.find import find_virtualenv  # noqa E402
+from virtualenv_helpers.find import check_input_path  # noqa E402
+from virtualenv_helpers.stats import collect  # noqa E402
+
+timer = getattr(time, 'perf_counter', time.time)
+PYTHON_VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+FULL_SIZES = {'depths': [5, 20, 50], 'environments': [10, 1000, 20000], 'wheels': [100, 500]}
+QUICK_SIZES = {'depths': [5, 20], 'environments': [10, 500], 'wheels': [50]}
+
+
+@contextlib.contextmanager
+def stub_subprocess(enabled=True):
+    """Replace subprocess.call so virtualenv and pip are not run (if enabled)"""
+    def call(argv, *args, **kwargs):
+        if argv and os.path.split(argv[0])[-1] == 'virtualenv':
+            # Create the skeleton of an environment (the directory is before --python, the seed options may follow)
+            env_dir = argv[argv.index('--python') - 1]
+            for folder in [('bin',), ('lib', 'python{}'.format(PYTHON_VERSION), 'site-packages')]:
+                path = os.path.join(env_dir, *folder)
+                if not os.path.exists(path):
+                    os.makedirs(path)
+        return 0
+    if not enabled:
+        yield
+        return
+    original = subprocess.call
+    subprocess.call = call
+    try:
+        yield
+    finally:
+        subprocess.call = original
+
+
+@contextlib.contextmanager
+def environment(**kwargs):
+    """Temporarily set environment variables"""
+    original = os.environ.copy()
+    os.environ.update(kwargs)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(original)
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    """Temporarily change the working directory"""
+    current = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(current)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Suppress stdout from the code being benchmarked"""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        yield
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def measure(name, params, function, repeat, setup=None, stub=True):
+    """
+    Time a function, returning a result dictionary
+
+    Args:
+        name: benchmark name
+        params: dictionary of benchmark parameters
+        function: function to time (called with no arguments)
+        repeat: number of times to call the function
+
+    Keyword Args:
+        setup: function called (untimed) before each call
+        stub: stub subprocess.call so virtualenv and pip are not run
+    """
+    times = []
+    counts = {}
+    with stub_subprocess(stub):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            with collect() as stats:
+                start = timer()
+                function()
+                times.append(timer() - start)
+            counts = dict(('{}:{}'.format(*key), count) for key, count in stats.counts.items())
+    times.sort()
+    result = {'name': name, 'params': params, 'times': times,
+              'min': times[0], 'median': times[len(times) // 2],
+              'stat_calls': stats.probes(), 'subprocess_calls': stats.subprocesses(),
+              'counts': counts}
+    return result
+
+
+def report(result):
+    """Print a benchmark result"""
+    print('{:<24} {:<48} median {:>10.3f} ms  probes {:>6}  subprocesses {:>4}'.format(
+        result['name'], json.dumps(result['params'], sort_keys=True), result['median']*1e3,
+        result['stat_calls'], result['subprocess_calls']))
+
+
+def bench_find(root, sizes, repeat):
+    """Benchmark find_virtualenv from deep trees against large VENV_DIR directories"""
+    results = []
+    # An empty cache directory, so the registry and last used log of the user running it are not read
+    cache_dir = os.path.join(root, 'find-cache')
+    for environments in sizes['environments']:
+        virtualenv_dir = os.path.join(root, 'venvs-{}'.format(environments))
+        names = layouts.make_virtualenv_dir(virtualenv_dir, environments, versions=(PYTHON_VERSION, '2.7'))
+        for depth in sizes['depths']:
+            tree = os.path.join(root, 'tree-{}-{}'.format(environments, depth))
+            os.makedirs(tree)
+            # The top of the tree is named after an environment, so the search has to rise through every level
+            project_dir = os.path.join(tree, names[0].rsplit('-', 1)[0])
+            deepest = layouts.make_tree(project_dir, depth)
+            with environment(VENV_DIR=virtualenv_dir, VENV_HELPERS_CACHE_DIR=cache_dir), working_directory(deepest):
+                results.append(measure('find_virtualenv', {'environments': environments, 'depth': depth, 'found': True},
+                                       lambda: find_virtualenv(PYTHON_VERSION), repeat))
+            deepest = layouts.make_tree(os.path.join(tree, 'missing'), depth)
+            with environment(VENV_DIR=virtualenv_dir, VENV_HELPERS_CACHE_DIR=cache_dir), working_directory(deepest):
+                results.append(measure('find_virtualenv', {'environments': environments, 'depth': depth, 'found': False},
+                                       lambda: find_virtualenv(PYTHON_VERSION), repeat))
+        with environment(VENV_DIR=virtualenv_dir, VENV_HELPERS_CACHE_DIR=cache_dir), working_directory(root):
+            name = names[-1].rsplit('-', 1)[0]
+            results.append(measure('check_input_path', {'environments': environments},
+                                   lambda: check_input_path(name, PYTHON_VERSION), repeat))
+        shutil.rmtree(virtualenv_dir)
+    return results
+
+
+def bench_wheels(root, sizes, repeat):
+    """Benchmark installing the default wheels into a new and an up to date environment"""
+    results = []
+    env_root = os.path.join(root, 'wheel-env')
+
+    def setup():
+        if os.path.exists(env_root):
+            shutil.rmtree(env_root)
+        layouts.make_virtualenv_dir(env_root, 1, versions=(PYTHON_VERSION,))
+    setup()
+    env_dir = os.path.join(env_root, os.listdir(env_root)[0])
+    for wheels in sizes['wheels']:
+        wheels_dir = os.path.join(root, 'wheels-{}'.format(wheels))
+        os.makedirs(wheels_dir)
+        layouts.make_wheelhouse(wheels_dir, wheels, PYTHON_VERSION, other_version='2.7' if PYTHON_VERSION != '2.7' else '3.6')
+        with environment(VENV_DEFAULT_WHEELS_DIR=wheels_dir, VENV_HELPERS_CACHE_DIR=os.path.join(root, 'cache')), quiet():
+            results.append(measure('install_default_wheels', {'wheels': wheels, 'installed': False},
+                                   lambda: create_module.install_default_wheels(PYTHON_VERSION, env_dir), repeat, setup))
+            results.append(measure('install_default_wheels', {'wheels': wheels, 'installed': True},
+                                   lambda: create_module.install_default_wheels(PYTHON_VERSION, env_dir), repeat))
+    return results
+
+
+def bench_create(root, sizes, repeat):
+    """Benchmark create with virtualenv and pip stubbed"""
+    results = []
+    project_dir = os.path.join(root, 'create-project')
+    os.makedirs(project_dir)
+    with open(os.path.join(project_dir, 'setup.py'), 'w') as f:
+        f.write('from setuptools import setup\nsetup(name="create-project")\n')
+    for wheels in sizes['wheels']:
+        wheels_dir = os.path.join(root, 'create-wheels-{}'.format(wheels))
+        os.makedirs(wheels_dir)
+        layouts.make_wheelhouse(wheels_dir, wheels, PYTHON_VERSION, other_version='2.7' if PYTHON_VERSION != '2.7' else '3.6')
+        virtualenv_dir = os.path.join(root, 'create-venvs-{}'.format(wheels))
+
+        def setup():
+            if os.path.exists(virtualenv_dir):
+                shutil.rmtree(virtualenv_dir)
+        # An empty seed wheels cache, so the user's seed wheels are not unpacked into the stubbed environments
+        with environment(VENV_DEFAULT_WHEELS_DIR=wheels_dir, VENV_HELPERS_CACHE_DIR=os.path.join(root, 'cache'),
+                         VENV_SEED_WHEELS_DIR=os.path.join(root, 'seed-wheels')), working_directory(project_dir), quiet():
+            results.append(measure('create', {'wheels': wheels},
+                                   lambda: create_module.create(['-d', virtualenv_dir, '-w']), repeat, setup))
+    return results
+
+
+@contextlib.contextmanager
+def patched(module, name, value):
+    """Temporarily replace a module attribute"""
+    original = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+def bench_backends(root, sizes, repeat):
+    """
+    Benchmark creating a real environment with each backend (not stubbed), with
+    and without seeding pip and setuptools
+    """
+    results = []
+    env_dir = os.path.join(root, 'env')
+
+    def setup():
+        if os.path.exists(env_dir):
+            shutil.rmtree(env_dir)
+
+    def create_environment(backend):
+        return lambda: backends.create_environment(backend, PYTHON_VERSION, env_dir, sys.executable, [])
+    os.makedirs(root)
+    repeat = min(repeat, 3)
+    # Seeded with ensurepip, whatever the user's seed wheels cache holds
+    with environment(VENV_SEED_WHEELS_DIR=os.path.join(root, 'seed-wheels')), quiet():
+        for seed in [False, True]:
+            with patched(backends, 'seed_environment', backends.seed_environment if seed else lambda path, version: None):
+                if backends.venv is not None:
+                    results.append(measure('backend', {'backend': 'venv', 'in_process': True, 'seed': seed},
+                                           create_environment('venv'), repeat, setup, stub=False))
+                    with patched(backends, 'venv', None):
+                        results.append(measure('backend', {'backend': 'venv', 'in_process': False, 'seed': seed},
+                                               create_environment('venv'), repeat, setup, stub=False))
+        if find_executable('virtualenv') is not None:
+            results.append(measure('backend', {'backend': 'virtualenv', 'in_process': False, 'seed': True},
+                                   create_environment('virtualenv'), repeat, setup, stub=False))
+    return results
+
+
+def find_executable(name):
+    """Find an executable on the PATH"""
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        if os.path.isfile(os.path.join(path, name)) and os.access(os.path.join(path, name), os.X_OK):
+            return os.path.join(path, name)
+    return None
+
+
+BENCHMARKS = {'find': bench_find, 'wheels': bench_wheels, 'create': bench_create, 'backends': bench_backends}
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline run, returning the regressions
+
+    Args:
+        results: list of result dictionaries
+        baseline: list of result dictionaries from the baseline run
+        threshold: relative slowdown of the median (or increase in calls)
+                   reported as a regression
+    """
+    baseline = dict(((u['name'], json.dumps(u['params'], sort_keys=True)), u) for u in baseline)
+    regressions = []
+    for result in results:
+        key = (result['name'], json.dumps(result['params'], sort_keys=True))
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        ratio = result['median'] / base['median'] if base['median'] else 1.0
+        print('{:<24} {:<48} {:>6.2f}x  probes {:>6} -> {:<6} subprocesses {:>4} -> {:<4}'.format(
+            key[0], key[1], ratio, base['stat_calls'], result['stat_calls'], base['subprocess_calls'], result['subprocess_calls']))
+        if ratio > 1 + threshold or result['stat_calls'] > base['stat_calls'] or result['subprocess_calls'] > base['subprocess_calls']:
+            regressions.append(result)
+    return regressions
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Run the virtualenv_helpers benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run, from {} (default all)'.format(', '.join(sorted(BENCHMARKS))), default=[])
+    parser.add_argument('-o', '--output', dest='output', help='JSON file to write the results to', default=None)
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, help='Number of repetitions of each benchmark', default=5)
+    parser.add_argument('-q', '--quick', dest='quick', action='store_true', help='Use smaller layouts', default=False)
+    parser.add_argument('--compare', dest='compare', help='JSON results file to compare against', default=None)
+    parser.add_argument('--threshold', dest='threshold', type=float, help='Relative slowdown reported as a regression', default=0.2)
+    return parser
+
+
+def main(args=None):
+    parser = create_parser()
+    options = parser.parse_args(args)
+    unknown = [u for u in options.benchmarks if u not in BENCHMARKS]
+    if unknown:
+        parser.error('Unknown benchmarks: {}'.format(', '.join(unknown)))
+    sizes = QUICK_SIZES if options.quick else FULL_SIZES
+    root = tempfile.mkdtemp(prefix='virtualenv_helpers_benchmarks')
+    results = []
+    try:
+        for name in options.benchmarks or sorted(BENCHMARKS):
+            for result in BENCHMARKS[name](os.path.join(root, name), sizes, options.repeat):
+                report(result)
+                results.append(result)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    output = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                       'time': time.time(), 'sizes': sizes, 'repeat': options.repeat},
+              'results': results}
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+    if options.compare is not None:
+        with open(options.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, options.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,10 +34,22 @@ kwargs = dict(
     author_email=__email__,
     entry_points={'console_scripts': [
         'workon = virtualenv_helpers.activate:activate',
-        '{} = virtualenv_helpers.create:create'.format(virtualenv_console)]},
+        '{} = virtualenv_helpers.create:create'.format(virtualenv_console),
+        'refreshvenvseeds = virtualenv_helpers.seed:refresh',
+        'dedupevenvs = virtualenv_helpers.store:dedupe_command',
+        'snapshotvenv = virtualenv_helpers.snapshot:snapshot_command',
+        'restorevenv = virtualenv_helpers.snapshot:restore_command',
+        'relocatevenv = virtualenv_helpers.relocate:relocate_command',
+        'whichvenvs = virtualenv_helpers.inventory:which_command',
+        'lsvenv = virtualenv_helpers.registry:list_command',
+        'prunevenvs = virtualenv_helpers.registry:prune_command',
+        'rebuildvenvregistry = virtualenv_helpers.registry:rebuild_command',
+        'checkvenv = virtualenv_helpers.health:check_command',
+        'upgradevenvs = virtualenv_helpers.upgrade:upgrade_command']},
     keywords=[],
     classifiers=[],
     package_data={'': ['*.txt',
+                       'shell/*',
                        'docs/source/*.rst',
                        'docs/man/*',
                        'docs/epub/*.epub',
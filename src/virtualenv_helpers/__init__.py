@@ -1,4 +1,11 @@
+import os as _os
 
 from ._version import get_versions
 __version__ = get_versions()['version']
 del get_versions
+
+if _os.environ.get('VENV_HELPERS_STATS', '0') not in ('', '0'):
+    # Print filesystem probe and subprocess counts on exit
+    from .stats import print_on_exit
+    print_on_exit()
+del _os
@@ -11,9 +11,16 @@ import sys
 import subprocess
 import argparse
 
+from .find import find_virtualenvs
 from .find import get_virtualenv_path
+from .find import split_virtualenv_name
 from . import __version__
 from .editors import editors
+from .precompile import precompile
+from .mru import record_use
+from .run import run_in_virtualenvs
+from .tracing import span
+from .tracing import trace_to
 
 if 'win32' in sys.platform:
     script_dir = 'Scripts'
@@ -23,13 +30,18 @@ else:
 
 def create_parser():
     """Create the command line parser"""
-    parser = argparse.ArgumentParser(description='Activate a python virtual environment by searching for a local environment or looking in the VENV_DIR directory')
+    parser = argparse.ArgumentParser(description='Activate a python virtual environment by searching for a local environment or looking in the VENV_DIR directory',
+                                     usage='%(prog)s [options] [path] [-- command ...]')
     parser.add_argument('--path', '--virtualenv-path', dest='virtualenv_path', help='Path to the virtual environment to activate', default=None)
     parser.add_argument('path', help='Path to the virtual environment to activate', default=None, nargs='?')
-    parser.add_argument('-p', '--py', '--py-version', dest='python_version', help='Python version of the virtual environment to activate', default=None)
+    parser.add_argument('-p', '--py', '--py-version', dest='python_version', help='Python version of the virtual environment to activate (a comma separated list with --all)', default=None)
+    parser.add_argument('-a', '--all', dest='all', action="store_true", help="Run the command after -- in every python version's virtual environment of the project", default=False)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, help="Number of virtual environments to run the command in at once with --all (default all of them)", default=None)
     parser.add_argument('-e', '--editor', nargs='?', dest='editor', help="Editor to load with the virtual environment", default=os.environ.get('VENV_EDITOR', None))
     parser.add_argument('-s', '--show-editor', dest='show_editor', action="store_true", help="Show the editor when working on the virtual environment", default=os.environ.get('VENV_EDITOR_SHOW', None))
     parser.add_argument('-x', '--no-show-editor', dest='no_show_editor', action="store_true", help="Don't show the editor when working on the virtual environment", default=False)
+    parser.add_argument('--precompile', dest='precompile', action="store_true", help="Compile the bytecode of the virtual environment instead of activating it", default=False)
+    parser.add_argument('--trace', dest='trace', metavar='FILE', help="Write a Chrome trace-event timeline of the activation to FILE", default=None)
     parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
     return parser
 
@@ -43,7 +55,20 @@ def parse_options(args=None):
               arguments (sys.argv) are used
     """
     parser = create_parser()
+    if args is None:
+        args = sys.argv[1:]
+    args = list(args)
+    # The command to run is everything after --
+    command = None
+    if '--' in args:
+        command = args[args.index('--')+1:]
+        args = args[:args.index('--')]
     options = parser.parse_args(args)
+    options.command = command
+    if options.all and not command:
+        parser.error('--all needs a command to run after --')
+    if command is not None and not command:
+        parser.error('No command given after --')
     if options.path is not None and options.virtualenv_path is not None:
         parser.error('Both --path and positional argument provided for virtual environment path, only one should be used')
     if options.python_version is not None:
@@ -73,7 +98,42 @@ def activate(args=None):
 
     """
     options, python_version = parse_options(args)
+    with trace_to(options.trace), span('activate', argv=sys.argv[1:] if args is None else list(args), python_version=python_version):
+        return _activate(options, python_version)
+
+
+def _activate(options, python_version):
+    """
+    Activate the virtual environment for the parsed options
+
+    Args:
+        options: Namespace object of parsed arguments from the command line
+                 parser
+        python_version: python version string
+
+    Returns the exit code of the command or precompile if either is run
+    """
+    if options.all:
+        python_versions = None
+        if options.python_version is not None:
+            python_versions = [u.strip().lower().lstrip('py').lstrip('thon') for u in options.python_version.split(',')]
+        virtualenv_paths = find_virtualenvs(python_versions, options.path or options.virtualenv_path)
+        if not virtualenv_paths:
+            print('No virtual environments found')
+            return 1
+        for virtualenv_path in virtualenv_paths:
+            # Not recorded for a project, as they are not all for the current directory
+            record_use(virtualenv_path, None, split_virtualenv_name(os.path.split(virtualenv_path)[-1])[1])
+        return run_in_virtualenvs(virtualenv_paths, options.command, options.jobs)
     virtualenv_path, matching_path = get_virtualenv_path(python_version, options.virtualenv_path,)
+    if virtualenv_path is not None and not options.precompile:
+        # Only environments found by searching are recorded for the project
+        # directory, not ones given by path or name
+        record_use(virtualenv_path, matching_path, python_version)
+    if virtualenv_path is not None and options.command is not None:
+        return run_in_virtualenvs([virtualenv_path], options.command)
+    if virtualenv_path is not None and options.precompile:
+        return precompile(virtualenv_path, python_version)
     if virtualenv_path is not None:
         path = os.environ.get('PATH', '').split(';')
         path = [u for u in path if 'python' not in u.lower()]
@@ -87,11 +147,13 @@ def activate(args=None):
             options.editor.start(matching_path, virtualenv_path)
         try:
             subprocess_args = [shell]+args+[os.path.join(virtualenv_path, script_dir, script_name)]
-            subprocess.call(subprocess_args, env=env)
+            with span('shell', argv=subprocess_args):
+                subprocess.call(subprocess_args, env=env)
         except KeyboardInterrupt:
             pass
     else:
         print('No virtual environment found')
+        return 1 if options.command is not None else None
 
 
 def get_shell():
@@ -0,0 +1,130 @@
+"""
+backends.py
+***********
+Backends used by create to build the virtual environment directory.
+
+virtualenv: runs the virtualenv script (the default)
+venv: uses the standard library venv module, in-process (venv.EnvBuilder)
+      when the environment is for the running interpreter, otherwise with a
+      single ``pythonX.Y -m venv --without-pip`` call.
+
+Both backends seed pip, setuptools and wheel from the offline seed wheels
+cache (see seed.py) when it has a pip wheel for the python version. Otherwise
+virtualenv installs its own copies and the venv backend uses ensurepip.
+"""
+import sys
+import argparse
+import subprocess
+
+try:
+    import venv
+except ImportError:
+    # Python 2
+    venv = None
+
+from .seed import has_seed_wheels
+from .seed import seed_environment
+from .tracing import span
+
+BACKENDS = ('virtualenv', 'venv')
+is_windows = sys.platform.startswith('win')
+
+
+def create_venv_parser():
+    """Create the parser for the venv options that can be passed to create"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--system-site-packages', dest='system_site_packages', action="store_true", default=False)
+    parser.add_argument('--clear', dest='clear', action="store_true", default=False)
+    parser.add_argument('--upgrade', dest='upgrade', action="store_true", default=False)
+    parser.add_argument('--symlinks', dest='symlinks', action="store_true", default=not is_windows)
+    parser.add_argument('--copies', dest='symlinks', action="store_false")
+    parser.add_argument('--prompt', dest='prompt', default=None)
+    return parser
+
+
+def is_running_python(version):
+    """
+    Check if a python version string is the version of the running interpreter
+
+    Args:
+        version: python version string
+    """
+    return version == '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+def create_with_virtualenv(version, version_virtualenv_dir, executable, args):
+    """
+    Create the virtual environment by running virtualenv, seeding it from the
+    seed wheels cache if there are seed wheels for the version
+
+    Args:
+        version: python version string for the virtual environment
+        version_virtualenv_dir: Directory of the virtual environment directory
+        executable: python executable for the version
+        args: list of additional arguments passed to virtualenv
+    """
+    seed = has_seed_wheels(version)
+    argv = ['virtualenv'] + list(args) + [version_virtualenv_dir, '--python', executable]
+    if seed:
+        argv += ['--no-pip', '--no-setuptools', '--no-wheel']
+    with span('virtualenv', version=version, argv=argv):
+        returncode = subprocess.call(argv, stdout=sys.stdout, stderr=sys.stderr)
+    if seed and returncode == 0:
+        returncode = seed_environment(version_virtualenv_dir, version)
+    return returncode
+
+
+def create_with_venv(version, version_virtualenv_dir, executable, args):
+    """
+    Create the virtual environment using the venv module, in-process if the
+    version is the running interpreter, and seed it with pip, setuptools and
+    wheel
+
+    Args:
+        version: python version string for the virtual environment
+        version_virtualenv_dir: Directory of the virtual environment directory
+        executable: python executable for the version
+        args: list of additional venv arguments
+    """
+    options, unknown = create_venv_parser().parse_known_args(args)
+    if unknown:
+        print('Ignoring options not supported by venv: {}'.format(' '.join(unknown)))
+    if venv is not None and is_running_python(version):
+        with span('venv', version=version, in_process=True):
+            builder = venv.EnvBuilder(system_site_packages=options.system_site_packages, clear=options.clear,
+                                      symlinks=options.symlinks, upgrade=options.upgrade, with_pip=False,
+                                      prompt=options.prompt)
+            builder.create(version_virtualenv_dir)
+        returncode = 0
+    else:
+        argv = [executable, '-m', 'venv', '--without-pip']
+        argv += [u for u in ['--system-site-packages', '--clear', '--upgrade'] if getattr(options, u[2:].replace('-', '_'))]
+        argv += ['--symlinks'] if options.symlinks else ['--copies']
+        if options.prompt is not None:
+            argv += ['--prompt', options.prompt]
+        with span('venv', version=version, in_process=False, argv=argv):
+            returncode = subprocess.call(argv + [version_virtualenv_dir], stdout=sys.stdout, stderr=sys.stderr)
+    if returncode == 0:
+        returncode = seed_environment(version_virtualenv_dir, version)
+    return returncode
+
+
+def create_environment(backend, version, version_virtualenv_dir, executable, args):
+    """
+    Create the virtual environment directory using a backend
+
+    Args:
+        backend: name of the backend (virtualenv or venv)
+        version: python version string for the virtual environment
+        version_virtualenv_dir: Directory of the virtual environment directory
+        executable: python executable for the version
+        args: list of additional arguments for the backend
+
+    Returns the exit code (0 if the environment was created)
+    """
+    if backend == 'venv':
+        return create_with_venv(version, version_virtualenv_dir, executable, args)
+    elif backend == 'virtualenv':
+        return create_with_virtualenv(version, version_virtualenv_dir, executable, args)
+    else:
+        raise ValueError('Unknown backend {}, expected one of {}'.format(backend, ', '.join(BACKENDS)))
@@ -0,0 +1,266 @@
+"""
+batch.py
+********
+Create the virtual environments for many projects at once, from a TOML or
+JSON batch file, e.g. when setting up a new machine:
+
+    [defaults]
+    versions = ["3.6"]
+    wheels = true
+
+    [[projects]]
+    path = "~/src/abc"
+
+    [[projects]]
+    path = "~/src/def"
+    name = "def-tools"
+    versions = ["2.7", "3.6"]
+    args = ["--backend", "venv"]
+
+(or {"defaults": {...}, "projects": [{...}, ...]} in JSON). Relative project
+paths are relative to the batch file.
+
+Each project is created by running create_venv in its own process (so a
+failing project does not stop the others), writing the output to a log file
+for the project. Creating the environment, installing the wheels and
+installing the project are mostly waiting on the disk and subprocesses, so
+up to io_jobs projects run these phases at once. Compiling the bytecode is
+CPU bound, so it is run separately for up to cpu_jobs projects at once,
+sharing the CPUs between them, as each project finishes its other phases.
+"""
+import os
+import sys
+import json
+import time
+import traceback
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from .cache import get_cache_dir
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Settings of a project, and their defaults
+PROJECT_DEFAULTS = {'name': None, 'versions': [], 'wheels': False, 'local': False, 'directory': None,
+                    'backend': None, 'clone': None, 'precompile': True, 'args': []}
+
+
+def read_batch_file(path):
+    """
+    Read the projects from a TOML or JSON batch file, applying the defaults
+
+    Args:
+        path: path to the batch file (.toml or .json)
+
+    Returns a list of project dictionaries, raises ValueError if the file is
+    not valid
+    """
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError('Reading {} needs python 3.11+ or tomli'.format(path))
+        with open(path, 'rb') as f:
+            try:
+                data = tomllib.loads(f.read().decode('utf-8'))
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError('Unable to read {}: {}'.format(path, e))
+    else:
+        with open(path) as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ValueError('Unable to read {}: {}'.format(path, e))
+    if not isinstance(data, dict) or not isinstance(data.get('projects', None), list):
+        raise ValueError('{} has no list of projects'.format(path))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = dict(PROJECT_DEFAULTS, **data.get('defaults', {}))
+    projects = []
+    names = set()
+    for entry in data['projects']:
+        if not isinstance(entry, dict) or 'path' not in entry:
+            raise ValueError('Each project in {} needs a path'.format(path))
+        unknown = set(entry) - set(PROJECT_DEFAULTS) - set(['path'])
+        if unknown:
+            raise ValueError('Unknown project settings in {}: {}'.format(path, ', '.join(sorted(unknown))))
+        project = dict(defaults, **entry)
+        project['path'] = os.path.join(base_dir, os.path.expanduser(project['path']))
+        if project['name'] is None:
+            project['name'] = os.path.split(os.path.normpath(project['path']))[-1]
+        if not isinstance(project['versions'], list):
+            project['versions'] = [project['versions']]
+        project['versions'] = [str(u) for u in project['versions']]
+        if project['name'] in names:
+            raise ValueError('The project name {} is used more than once in {}'.format(project['name'], path))
+        names.add(project['name'])
+        projects.append(project)
+    return projects
+
+
+def get_create_args(project):
+    """
+    Get the create_venv arguments for a project
+
+    Args:
+        project: project dictionary from the batch file
+    """
+    args = [project['name']]
+    if project['local']:
+        args.append('--local')
+    if project['directory']:
+        args += ['--directory', os.path.expanduser(project['directory'])]
+    if project['versions']:
+        args += ['--ignore-current-version', '--py-version'] + project['versions']
+    if project['wheels']:
+        args.append('--wheels')
+    if project['backend']:
+        args += ['--backend', project['backend']]
+    if project['clone']:
+        args += ['--clone', project['clone']]
+    return args + list(project['args'])
+
+
+def run_create(args, project_dir, log_path, mode='wb'):
+    """
+    Run create_venv for a project in a new process, writing the output to a
+    log file
+
+    Args:
+        args: list of create_venv arguments
+        project_dir: the project directory
+        log_path: path to the log file
+
+    Keyword Args:
+        mode: mode to open the log file with ('ab' to append)
+
+    Returns the exit code
+    """
+    argv = [sys.executable, '-m', 'virtualenv_helpers.create'] + args
+    with open(log_path, mode) as log:
+        log.write('$ {}\n'.format(' '.join(argv)).encode('utf-8'))
+        log.flush()
+        return subprocess.call(argv, cwd=project_dir, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _run_phase(result, phase, function, *args):
+    """Run a phase for a project, recording the time and any failure in the result"""
+    start = time.time()
+    try:
+        code = function(*args)
+    except Exception:
+        with open(result['log'], 'ab') as log:
+            log.write(traceback.format_exc().encode('utf-8'))
+        code = None
+    result[phase] = time.time() - start
+    if code != 0:
+        result['status'] = '{} failed'.format(phase) if code is None else '{} failed ({})'.format(phase, code)
+    return code
+
+
+def run_batch(projects, log_dir, io_jobs=4, cpu_jobs=2):
+    """
+    Create the virtual environments for a list of projects, with up to io_jobs
+    projects creating their environments at once and up to cpu_jobs projects
+    compiling their bytecode at once
+
+    Args:
+        projects: list of project dictionaries from read_batch_file
+        log_dir: directory to write the log file of each project in
+
+    Keyword Args:
+        io_jobs: number of projects to create at once
+        cpu_jobs: number of projects to compile the bytecode of at once
+
+    Returns a list of result dictionaries for the projects (name, status,
+    create and precompile times and log file)
+    """
+    if not projects:
+        return []
+    io_jobs, cpu_jobs = max(io_jobs, 1), max(cpu_jobs, 1)
+    workers = max(multiprocessing.cpu_count() // cpu_jobs, 1)
+    io_pool = ThreadPool(min(io_jobs, len(projects)))
+    cpu_pool = ThreadPool(min(cpu_jobs, len(projects)))
+
+    def precompile_project(project, result):
+        args = get_create_args(project) + ['--jobs', str(workers)]
+        _run_phase(result, 'precompile', run_create, args, project['path'], result['log'], 'ab')
+        return result
+
+    def create_project(project):
+        result = {'name': project['name'], 'status': 'ok', 'create': None, 'precompile': None,
+                  'log': os.path.join(log_dir, '{}.log'.format(project['name']))}
+        if not os.path.isdir(project['path']):
+            result['status'] = 'not found'
+            with open(result['log'], 'w') as log:
+                log.write('Project directory {} not found\n'.format(project['path']))
+            return result, None
+        code = _run_phase(result, 'create', run_create, get_create_args(project) + ['--no-precompile'], project['path'], result['log'])
+        if code != 0 or not project['precompile']:
+            return result, None
+        return result, cpu_pool.apply_async(precompile_project, (project, result))
+
+    try:
+        results = []
+        for result, pending in io_pool.map(create_project, projects, chunksize=1):
+            results.append(pending.get() if pending is not None else result)
+    finally:
+        for pool in (io_pool, cpu_pool):
+            pool.close()
+            pool.join()
+    return results
+
+
+def format_summary(results):
+    """
+    Format the results of a batch as a table
+
+    Args:
+        results: list of result dictionaries from run_batch
+    """
+    rows = [('Project', 'Status', 'Create', 'Precompile', 'Log')]
+    for result in results:
+        rows.append((result['name'], result['status'],
+                     '-' if result['create'] is None else '{:.1f}s'.format(result['create']),
+                     '-' if result['precompile'] is None else '{:.1f}s'.format(result['precompile']),
+                     result['log']))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    lines = ['  '.join(value.ljust(width) for value, width in zip(row, widths)) + '  ' + row[-1] for row in rows]
+    return '\n'.join(lines)
+
+
+def batch_command(path, io_jobs=4, cpu_jobs=2, log_dir=None):
+    """
+    Create the virtual environments for the projects in a batch file, printing
+    a summary table
+
+    Args:
+        path: path to the batch file
+
+    Keyword Args:
+        io_jobs: number of projects to create at once
+        cpu_jobs: number of projects to compile the bytecode of at once
+        log_dir: directory to write the log files to (defaults to the batch
+                 directory in the cache)
+
+    Returns the exit code (1 if any project failed)
+    """
+    try:
+        projects = read_batch_file(path)
+    except (IOError, OSError, ValueError) as e:
+        print(e)
+        return 1
+    if log_dir is None:
+        log_dir = get_cache_dir('batch')
+    elif not os.path.isdir(log_dir):
+        os.makedirs(log_dir)
+    start = time.time()
+    results = run_batch(projects, os.path.abspath(log_dir), io_jobs, cpu_jobs)
+    print(format_summary(results))
+    failed = len([u for u in results if u['status'] != 'ok'])
+    print('Created {} of {} projects in {:.1f}s'.format(len(results) - failed, len(results), time.time() - start))
+    return 1 if failed else 0
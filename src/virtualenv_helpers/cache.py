@@ -0,0 +1,40 @@
+"""
+cache.py
+********
+Location of the cache directory used for data that can be rebuilt (e.g. the
+cached egg_info metadata of projects).
+
+The cache defaults to ~/.virtualenv_helpers but can be changed using the
+VENV_HELPERS_CACHE_DIR environment variable.
+"""
+import os
+
+default_cache_dir = os.path.join(os.path.expanduser('~'), '.virtualenv_helpers')
+
+
+def get_cache_path(*parts):
+    """
+    Get a path in the cache without creating any directories (e.g. to read a
+    file that may not have been written yet)
+
+    Args:
+        parts: path components in the cache
+    """
+    return os.path.join(os.environ.get('VENV_HELPERS_CACHE_DIR', default_cache_dir), *parts)
+
+
+def get_cache_dir(*parts):
+    """
+    Get a directory in the cache, creating it if it does not exist
+
+    Args:
+        parts: path components of the directory in the cache
+    """
+    path = get_cache_path(*parts)
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    return path
@@ -0,0 +1,209 @@
+"""
+clone.py
+********
+Copy virtual environments quickly, for cloning an existing environment
+instead of building a new one.
+
+Each file is copied with the cheapest method the filesystems support, tried in
+order:
+
+reflink: a copy-on-write clone of the file (FICLONE, e.g. btrfs and XFS)
+copy_file_range: an in-kernel copy (Linux, python 3.8+)
+hardlink: for read-only files on the same filesystem (they are never written)
+copy: a plain copy
+
+The method is detected once for each pair of source and target filesystems,
+and the files are copied using a thread pool.
+"""
+import os
+import sys
+import stat
+import errno
+import shutil
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from .relocate import relocate
+from .tracing import traced
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# From linux/fs.h, fcntl.FICLONE is only defined in python 3.12+
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+METHODS = ('reflink', 'copy_file_range', 'hardlink', 'copy')
+# Errors meaning a method is not supported by the filesystems
+UNSUPPORTED_ERRORS = set(getattr(errno, u) for u in ('EOPNOTSUPP', 'ENOTSUP', 'ENOTTY', 'EXDEV', 'EINVAL', 'ENOSYS', 'EBADF', 'EPERM')
+                         if hasattr(errno, u))
+
+_methods = {}
+_methods_lock = threading.Lock()
+
+
+def _reflink(source, target, mode):
+    """Copy a file as a copy-on-write clone"""
+    with open(source, 'rb') as src:
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            fcntl.ioctl(fd, FICLONE, src.fileno())
+        finally:
+            os.close(fd)
+
+
+def _copy_file_range(source, target, mode):
+    """Copy a file in the kernel"""
+    with open(source, 'rb') as src:
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), fd, remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        finally:
+            os.close(fd)
+
+
+def _hardlink(source, target, mode):
+    """Link a read-only file"""
+    if mode & 0o222:
+        raise OSError(errno.EPERM, 'Only read-only files are hardlinked')
+    os.link(source, target)
+
+
+def _copy(source, target, mode):
+    """Copy a file"""
+    shutil.copyfile(source, target)
+    os.chmod(target, mode)
+
+
+_copy_functions = {'reflink': _reflink, 'copy_file_range': _copy_file_range, 'hardlink': _hardlink, 'copy': _copy}
+
+
+def available_methods(source_dev, target_dev):
+    """
+    Get the copy methods that can be tried between two filesystems
+
+    Args:
+        source_dev: device of the source filesystem
+        target_dev: device of the target filesystem
+    """
+    methods = []
+    if fcntl is not None and sys.platform.startswith('linux') and source_dev == target_dev:
+        methods.append('reflink')
+    if hasattr(os, 'copy_file_range'):
+        methods.append('copy_file_range')
+    if hasattr(os, 'link') and source_dev == target_dev:
+        methods.append('hardlink')
+    methods.append('copy')
+    return methods
+
+
+def copy_file(source, target, source_dev, target_dev, mode):
+    """
+    Copy a file with the cheapest supported method, detecting the method the
+    first time a pair of filesystems is used
+
+    Args:
+        source: path to the source file
+        target: path to the target file
+        source_dev: device of the source filesystem
+        target_dev: device of the target filesystem
+        mode: permission bits of the file
+
+    Returns the method used
+    """
+    key = (source_dev, target_dev)
+    method = _methods.get(key, None)
+    if method is not None:
+        methods = METHODS[METHODS.index(method):]
+    else:
+        methods = available_methods(source_dev, target_dev)
+    for candidate in methods:
+        if candidate == 'hardlink' and mode & 0o222:
+            # Writable files are copied, but the filesystems support hardlinks
+            continue
+        try:
+            _copy_functions[candidate](source, target, mode)
+        except (IOError, OSError) as e:
+            if candidate == 'copy' or e.errno not in UNSUPPORTED_ERRORS:
+                raise
+            if os.path.lexists(target):
+                os.remove(target)
+            continue
+        if candidate != 'hardlink':
+            with _methods_lock:
+                # Remember the first method that worked for a file that can be written
+                _methods.setdefault(key, candidate)
+        return candidate
+    raise OSError(errno.EIO, 'Unable to copy {}'.format(source))
+
+
+@traced
+def copy_tree(source, target, workers=None):
+    """
+    Copy a directory tree: directories and symlinks are created first, then
+    the files are copied using a thread pool
+
+    Args:
+        source: source directory
+        target: target directory (must not exist)
+
+    Keyword Args:
+        workers: number of threads to use (defaults to the CPU count)
+
+    Returns a dictionary of copy method to the number of files copied with it
+    """
+    source_dev = os.stat(source).st_dev
+    files = []
+    for root, dirs, filenames in os.walk(source):
+        target_root = os.path.join(target, os.path.relpath(root, source))
+        os.makedirs(target_root)
+        for name in list(dirs):
+            if os.path.islink(os.path.join(root, name)):
+                # os.walk does not follow directory symlinks, so create them here
+                dirs.remove(name)
+                filenames.append(name)
+        for name in filenames:
+            path = os.path.join(root, name)
+            path_stat = os.lstat(path)
+            if stat.S_ISLNK(path_stat.st_mode):
+                os.symlink(os.readlink(path), os.path.join(target_root, name))
+            elif stat.S_ISREG(path_stat.st_mode):
+                files.append((path, os.path.join(target_root, name), stat.S_IMODE(path_stat.st_mode)))
+    counts = dict((method, 0) for method in METHODS)
+    if not files:
+        return counts
+    target_dev = os.stat(target).st_dev
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(files)))
+    try:
+        methods = pool.map(lambda u: copy_file(u[0], u[1], source_dev, target_dev, u[2]), files, chunksize=32)
+    finally:
+        pool.close()
+        pool.join()
+    for method in methods:
+        counts[method] += 1
+    return counts
+
+
+@traced
+def clone_environment(source, version_virtualenv_dir, workers=None):
+    """
+    Clone a virtual environment by copying it and relocating it
+
+    Args:
+        source: Directory of the virtual environment to clone
+        version_virtualenv_dir: Directory of the new virtual environment directory (must not exist)
+
+    Keyword Args:
+        workers: number of threads to use (defaults to the CPU count)
+
+    Returns a dictionary of copy method to the number of files copied with it
+    """
+    counts = copy_tree(source, version_virtualenv_dir, workers)
+    relocate(version_virtualenv_dir, source, workers)
+    return counts
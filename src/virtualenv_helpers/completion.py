@@ -0,0 +1,68 @@
+"""
+completion.py
+*************
+Shell completion for workon and create_venv.
+
+The completion scripts in the shell folder read the names index kept in the
+VENV_DIR directory directly, and only run this module to regenerate it when it
+is missing or older than the VENV_DIR directory. The names printed by this
+module also include the environments in the registry (e.g. those created in
+another directory with create_venv -d).
+"""
+import os
+import argparse
+
+from .find import get_virtualenv_names
+from .find import split_virtualenv_name
+from .find import update_names_index
+from .registry import read_environments
+
+SHELLS = ('bash', 'zsh', 'fish')
+
+
+def get_completion_script(shell):
+    """
+    Get the path to the completion script for a shell
+
+    Args:
+        shell: shell name (bash, zsh or fish)
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shell', 'workon.{}'.format(shell))
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Print the virtual environment names used for shell completion')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Virtual environment directory to list", default=None)
+    parser.add_argument('--update', dest='update', action="store_true", help="Regenerate the names index even if it is not stale", default=False)
+    parser.add_argument('--script', dest='script', choices=SHELLS, help="Print the path to the completion script for the shell", default=None)
+    return parser
+
+
+def completion(args=None):
+    """
+    Print the virtual environment names (or the completion script path)
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_parser().parse_args(args)
+    if options.script is not None:
+        print(get_completion_script(options.script))
+        return
+    if options.update:
+        names = update_names_index(options.virtualenv_dir)
+    else:
+        names = get_virtualenv_names(options.virtualenv_dir)
+    names = set(names)
+    if options.virtualenv_dir is None:
+        for record in read_environments():
+            names.add(os.path.split(record['path'])[-1])
+            names.add(split_virtualenv_name(os.path.split(record['path'])[-1])[0])
+    for name in sorted(names):
+        print(name)
+
+
+if __name__ == "__main__":
+    completion()
@@ -13,6 +13,40 @@ import argparse
 import traceback
 
 from . import __version__
+from .backends import BACKENDS
+from .backends import create_environment
+from .batch import batch_command
+from .clone import clone_environment
+from .editable import UnsupportedProject
+from .editable import install_editable
+from .find import update_names_index
+from .locking import EnvironmentLock
+from .locking import publish_environment
+from .locking import staging_directory
+from .manifest import develop_inputs
+from .manifest import environment_inputs
+from .manifest import is_up_to_date
+from .manifest import precompile_inputs
+from .manifest import read_manifest
+from .manifest import wheels_inputs
+from .manifest import write_manifest
+from .find import update_virtualenv_pointer
+from .precompile import precompile
+from .registry import register_environment
+from .tracing import span
+from .tracing import traced
+from .tracing import trace_to
+from .wheels import canonical_name
+from .wheels import dependency_levels
+from .wheels import get_site_packages
+from .wheels import install_wheels
+from .wheels import installed_distributions
+from .wheels import is_compatible_wheel
+from .wheels import needs_install
+from .wheels import newest_wheels
+from .wheels import parse_installer_filename
+from .wheels import parse_wheel_filename
+from .wheels import uninstall_distribution
 
 default_env_dir = os.path.join(os.path.expanduser('~'), 'virtualenvs')
 default_wheels_dir = os.path.join(os.path.expanduser('~'), 'virtualenv_default_wheels')
@@ -41,6 +75,16 @@ def create_parser():
     parser.add_argument('-w', '--wheels', dest='default_wheels', help="Install the default wheels found in ~/virtualenv_default_wheels or VENV_DEFAULT_WHEELS_DIR", default=False, action="store_true")
     parser.add_argument('--py3.6', '--py36', dest='py36', help="Create a virtual environment for python 3.6", default=False, action="store_true")
     parser.add_argument('--ignore-current-version', dest='ignore_current_version', help="Do not create a virtual environment for the current python version", default=False, action="store_true")
+    parser.add_argument('--backend', dest='backend', choices=BACKENDS, help="Backend used to create the virtual environment (default virtualenv, or VENV_BACKEND)", default=os.environ.get('VENV_BACKEND', 'virtualenv'))
+    parser.add_argument('--clone', dest='clone', metavar='SOURCE', help="Create the virtual environment by copying an existing one (a path, or a name in the virtual environment directory)", default=None)
+    parser.add_argument('--no-precompile', dest='precompile', help="Do not compile the bytecode of the virtual environment after creating it", default=True, action="store_false")
+    parser.add_argument('-f', '--force', dest='force', help="Run every create phase even if the virtual environment is up to date", default=False, action="store_true")
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of worker processes for compiling the bytecode (default the CPU count)", default=None)
+    parser.add_argument('--batch', dest='batch', metavar='FILE', help="Create the virtual environments for the projects listed in a TOML or JSON file", default=None)
+    parser.add_argument('--io-jobs', dest='io_jobs', type=int, help="Number of projects to create at once in a batch (default 4)", default=4)
+    parser.add_argument('--cpu-jobs', dest='cpu_jobs', type=int, help="Number of projects to compile the bytecode of at once in a batch (default 2)", default=2)
+    parser.add_argument('--log-dir', dest='log_dir', help="Directory for the log file of each project in a batch (default the batch directory in the cache)", default=None)
+    parser.add_argument('--trace', dest='trace', metavar='FILE', help="Write a Chrome trace-event timeline of the create phases to FILE", default=None)
     parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
     return parser
 
@@ -81,6 +125,11 @@ def parse_options(args=None):
     return options, unknown
 
 
+def get_default_wheels_dir():
+    """Get the default wheels directory"""
+    return os.environ.get('VENV_DEFAULT_WHEELS_DIR', default_wheels_dir)
+
+
 def get_python_versions(options):
     """
     Get the python versions specified. Defaults to including the current
@@ -144,6 +193,22 @@ def get_python_executable(version):
     return executable
 
 
+def get_default_wheels(version, wheels_dir=None):
+    """
+    Get the newest wheel of each distribution in the default wheels directory
+    for a python version
+
+    Args:
+        version: python version string for the virtual environment
+
+    Keyword Args:
+        wheels_dir: the default wheels directory (defaults to get_default_wheels_dir())
+    """
+    wheels_dir = wheels_dir or get_default_wheels_dir()
+    return newest_wheels([u for u in sorted(glob.glob(os.path.join(wheels_dir, '*.whl'))) if is_compatible_wheel(u, version)])
+
+
+@traced
 def install_default_wheels(version, version_virtualenv_dir):
     """
     Install windows wheels found in the wheels directory, wheels can be
@@ -154,6 +219,15 @@ def install_default_wheels(version, version_virtualenv_dir):
 
     Recommended source for windows wheels is http://www.lfd.uci.edu/~gohlke/pythonlibs/
 
+    The newest wheel of each distribution is installed, ordered by the
+    Requires-Dist dependencies between the wheels: each level of the
+    dependency graph is unpacked straight into the virtual environment
+    concurrently, pip is only used for wheels that cannot be unpacked (and
+    easy_install for exe installers). Distributions that are already
+    installed at the same or a newer version are skipped, and older versions
+    are removed using their RECORD before the newer wheel is unpacked (pip
+    upgrades the ones without a RECORD).
+
     Args:
         version: python version string for the virtual environment
         version_virtualenv_dir: Directory of the virtual environment directory
@@ -162,43 +236,64 @@ def install_default_wheels(version, version_virtualenv_dir):
         pip = os.path.join(version_virtualenv_dir, 'Scripts', 'pip.exe')
     else:
         pip = os.path.join(version_virtualenv_dir, 'bin', 'pip')
-    wheels_dir = os.environ.get('VENV_DEFAULT_WHEELS_DIR', default_wheels_dir)
+    wheels_dir = get_default_wheels_dir()
     if not os.path.exists(wheels_dir):
         return  # Default wheels dir not found
-    cpy_version = '-cp{}'.format(version.replace('.', ''))
-    py_version = '-py{}'.format(version.split('.')[0])
-    py_version2 = '.py{}-'.format(version.split('.')[0])
-    wheels = [u for u in glob.glob(os.path.join(wheels_dir, '*.whl')) if 'numpy' not in u and (cpy_version in os.path.split(u)[-1] or py_version in os.path.split(u)[-1] or py_version2 in os.path.split(u)[-1])]
+    wheels = get_default_wheels(version, wheels_dir)
+    wheel_names = set(canonical_name(parse_wheel_filename(u)[0]) for u in wheels)
+    # Skip wheels that are already installed and up to date
+    installed = installed_distributions(get_site_packages(version_virtualenv_dir, version))
+    wheels = [u for u in wheels if needs_install(u, installed)]
     argv = [pip, 'install']
-    opts = ['--find-links='+wheels_dir, '--prefix='+version_virtualenv_dir, '-U']
-    numpy = [u for u in glob.glob(os.path.join(wheels_dir, 'numpy*.whl')) if (cpy_version in os.path.split(u)[-1] or py_version in os.path.split(u)[-1] or py_version2 in os.path.split(u)[-1])]
-    if len(numpy):
-        numpy = numpy[0]
-        subprocess.call(argv+[numpy]+opts, stdout=sys.stdout, stderr=sys.stderr)
-    for wheel in wheels:
-        subprocess.call(argv+[wheel]+opts, stdout=sys.stdout, stderr=sys.stderr)
+    # The dependencies are installed in an earlier level
+    opts = ['--no-deps', '--no-index', '--find-links='+wheels_dir, '--prefix='+version_virtualenv_dir, '-U']
+    for level in dependency_levels(wheels, version):
+        unpack = []
+        unsupported = []
+        for wheel in level:
+            name = parse_wheel_filename(wheel)[0]
+            # Remove an older version first, so its files and .dist-info are not left behind
+            if canonical_name(name) not in installed or uninstall_distribution(name, version_virtualenv_dir, version):
+                unpack.append(wheel)
+            else:
+                unsupported.append(wheel)
+        unsupported += install_wheels(unpack, version_virtualenv_dir, version)
+        if unsupported:
+            subprocess.call(argv+unsupported+opts, stdout=sys.stdout, stderr=sys.stderr)
     if is_windows:
-        exes = [u for u in glob.glob(os.path.join(wheels_dir, '*.exe')) if 'numpy' not in u and (cpy_version in os.path.split(u)[-1] or py_version in os.path.split(u)[-1] or py_version2 in os.path.split(u)[-1])]
+        exes = [u for u in glob.glob(os.path.join(wheels_dir, '*.exe')) if is_compatible_wheel(u, version) and needs_install(u, installed)]
+        # Skip exe installers for distributions installed from a wheel
+        exes = [u for u in exes if parse_installer_filename(u) is None or canonical_name(parse_installer_filename(u)[0]) not in wheel_names]
         easy_install = os.path.join(version_virtualenv_dir, 'Scripts', 'easy_install.exe')
         # Use easy_install to install any exe files
         for exe in exes:
             subprocess.call([easy_install, '--prefix', version_virtualenv_dir, exe], stdout=sys.stdout, stderr=sys.stderr)
 
 
-def install_module_as_develop(version_virtualenv_dir):
+@traced
+def install_module_as_develop(version_virtualenv_dir, version):
     """
-    Try to install the module in the current directory using:
+    Try to install the module in the current directory as editable, by writing
+    a .pth file and .dist-info directory, falling back to:
         python setup.py develop
 
     Args:
         version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Returns the exit code, or None if there is no setup.py
     """
     if os.path.exists('setup.py'):
+        try:
+            install_editable(os.getcwd(), version_virtualenv_dir, version)
+            return 0
+        except UnsupportedProject as e:
+            print('Running setup.py develop: {}'.format(e))
         env = os.environ.copy()
-        env['PYTHONPATH'] = os.path.join(version_virtualenv_dir, 'Lib', 'site-packages')
-        subprocess.call([os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON), 'setup.py', 'develop', '--prefix',
-                         version_virtualenv_dir],
-                        env=env, stdout=sys.stdout, stderr=sys.stderr)
+        env['PYTHONPATH'] = get_site_packages(version_virtualenv_dir, version)
+        return subprocess.call([os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON), 'setup.py', 'develop', '--prefix',
+                                version_virtualenv_dir],
+                               env=env, stdout=sys.stdout, stderr=sys.stderr)
 
 
 def create(args=None):
@@ -210,24 +305,180 @@ def create(args=None):
               arguments (sys.argv) are used
     """
     options, unknown = parse_options(args)
+    if options.batch is not None:
+        return batch_command(options.batch, options.io_jobs, options.cpu_jobs, options.log_dir)
+    with trace_to(options.trace), span('create', argv=sys.argv[1:] if args is None else list(args)):
+        return _create(options, unknown)
+
+
+def _create(options, unknown):
+    """
+    Create the virtual environments for the parsed options
+
+    Args:
+        options: Namespace object of parsed arguments from the command line
+                 parser
+        unknown: list of unknown arguments (passed to the backend)
+
+    Returns the exit code (non-zero if any version failed)
+    """
     # Handle versions to create for
     python_versions = get_python_versions(options)
-    # Unknown args to virtualenv
-    argv = ['virtualenv']
     if options.name is None:
         options.name = os.path.split(os.getcwd())[-1]
     if options.local:
         virtualenv_dir = os.path.join(os.getcwd(), '.venv')
     else:
         virtualenv_dir = os.path.join(options.virtualenv_dir, options.name)
-    argv += unknown
+    pointers = {}
+    code = 0
     for version in python_versions:
-        executable = get_python_executable(version)
-        # Needs to have the path to the python executable for that version - get it's location from the registry
         version_virtualenv_dir = '{}-{}'.format(virtualenv_dir, version)
-        subprocess.call(argv + [version_virtualenv_dir, '--python', executable], stdout=sys.stdout, stderr=sys.stderr)
-        if options.default_wheels and version_virtualenv_dir:
+        version_code = create_version(options, unknown, version, version_virtualenv_dir)
+        code = max(code, version_code)
+        if version_code == 0 and os.path.isdir(version_virtualenv_dir):
+            pointers[version] = os.path.abspath(version_virtualenv_dir)
+            register_environment(version_virtualenv_dir, version=version, project_dir=os.getcwd())
+    if pointers:
+        # Record the environments in the project so find_virtualenv can skip searching
+        update_virtualenv_pointer(os.getcwd(), pointers)
+    if not options.local:
+        # Keep the shell completion names index up to date
+        update_names_index(options.virtualenv_dir)
+    return code
+
+
+def get_clone_source(clone, version, virtualenv_dir):
+    """
+    Get the directory of the virtual environment to clone for a python version
+
+    Args:
+        clone: path of the virtual environment, or its name in the virtual environment directory
+        version: python version string for the virtual environment
+        virtualenv_dir: Directory to store the virtual environment directory
+    """
+    if os.path.isdir(clone):
+        return clone
+    return os.path.join(virtualenv_dir, '{}-{}'.format(clone, version))
+
+
+def create_version(options, unknown, version, version_virtualenv_dir):
+    """
+    Create the virtual environment for a python version, holding a lock on
+    it so that concurrent creates of the same environment wait, and then
+    reuse the environment instead of rebuilding it (even with --force)
+
+    Args:
+        options: Namespace object of parsed arguments from the command line
+                 parser
+        unknown: list of unknown arguments (passed to the backend)
+        version: python version string for the virtual environment
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Returns the exit code (non-zero if creating the environment or installing
+    the project failed)
+    """
+    with EnvironmentLock(version_virtualenv_dir) as lock:
+        if lock.waited:
+            print('Waited for another create of {}'.format(version_virtualenv_dir))
+        return _create_version(options, unknown, version, version_virtualenv_dir, force=options.force and not lock.waited)
+
+
+def _create_version(options, unknown, version, version_virtualenv_dir, force=False):
+    """
+    Create the virtual environment for a python version, skipping the phases
+    whose inputs are unchanged since they were recorded in the environment's
+    manifest. A new environment is built in a temporary sibling directory
+    and renamed into place.
+
+    Args:
+        options: Namespace object of parsed arguments from the command line
+                 parser
+        unknown: list of unknown arguments (passed to the backend)
+        version: python version string for the virtual environment
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Keyword Args:
+        force: rebuild every phase
+
+    Returns the exit code
+    """
+    # Needs to have the path to the python executable for that version - get it's location from the registry
+    executable = get_python_executable(version)
+    manifest = {} if force else read_manifest(version_virtualenv_dir)
+    python = os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON)
+    inputs = environment_inputs(options.backend, executable, unknown)
+    source = None
+    code = 0
+    if options.clone is not None:
+        source = get_clone_source(options.clone, version, options.virtualenv_dir)
+        inputs['clone'] = os.path.abspath(source)
+    if is_up_to_date(manifest, 'environment', inputs) and os.path.exists(python):
+        print('Virtual environment {} is up to date'.format(version_virtualenv_dir))
+    elif source is not None:
+        manifest = {}
+        if not os.path.isdir(source):
+            print('Virtual environment {} to clone not found'.format(source))
+            code = 1
+        elif os.path.exists(version_virtualenv_dir):
+            print('Virtual environment {} already exists, not cloning {}'.format(version_virtualenv_dir, source))
+            code = 1
+        else:
+            with staging_directory(version_virtualenv_dir) as build_dir:
+                counts = clone_environment(source, build_dir)
+                # The later phases were recorded by the source environment
+                manifest = read_manifest(build_dir)
+                manifest['environment'] = inputs
+                write_manifest(build_dir, manifest)
+                publish_environment(build_dir, version_virtualenv_dir)
+            print('Cloned {} ({})'.format(source, ', '.join('{} {}'.format(count, method) for method, count in sorted(counts.items()) if count)))
+    elif os.path.exists(version_virtualenv_dir):
+        # Unknown args are passed to the backend
+        manifest = {}
+        code = create_environment(options.backend, version, version_virtualenv_dir, executable, unknown) or 0
+        if code == 0:
+            manifest['environment'] = inputs
+            write_manifest(version_virtualenv_dir, manifest)
+    else:
+        manifest = {}
+        with staging_directory(version_virtualenv_dir) as build_dir:
+            code = create_environment(options.backend, version, build_dir, executable, unknown) or 0
+            if code == 0:
+                manifest['environment'] = inputs
+                write_manifest(build_dir, manifest)
+                publish_environment(build_dir, version_virtualenv_dir)
+    if code != 0:
+        # The later phases need the environment
+        return code
+    if options.default_wheels and version_virtualenv_dir:
+        inputs = wheels_inputs(get_default_wheels_dir(), version)
+        if not is_up_to_date(manifest, 'wheels', inputs):
             # Install into target dir
             install_default_wheels(version, version_virtualenv_dir)
-        # Find the setup.py and run develop if possible
-        install_module_as_develop(version_virtualenv_dir)
+            manifest.pop('develop', None)
+            manifest.pop('precompile', None)
+            if 'environment' in manifest:
+                manifest['wheels'] = inputs
+                write_manifest(version_virtualenv_dir, manifest)
+    # Find the setup.py and run develop if possible
+    inputs = develop_inputs(os.getcwd())
+    if not is_up_to_date(manifest, 'develop', inputs):
+        manifest.pop('precompile', None)
+        develop_code = install_module_as_develop(version_virtualenv_dir, version) or 0
+        code = max(code, develop_code)
+        if develop_code == 0 and 'environment' in manifest:
+            manifest['develop'] = inputs
+            write_manifest(version_virtualenv_dir, manifest)
+    # Compile the bytecode so the first imports are fast
+    if options.precompile and os.path.exists(python):
+        inputs = precompile_inputs(version_virtualenv_dir, version)
+        if not is_up_to_date(manifest, 'precompile', inputs):
+            precompile(version_virtualenv_dir, version, options.workers)
+            if 'environment' in manifest:
+                manifest['precompile'] = inputs
+                write_manifest(version_virtualenv_dir, manifest)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(create(sys.argv[1:]))
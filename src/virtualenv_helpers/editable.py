@@ -0,0 +1,347 @@
+"""
+editable.py
+***********
+Install the project in the current directory as editable without running
+setup.py develop, by writing a .pth file pointing at the project's source root
+and a minimal .dist-info directory straight into the environment's
+site-packages.
+
+The metadata is read from setup.cfg if it declares the name and version,
+otherwise from a single setup.py egg_info run, which is cached by the hash of
+the project's setup files (unless the version is computed from version
+control, e.g. with versioneer or setuptools_scm, as it changes without them).
+A non-editable install of the project is uninstalled using its RECORD first.
+Projects with console or gui scripts, C extensions or custom commands, with
+requirements that are not installed yet, or installed without a RECORD, need
+setup.py develop, which is reported by raising UnsupportedProject.
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+try:
+    from configparser import RawConfigParser
+except ImportError:
+    from ConfigParser import RawConfigParser
+
+from .cache import get_cache_dir
+from .manifest import develop_inputs
+from .tracing import traced
+from .wheels import INSTALLER
+from .wheels import canonical_name
+from .wheels import get_site_packages
+from .wheels import installed_distributions
+from .wheels import marker_applies
+from .wheels import requirement_name
+from .wheels import uninstall_distribution
+from .wheels import write_record
+
+is_windows = sys.platform.startswith('win')
+
+if is_windows:
+    SCRIPT_DIR = 'Scripts'
+    PYTHON = 'python.exe'
+else:
+    SCRIPT_DIR = 'bin'
+    PYTHON = 'python'
+
+SETUP_PY_ONLY = ('ext_modules', 'Extension(', 'cmdclass', 'entry_points', 'scripts=')
+DYNAMIC_VERSION = ('versioneer', 'setuptools_scm', 'use_scm_version')
+
+
+class UnsupportedProject(Exception):
+    """Raised when a project needs setup.py develop to be installed"""
+
+
+def _lines(value):
+    """Split a multi-line setup.cfg value into its non-empty lines"""
+    return [line.strip() for line in value.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+def _package_root(project_dir, package_dir):
+    """
+    Get the source root from a setup.cfg package_dir value (e.g. =src)
+
+    Args:
+        project_dir: the project directory
+        package_dir: the package_dir value
+    """
+    for line in _lines(package_dir.replace(',', '\n')):
+        key, _, value = line.partition('=')
+        if not key.strip() and value.strip():
+            return os.path.join(project_dir, value.strip())
+    return project_dir
+
+
+def read_setup_cfg(project_dir):
+    """
+    Read the metadata of a project from its setup.cfg
+
+    Args:
+        project_dir: the project directory
+
+    Returns a dictionary of the metadata, or None if setup.cfg does not declare
+    the name and a literal (or file:) version
+
+    Raises UnsupportedProject if setup.cfg declares scripts
+    """
+    parser = RawConfigParser()
+    if not parser.read(os.path.join(project_dir, 'setup.cfg')) or not parser.has_section('metadata'):
+        return None
+
+    def get(section, option):
+        return parser.get(section, option) if parser.has_option(section, option) else ''
+    name = get('metadata', 'name').strip()
+    version = get('metadata', 'version').strip()
+    if version.startswith('file:'):
+        try:
+            with open(os.path.join(project_dir, version[len('file:'):].strip())) as f:
+                version = f.read().strip()
+        except (IOError, OSError):
+            return None
+    if not name or not version or version.startswith('attr:'):
+        return None
+    if get('options', 'scripts').strip() or get('options', 'entry_points').strip():
+        raise UnsupportedProject('{} has scripts'.format(name))
+    for group in ('console_scripts', 'gui_scripts'):
+        if get('options.entry_points', group).strip():
+            raise UnsupportedProject('{} has {}'.format(name, group))
+    return {'name': name,
+            'version': version,
+            'requires': _lines(get('options', 'install_requires')),
+            'requires_python': get('options', 'python_requires').strip(),
+            'source_root': _package_root(project_dir, get('options', 'package_dir'))}
+
+
+def read_egg_info(egg_info_dir, project_dir):
+    """
+    Read the metadata of a project from an egg-info directory
+
+    Args:
+        egg_info_dir: the egg-info directory
+        project_dir: the project directory
+
+    Raises UnsupportedProject if the project has scripts
+    """
+    def read(filename):
+        try:
+            with open(os.path.join(egg_info_dir, filename)) as f:
+                return f.read()
+        except (IOError, OSError):
+            return ''
+    headers = {}
+    for line in read('PKG-INFO').splitlines():
+        if not line.strip():
+            break
+        key, _, value = line.partition(':')
+        headers.setdefault(key.strip(), value.strip())
+    section = None
+    for line in _lines(read('entry_points.txt')):
+        if line.startswith('['):
+            section = line.strip('[]').strip()
+        elif section in ('console_scripts', 'gui_scripts'):
+            raise UnsupportedProject('{} has {}'.format(headers.get('Name'), section))
+    if read('scripts').strip() or os.path.isdir(os.path.join(egg_info_dir, 'scripts')):
+        raise UnsupportedProject('{} has scripts'.format(headers.get('Name')))
+    requires = []
+    marker = ''
+    for line in _lines(read('requires.txt')):
+        if line.startswith('['):
+            extra, _, marker = line.strip('[]').partition(':')
+            # Extras are not installed
+            marker = None if extra else marker
+        elif marker is not None:
+            requires.append('{}; {}'.format(line, marker) if marker else line)
+    top_level = _lines(read('top_level.txt'))
+    source_root = project_dir
+    found = [name for name in top_level if os.path.exists(os.path.join(project_dir, name)) or os.path.exists(os.path.join(project_dir, name + '.py'))]
+    if top_level and not found:
+        if os.path.isdir(os.path.join(project_dir, 'src')):
+            source_root = os.path.join(project_dir, 'src')
+    return {'name': headers.get('Name', ''),
+            'version': headers.get('Version', ''),
+            'requires': requires,
+            'requires_python': headers.get('Requires-Python', ''),
+            'top_level': top_level,
+            'source_root': source_root}
+
+
+def has_dynamic_version(project_dir):
+    """
+    Check if a project computes its version from version control (so it can
+    change when the setup files do not)
+
+    Args:
+        project_dir: the project directory
+    """
+    for name in ('setup.py', 'setup.cfg', 'pyproject.toml'):
+        try:
+            with open(os.path.join(project_dir, name)) as f:
+                content = f.read()
+        except (IOError, OSError):
+            continue
+        if any(keyword in content for keyword in DYNAMIC_VERSION):
+            return True
+    return False
+
+
+@traced
+def run_egg_info(project_dir, python):
+    """
+    Get the egg-info directory of a project, running setup.py egg_info once
+    for each version of the project's setup files (or every time if the
+    project's version is computed from version control)
+
+    Args:
+        project_dir: the project directory
+        python: the python executable to run setup.py with
+
+    Returns the path to the cached egg-info directory, or None if egg_info
+    failed
+    """
+    key = hashlib.sha256(json.dumps(develop_inputs(project_dir), sort_keys=True).encode('utf-8')).hexdigest()
+    cache_dir = get_cache_dir('egg_info')
+    cached = os.path.join(cache_dir, key)
+    dynamic = has_dynamic_version(project_dir)
+    if dynamic or not os.path.isdir(cached):
+        egg_base = tempfile.mkdtemp(dir=cache_dir)
+        try:
+            code = subprocess.call([python, 'setup.py', '-q', 'egg_info', '--egg-base', egg_base], cwd=project_dir,
+                                   stdout=sys.stdout, stderr=sys.stderr)
+            if code != 0 or not [entry for entry in os.listdir(egg_base) if entry.endswith('.egg-info')]:
+                return None
+            if dynamic and os.path.isdir(cached):
+                shutil.rmtree(cached, ignore_errors=True)
+            try:
+                os.rename(egg_base, cached)
+            except OSError:
+                # Another process cached it first
+                if not os.path.isdir(cached):
+                    raise
+        finally:
+            if os.path.isdir(egg_base):
+                shutil.rmtree(egg_base, ignore_errors=True)
+    for entry in os.listdir(cached):
+        if entry.endswith('.egg-info'):
+            return os.path.join(cached, entry)
+    return None
+
+
+def missing_requirements(requires, site_packages, version):
+    """
+    Get the requirements that are not installed in site-packages
+
+    Args:
+        requires: list of requirement strings (with optional markers)
+        site_packages: the virtual environment site-packages directory
+        version: python version string for the virtual environment
+    """
+    installed = installed_distributions(site_packages)
+    missing = []
+    for requirement in requires:
+        name = requirement_name(requirement)
+        marker = requirement.partition(';')[2].strip()
+        if name is None or (marker and not marker_applies(marker, version)):
+            continue
+        if canonical_name(name) not in installed:
+            missing.append(requirement.partition(';')[0].strip())
+    return missing
+
+
+def remove_editable(site_packages, name):
+    """
+    Remove a previous editable install of a distribution using its RECORD
+
+    Args:
+        site_packages: the virtual environment site-packages directory
+        name: distribution name
+    """
+    for entry in os.listdir(site_packages):
+        if not entry.endswith('.dist-info') or canonical_name(entry.split('-')[0]) != canonical_name(name):
+            continue
+        dist_info = os.path.join(site_packages, entry)
+        try:
+            with open(os.path.join(dist_info, 'INSTALLER')) as f:
+                installer = f.read().strip()
+            with open(os.path.join(dist_info, 'RECORD')) as f:
+                paths = [line.split(',')[0] for line in f if line.strip()]
+        except (IOError, OSError):
+            continue
+        if installer != INSTALLER or not os.path.exists(os.path.join(dist_info, 'direct_url.json')):
+            continue
+        for path in paths:
+            try:
+                os.remove(os.path.join(site_packages, path))
+            except OSError:
+                pass
+        shutil.rmtree(dist_info, ignore_errors=True)
+
+
+@traced
+def install_editable(project_dir, version_virtualenv_dir, version):
+    """
+    Install a project as editable by writing a .pth file and a minimal
+    .dist-info directory into the environment's site-packages
+
+    Args:
+        project_dir: the project directory
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Returns the path to the .dist-info directory
+
+    Raises UnsupportedProject if the project needs setup.py develop
+    """
+    project_dir = os.path.abspath(project_dir)
+    setup_py = os.path.join(project_dir, 'setup.py')
+    if os.path.exists(setup_py):
+        with open(setup_py) as f:
+            content = f.read()
+        for keyword in SETUP_PY_ONLY:
+            if keyword in content:
+                raise UnsupportedProject('setup.py uses {}'.format(keyword.rstrip('(=')))
+    metadata = read_setup_cfg(project_dir)
+    if metadata is None:
+        python = os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON)
+        egg_info = run_egg_info(project_dir, python)
+        if egg_info is None:
+            raise UnsupportedProject('setup.py egg_info failed')
+        metadata = read_egg_info(egg_info, project_dir)
+    if not metadata['name'] or not metadata['version']:
+        raise UnsupportedProject('the project has no name or version')
+    site_packages = get_site_packages(version_virtualenv_dir, version)
+    missing = missing_requirements(metadata['requires'], site_packages, version)
+    if missing:
+        raise UnsupportedProject('{} are not installed'.format(', '.join(missing)))
+    remove_editable(site_packages, metadata['name'])
+    if canonical_name(metadata['name']) in installed_distributions(site_packages):
+        # Installed by another installer (e.g. pip), which would shadow the editable install
+        if not uninstall_distribution(metadata['name'], version_virtualenv_dir, version):
+            raise UnsupportedProject('{} is installed without a RECORD'.format(metadata['name']))
+    distribution = '{}-{}'.format(re.sub(r'[^\w\d.]+', '_', metadata['name']), re.sub(r'[^\w\d.+]+', '_', metadata['version']))
+    dist_info = os.path.join(site_packages, distribution + '.dist-info')
+    os.makedirs(dist_info)
+    lines = ['Metadata-Version: 2.1', 'Name: {}'.format(metadata['name']), 'Version: {}'.format(metadata['version'])]
+    if metadata['requires_python']:
+        lines.append('Requires-Python: {}'.format(metadata['requires_python']))
+    lines += ['Requires-Dist: {}'.format(requirement) for requirement in metadata['requires']]
+    url = 'file:' + ('///' + project_dir.replace('\\', '/').lstrip('/'))
+    files = [(os.path.join(site_packages, '__editable__.{}.pth'.format(distribution)), metadata['source_root'] + '\n'),
+             (os.path.join(dist_info, 'METADATA'), '\n'.join(lines) + '\n'),
+             (os.path.join(dist_info, 'INSTALLER'), '{}\n'.format(INSTALLER)),
+             (os.path.join(dist_info, 'direct_url.json'), json.dumps({'url': url, 'dir_info': {'editable': True}}))]
+    if metadata.get('top_level'):
+        files.append((os.path.join(dist_info, 'top_level.txt'), '\n'.join(metadata['top_level']) + '\n'))
+    records = []
+    for path, text in files:
+        data = text.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        records.append((path, data))
+    write_record(os.path.join(dist_info, 'RECORD'), records, site_packages)
+    return dist_info
@@ -6,6 +6,16 @@ name/path or recursive searching of the path or from the VENV_DIR
 environmental variable directory.
 """
 import os
+import re
+import glob
+import tempfile
+
+from .mru import find_last_used
+from .tracing import traced
+
+NAMES_INDEX = '.venv_names'
+POINTER_FILE = '.venv-path'
+_version_suffix = re.compile(r'^(?P<name>.+)-(?P<version>\d+(\.\d+)*)$')
 
 
 def get_virtualenv_dir():
@@ -117,22 +127,188 @@ def find_recursive_path_local_env(python_version, max_levels=None):
     return recursive_check(find_local_env, python_version, max_levels)
 
 
+def read_virtualenv_pointer(project_dir):
+    """
+    Read the pointer file written by create in a project directory, returning a
+    dictionary of python version to virtual environment path (empty if there
+    is no pointer file)
+
+    Args:
+        project_dir: the project directory to read the pointer file from
+    """
+    try:
+        with open(os.path.join(project_dir, POINTER_FILE)) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return {}
+    pointers = {}
+    for line in lines:
+        if line.startswith('#'):
+            continue
+        version, sep, path = line.partition('=')
+        if sep:
+            pointers[version.strip()] = path.strip()
+    return pointers
+
+
+def update_virtualenv_pointer(project_dir, pointers):
+    """
+    Update the pointer file in a project directory
+
+    Args:
+        project_dir: the project directory to write the pointer file to
+        pointers: dictionary of python version to virtual environment path, a
+                  path of None removes that version from the pointer file
+    """
+    current_pointers = read_virtualenv_pointer(project_dir)
+    current_pointers.update(pointers)
+    current_pointers = dict((version, path) for version, path in current_pointers.items() if path is not None)
+    pointer_path = os.path.join(project_dir, POINTER_FILE)
+    if not current_pointers:
+        if os.path.exists(pointer_path):
+            os.remove(pointer_path)
+        return
+    with open(pointer_path, 'w') as f:
+        f.write('# Virtual environments created by virtualenv_helpers (python version = path)\n')
+        for version in sorted(current_pointers):
+            f.write('{} = {}\n'.format(version, current_pointers[version]))
+
+
+def find_virtualenv_pointer(python_version, max_levels=None):
+    """
+    Find the nearest pointer file for the current (or higher) path that has an
+    entry for the python version, returning the project directory containing
+    it and the virtual environment path it points to
+
+    Args:
+        python_version: python version string
+
+    Keyword Args:
+        max_levels: integer number of levels to check (if None, checks to the system root)
+    """
+    if python_version is None:
+        return None, None
+    current_dir = os.getcwd()
+    levels_checked = 0
+    while len(os.path.split(current_dir)[-1]):
+        pointed_path = read_virtualenv_pointer(current_dir).get(python_version, None)
+        if pointed_path is not None:
+            return current_dir, pointed_path
+        levels_checked += 1
+        if max_levels is not None and levels_checked >= max_levels:
+            break
+        current_dir = os.path.split(current_dir)[0]
+    return None, None
+
+
+def find_registered_virtualenv(python_version, max_levels=None):
+    """
+    Find the virtual environment registered by create for the current (or
+    higher) project directory, returning the virtual environment path and the
+    project directory
+
+    Args:
+        python_version: python version string
+
+    Keyword Args:
+        max_levels: integer number of levels to check (if None, checks to the system root)
+    """
+    # The registry uses find, so is imported here
+    from .registry import read_environments
+    if python_version is None:
+        return None, None
+    project_dirs = []
+    current_dir = os.getcwd()
+    while len(os.path.split(current_dir)[-1]):
+        project_dirs.append(current_dir)
+        if max_levels is not None and len(project_dirs) >= max_levels:
+            break
+        current_dir = os.path.split(current_dir)[0]
+    # A single query for the current and higher directories, using the project_dir index
+    registered = {}
+    for record in read_environments(project_dir=project_dirs, version=python_version):
+        registered.setdefault(record['project_dir'], record['path'])
+    for project_dir in project_dirs:
+        path = registered.get(project_dir, None)
+        if path is not None and os.path.exists(path):
+            return path, project_dir
+    return None, None
+
+
+@traced
 def find_virtualenv(python_version, max_levels=None):
     """
     Find a virual environment directory for the current (or higher) path
+
+    The environment last activated for the project is checked first (with a
+    single stat), and used unless the other strategies find an environment in
+    a closer directory. Then the pointer file written by create and the
+    registry are checked. If the environment the pointer file points to no
+    longer exists, the search falls back to checking the local and VENV_DIR
+    directories and the pointer file is repaired.
+
     Args:
         python_version: python version string
 
     Keyword Args:
         max_levels: integer number of levels to check (if None, checks to the system root)
     """
-    venv_dir = None
-    matching_path = None
+    venv_dir, matching_path = find_last_used(python_version, max_levels)
+    if venv_dir is not None:
+        levels = get_levels(matching_path)
+        if levels > 0:
+            # Only use it if no other environment is closer to the current directory
+            closer_dir, closer_path = search_virtualenv(python_version, max_levels=levels)
+            if closer_dir is not None:
+                return closer_dir, closer_path
+        return venv_dir, matching_path
+    return search_virtualenv(python_version, max_levels)
+
+
+def get_levels(project_dir):
+    """
+    Get the number of levels a directory is above the current directory
+
+    Args:
+        project_dir: the current directory or one of its parents
+    """
+    relative_path = os.path.relpath(os.getcwd(), project_dir)
+    return 0 if relative_path == os.curdir else len(relative_path.split(os.sep))
+
+
+def search_virtualenv(python_version, max_levels=None):
+    """
+    Search for a virual environment directory for the current (or higher)
+    path, using the pointer file written by create, the registry and the
+    local and VENV_DIR directories (see find_virtualenv)
+
+    Args:
+        python_version: python version string
+
+    Keyword Args:
+        max_levels: integer number of levels to check (if None, checks to the system root)
+    """
+    pointer_dir, pointed_path = find_virtualenv_pointer(python_version, max_levels)
+    if pointed_path is not None and os.path.exists(pointed_path):
+        return pointed_path, pointer_dir
+    venv_dir, matching_path = find_registered_virtualenv(python_version, max_levels)
+    if venv_dir is not None and matching_path != pointer_dir:
+        return venv_dir, matching_path
+    versioned = venv_dir is not None
     for function in [find_local_env, find_recursive_path_venv, find_recursive_path_local_env]:
         if venv_dir is None:
             venv_dir, matching_path = function(python_version, max_levels=max_levels)
+            versioned = venv_dir is not None
         if venv_dir is None:
             venv_dir, matching_path = function(None, max_levels=max_levels)
+    if pointer_dir is not None:
+        # The environment the pointer file refers to has gone, it is only replaced
+        # by an environment for the version found for the same directory
+        repaired = venv_dir if versioned and matching_path == pointer_dir else None
+        try:
+            update_virtualenv_pointer(pointer_dir, {python_version: repaired})
+        except (IOError, OSError):
+            pass
     return venv_dir, matching_path
 
 
@@ -177,3 +353,205 @@ def get_virtualenv_path(python_version, virtualenv_path=None, max_levels=None):
     else:
         virtualenv_path, matching_path = find_virtualenv(python_version, max_levels)
     return virtualenv_path, matching_path
+
+
+def find_virtualenvs(python_versions=None, virtualenv_path=None, max_levels=None):
+    """
+    Find every python version's virtual environment of a project (e.g. abc-2.7
+    and abc-3.6), from the pointer file written by create, the registry, the
+    names index of the VENV_DIR directory and local .venv-<version> folders
+
+    Keyword Args:
+        python_versions: list of python version strings to include (if None,
+                         includes every version)
+        virtualenv_path: name or path of the virtual environments (without
+                         the python version), if None the project is found
+                         from the current (or higher) path
+        max_levels: integer number of levels to check (if None, checks to the system root)
+
+    Returns a sorted list of virtual environment paths
+    """
+    # The registry uses find, so is imported here
+    from .registry import read_environments
+    registered = [u for u in read_environments() if u['version'] is not None]
+    found = {}
+    if virtualenv_path is not None:
+        name = os.path.split(os.path.normpath(virtualenv_path))[-1]
+        for path in glob.glob('{}-*'.format(virtualenv_path)):
+            found[os.path.abspath(path)] = split_virtualenv_name(os.path.split(path)[-1])[1]
+        found.update((u['path'], u['version']) for u in registered if u['name'] == name)
+    else:
+        # The project is the nearest directory with a pointer file or registered environments
+        registered_dirs = set(u['project_dir'] for u in registered)
+        project_dir = os.getcwd()
+        current_dir = project_dir
+        levels_checked = 0
+        while len(os.path.split(current_dir)[-1]):
+            pointers = read_virtualenv_pointer(current_dir)
+            if pointers or current_dir in registered_dirs:
+                project_dir = current_dir
+                for version, path in pointers.items():
+                    found[os.path.abspath(path)] = version
+                break
+            levels_checked += 1
+            if max_levels is not None and levels_checked >= max_levels:
+                break
+            current_dir = os.path.split(current_dir)[0]
+        name = os.path.split(project_dir)[-1]
+        for path in glob.glob(os.path.join(project_dir, '.venv-*')):
+            found[os.path.abspath(path)] = split_virtualenv_name(os.path.split(path)[-1])[1]
+        found.update((u['path'], u['version']) for u in registered if u['project_dir'] == project_dir)
+    virtualenv_dir = get_virtualenv_dir()
+    for virtualenv_name in get_virtualenv_names(virtualenv_dir):
+        base_name, version = split_virtualenv_name(virtualenv_name)
+        if base_name == name and version is not None:
+            found[os.path.abspath(os.path.join(virtualenv_dir, virtualenv_name))] = version
+    return sorted(path for path, version in found.items()
+                  if version is not None and (python_versions is None or version in python_versions) and os.path.isdir(path))
+
+
+def split_virtualenv_name(virtualenv_name):
+    """
+    Split a virtual environment directory name into the name and python version
+    (None if the name has no version suffix)
+
+    Args:
+        virtualenv_name: directory name of the virtual environment (e.g. test-3.6)
+    """
+    match = _version_suffix.match(virtualenv_name)
+    if match is None:
+        return virtualenv_name, None
+    return match.group('name'), match.group('version')
+
+
+def scan_virtualenv_names(virtualenv_dir=None):
+    """
+    Scan the virtual environment directory for the names that can be used
+    with workon, both with and without the python version suffix
+
+    Keyword Args:
+        virtualenv_dir: directory to scan (defaults to the VENV_DIR directory)
+    """
+    if virtualenv_dir is None:
+        virtualenv_dir = get_virtualenv_dir()
+    names = set()
+    if not os.path.isdir(virtualenv_dir):
+        return []
+    if hasattr(os, 'scandir'):
+        entries = [entry.name for entry in os.scandir(virtualenv_dir) if entry.is_dir()]
+    else:
+        entries = [u for u in os.listdir(virtualenv_dir) if os.path.isdir(os.path.join(virtualenv_dir, u))]
+    for entry in entries:
+        if entry.startswith('.'):
+            continue
+        names.add(entry)
+        names.add(split_virtualenv_name(entry)[0])
+    return sorted(names)
+
+
+def get_names_index_path(virtualenv_dir=None):
+    """
+    Get the path to the names index file used for shell completion
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    if virtualenv_dir is None:
+        virtualenv_dir = get_virtualenv_dir()
+    return os.path.join(virtualenv_dir, NAMES_INDEX)
+
+
+def names_index_is_stale(virtualenv_dir=None):
+    """
+    Check if the names index is missing or older than the virtual environment
+    directory (which changes mtime when an environment is added or removed)
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    if virtualenv_dir is None:
+        virtualenv_dir = get_virtualenv_dir()
+    try:
+        return os.stat(virtualenv_dir).st_mtime > os.stat(get_names_index_path(virtualenv_dir)).st_mtime
+    except OSError:
+        return True
+
+
+def update_names_index(virtualenv_dir=None):
+    """
+    Regenerate the names index for the virtual environment directory
+
+    The index is written to a temporary file and renamed into place, then
+    touched so that it is not older than the directory the rename modified.
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    if virtualenv_dir is None:
+        virtualenv_dir = get_virtualenv_dir()
+    names = scan_virtualenv_names(virtualenv_dir)
+    if not os.path.isdir(virtualenv_dir):
+        return names
+    index_path = get_names_index_path(virtualenv_dir)
+    handle, temp_path = tempfile.mkstemp(prefix=NAMES_INDEX, dir=virtualenv_dir)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write(''.join(name+'\n' for name in names))
+        getattr(os, 'replace', os.rename)(temp_path, index_path)
+        os.utime(index_path, None)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return names
+
+
+def get_virtualenv_names(virtualenv_dir=None):
+    """
+    Get the virtual environment names from the names index, regenerating it if
+    it is stale
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    if names_index_is_stale(virtualenv_dir):
+        return update_names_index(virtualenv_dir)
+    with open(get_names_index_path(virtualenv_dir)) as f:
+        return [u for u in f.read().splitlines() if u]
+
+
+def get_virtualenv_paths(virtualenv_dir=None):
+    """
+    Get the paths of the virtual environments in the virtual environment
+    directory
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    if virtualenv_dir is None:
+        virtualenv_dir = get_virtualenv_dir()
+    if not os.path.isdir(virtualenv_dir):
+        return []
+    return [os.path.join(virtualenv_dir, u) for u in sorted(os.listdir(virtualenv_dir))
+            if not u.startswith('.') and os.path.isdir(os.path.join(virtualenv_dir, u))]
+
+
+def find_site_packages(version_virtualenv_dir):
+    """
+    Find the site-packages directories of a virtual environment without
+    knowing its python version
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    patterns = [os.path.join(version_virtualenv_dir, 'lib', 'python*', 'site-packages'),
+                os.path.join(version_virtualenv_dir, 'Lib', 'site-packages')]
+    site_packages = []
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            # lib and Lib are the same directory on case-insensitive filesystems
+            stat = os.stat(path)
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                site_packages.append(path)
+    return site_packages
@@ -0,0 +1,368 @@
+"""
+health.py
+*********
+Check that virtual environments still work, e.g. after the system python has
+been upgraded or moved, and repair them in place.
+
+Each environment is checked with a few stats (no interpreter is run):
+
+interpreter: the environment's python exists (and is not a broken symlink)
+home: the pyvenv.cfg home directory exists and has a python in it
+stdlib: the base python's standard library for the environment's python
+        version exists (and pyvenv.cfg is for the same version)
+
+Repairing re-points the environment at an interpreter for the same python
+version (from the pyvenv.cfg home, or found on the PATH): the python
+symlinks (or copies) in the environment, pyvenv.cfg and the create manifest
+are updated, without recreating the environment or reinstalling anything.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .find import find_site_packages
+from .find import get_virtualenv_dir
+from .find import get_virtualenv_paths
+from .find import split_virtualenv_name
+from .manifest import environment_inputs
+from .manifest import find_executable
+from .manifest import read_manifest
+from .manifest import write_manifest
+from .registry import read_environments
+from .registry import read_pyvenv_cfg
+from .registry import register_environment
+
+is_windows = sys.platform.startswith('win')
+
+if is_windows:
+    SCRIPT_DIR = 'Scripts'
+    PYTHON = 'python.exe'
+else:
+    SCRIPT_DIR = 'bin'
+    PYTHON = 'python'
+
+
+def get_environment_version(version_virtualenv_dir):
+    """
+    Get the python version (major.minor) of a virtual environment, from its
+    lib/pythonX.Y directory, pyvenv.cfg or its name
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    for site_packages in find_site_packages(version_virtualenv_dir):
+        lib = os.path.split(os.path.dirname(site_packages))[-1]
+        if lib.startswith('python'):
+            return lib[len('python'):]
+    settings = read_pyvenv_cfg(version_virtualenv_dir)
+    version = settings.get('version', settings.get('version_info', ''))
+    if version:
+        return '.'.join(version.split('.')[:2])
+    return split_virtualenv_name(os.path.split(os.path.abspath(version_virtualenv_dir))[-1])[1]
+
+
+def _home_pythons(home, version):
+    """Get the candidate python executables in a pyvenv.cfg home directory"""
+    if is_windows:
+        return [os.path.join(home, 'python.exe')]
+    names = ['python{}'.format(version)] if version else []
+    return [os.path.join(home, u) for u in names + ['python3', 'python']]
+
+
+def _stdlib_path(home, version):
+    """Get the path of a module in the standard library of the base python for a home directory"""
+    if is_windows:
+        return os.path.join(home, 'Lib', 'os.py')
+    return os.path.join(os.path.dirname(home), 'lib', 'python{}'.format(version), 'os.py')
+
+
+def check_environment(version_virtualenv_dir):
+    """
+    Check a virtual environment's interpreter, pyvenv.cfg home and standard
+    library
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Returns a dictionary with the path, python version, whether it is ok and
+    the result of each check (ok is None for checks that do not apply)
+    """
+    path = os.path.abspath(version_virtualenv_dir)
+    version = get_environment_version(path)
+    checks = {}
+    python = os.path.join(path, SCRIPT_DIR, PYTHON)
+    if os.path.exists(python):
+        checks['interpreter'] = {'ok': True, 'detail': os.path.realpath(python)}
+    elif os.path.islink(python):
+        checks['interpreter'] = {'ok': False, 'detail': 'broken symlink to {}'.format(os.readlink(python))}
+    else:
+        checks['interpreter'] = {'ok': False, 'detail': '{} not found'.format(python)}
+    settings = read_pyvenv_cfg(path)
+    home = settings.get('home', None)
+    if home is None:
+        # e.g. environments created by virtualenv before version 20
+        checks['home'] = {'ok': None, 'detail': 'no pyvenv.cfg home'}
+        checks['stdlib'] = {'ok': None, 'detail': 'no pyvenv.cfg home'}
+    elif not os.path.isdir(home):
+        checks['home'] = {'ok': False, 'detail': '{} not found'.format(home)}
+        checks['stdlib'] = {'ok': False, 'detail': '{} not found'.format(home)}
+    else:
+        pythons = [u for u in _home_pythons(home, version) if os.path.exists(u)]
+        if pythons:
+            checks['home'] = {'ok': True, 'detail': home}
+        else:
+            checks['home'] = {'ok': False, 'detail': 'no python found in {}'.format(home)}
+        cfg_version = '.'.join(settings.get('version', settings.get('version_info', '')).split('.')[:2])
+        stdlib = _stdlib_path(home, version)
+        if version is None:
+            checks['stdlib'] = {'ok': None, 'detail': 'unknown python version'}
+        elif cfg_version and cfg_version != version:
+            checks['stdlib'] = {'ok': False, 'detail': 'pyvenv.cfg is for python {}, the environment is python {}'.format(cfg_version, version)}
+        elif not os.path.exists(stdlib):
+            checks['stdlib'] = {'ok': False, 'detail': '{} not found'.format(stdlib)}
+        else:
+            checks['stdlib'] = {'ok': True, 'detail': os.path.dirname(stdlib)}
+    return {'path': path, 'version': version, 'ok': all(u['ok'] is not False for u in checks.values()),
+            'checks': checks, 'repaired': False}
+
+
+def find_interpreter(version_virtualenv_dir, version):
+    """
+    Find an interpreter for a virtual environment's python version, from the
+    pyvenv.cfg home directory or the PATH
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string (major.minor)
+
+    Returns the real path of the interpreter, or None if none is found
+    """
+    home = read_pyvenv_cfg(version_virtualenv_dir).get('home', None)
+    candidates = _home_pythons(home, version)[:1] if home else []
+    candidates.append(find_executable('python{}'.format(version)) or '')
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return os.path.realpath(candidate)
+    return None
+
+
+def get_full_version(interpreter):
+    """
+    Get the full version string (e.g. 3.6.15) of an interpreter by running it
+
+    Args:
+        interpreter: path to the python executable
+    """
+    output = subprocess.check_output([interpreter, '-c', 'import sys; print(".".join(str(u) for u in sys.version_info[:3]))'])
+    return output.decode('utf-8').strip()
+
+
+def _replace(path, function):
+    """Replace a file by creating a temporary file with function and renaming it into place"""
+    temp_path = '{}.{}.repair'.format(path, os.getpid())
+    function(temp_path)
+    getattr(os, 'replace', os.rename)(temp_path, path)
+
+
+def relink_interpreter(version_virtualenv_dir, version, interpreter):
+    """
+    Point the python executables in a virtual environment at a new
+    interpreter: symlinks to a python outside the environment are replaced
+    and copies of the interpreter are copied again (links between the
+    executables in the environment are kept)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string (major.minor)
+        interpreter: path to the new interpreter
+
+    Returns the list of executables updated
+    """
+    if is_windows:
+        # The python.exe launcher finds the interpreter from the pyvenv.cfg home
+        return []
+    script_dir = os.path.join(os.path.abspath(version_virtualenv_dir), SCRIPT_DIR)
+    updated = []
+    for name in ('python', 'python3', 'python{}'.format(version)):
+        path = os.path.join(script_dir, name)
+        if os.path.islink(path):
+            target = os.readlink(path)
+            if not os.path.isabs(target) and os.path.dirname(os.path.normpath(os.path.join(script_dir, target))) == script_dir:
+                # Points at another python in the environment
+                continue
+            _replace(path, lambda temp_path: os.symlink(interpreter, temp_path))
+        elif os.path.isfile(path):
+            _replace(path, lambda temp_path: shutil.copy2(interpreter, temp_path))
+        else:
+            continue
+        updated.append(name)
+    if not updated:
+        path = os.path.join(script_dir, PYTHON)
+        if not os.path.lexists(path) and os.path.isdir(script_dir):
+            os.symlink(interpreter, path)
+            updated.append(PYTHON)
+    return updated
+
+
+def update_pyvenv_cfg(version_virtualenv_dir, interpreter, full_version):
+    """
+    Point pyvenv.cfg at a new interpreter (home, executable and version)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        interpreter: path to the new interpreter
+        full_version: full version string of the interpreter
+    """
+    path = os.path.join(version_virtualenv_dir, 'pyvenv.cfg')
+    values = {'home': os.path.dirname(interpreter), 'executable': interpreter,
+              'version': full_version, 'version_info': full_version}
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        lines = ['home = {}'.format(values['home']), 'version = {}'.format(full_version)]
+    updated = []
+    for line in lines:
+        key = line.partition('=')[0].strip()
+        updated.append('{} = {}'.format(key, values[key]) if key in values and '=' in line else line)
+
+    def write(temp_path):
+        with open(temp_path, 'w') as f:
+            f.write('\n'.join(updated) + '\n')
+    _replace(path, write)
+
+
+def repair_environment(version_virtualenv_dir, result=None):
+    """
+    Re-point a virtual environment at an interpreter for its python version
+    in place
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Keyword Args:
+        result: the result of check_environment (checked if None)
+
+    Returns the result of checking the environment again, with repaired set
+    if it was changed (and an error if it could not be repaired)
+    """
+    if result is None:
+        result = check_environment(version_virtualenv_dir)
+    if result['ok']:
+        return result
+    version = result['version']
+    interpreter = find_interpreter(version_virtualenv_dir, version) if version else None
+    if interpreter is None:
+        result['error'] = 'no python {} found, the environment needs to be recreated'.format(version or '')
+        return result
+    try:
+        full_version = get_full_version(interpreter)
+        relink_interpreter(version_virtualenv_dir, version, interpreter)
+        update_pyvenv_cfg(version_virtualenv_dir, interpreter, full_version)
+    except (subprocess.CalledProcessError, IOError, OSError) as e:
+        result['error'] = 'unable to repair: {}'.format(e)
+        return result
+    manifest = read_manifest(version_virtualenv_dir)
+    if 'environment' in manifest:
+        # So create does not rebuild the environment for the new interpreter
+        environment = manifest['environment']
+        manifest['environment'] = environment_inputs(environment.get('backend', None), interpreter, environment.get('args', []))
+        write_manifest(version_virtualenv_dir, manifest)
+    repaired = check_environment(version_virtualenv_dir)
+    repaired['repaired'] = True
+    repaired['interpreter'] = interpreter
+    return repaired
+
+
+def check_environments(version_virtualenv_dirs, repair=False, workers=None):
+    """
+    Check (and optionally repair) virtual environments using a thread pool
+
+    Args:
+        version_virtualenv_dirs: list of virtual environment directories
+
+    Keyword Args:
+        repair: repair the environments that fail a check
+        workers: number of threads to use (defaults to the CPU count)
+
+    Returns a list of the results
+    """
+    if not version_virtualenv_dirs:
+        return []
+    function = repair_environment if repair else check_environment
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(version_virtualenv_dirs)))
+    try:
+        return pool.map(function, version_virtualenv_dirs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_environment_paths(virtualenv_dir=None):
+    """
+    Get the virtual environments to check: those in the virtual environment
+    directory and those in the registry
+
+    Keyword Args:
+        virtualenv_dir: virtual environment directory (defaults to the VENV_DIR directory)
+    """
+    paths = set(os.path.abspath(u) for u in get_virtualenv_paths(virtualenv_dir or get_virtualenv_dir()))
+    if virtualenv_dir is None:
+        paths.update(u['path'] for u in read_environments() if os.path.isdir(u['path']))
+    return sorted(paths)
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Check that virtual environments have a working interpreter, pyvenv.cfg home and standard library')
+    parser.add_argument(dest='paths', metavar='Path', type=str, nargs='*', help='Virtual environments to check (default all the environments in VENV_DIR and the registry)')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Directory of the virtual environments to check (default VENV_DIR)", default=None)
+    parser.add_argument('--repair', dest='repair', action="store_true", help="Re-point broken environments at an interpreter for their python version", default=False)
+    parser.add_argument('--json', dest='json', action="store_true", help="Print a JSON report", default=False)
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of threads to use (default the CPU count)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def check_command(args=None):
+    """
+    Check virtual environments
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+
+    Returns 0 if every environment is ok (after repairing), 1 otherwise
+    """
+    options = create_parser().parse_args(args)
+    paths = options.paths or get_environment_paths(options.virtualenv_dir)
+    results = check_environments(paths, options.repair, options.workers)
+    for result in results:
+        if result['repaired']:
+            # The interpreter has changed
+            register_environment(result['path'])
+    if options.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for result in results:
+            status = 'ok' if result['ok'] else 'broken'
+            if result['repaired']:
+                status = 'repaired' if result['ok'] else 'broken (repair failed)'
+            print('{}: {}'.format(result['path'], status))
+            for name in sorted(result['checks']):
+                if result['checks'][name]['ok'] is False:
+                    print('    {}: {}'.format(name, result['checks'][name]['detail']))
+            if 'error' in result:
+                print('    {}'.format(result['error']))
+        print('{} of {} environments ok'.format(len([u for u in results if u['ok']]), len(results)))
+    return 0 if all(u['ok'] for u in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(check_command(sys.argv[1:]))
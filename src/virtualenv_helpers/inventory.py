@@ -0,0 +1,268 @@
+"""
+inventory.py
+************
+Index of the distributions installed in every virtual environment, to answer
+questions like "which environments have requests older than 2.20?" without
+scanning the environments each time.
+
+The name and version of each distribution are read from the headers of its
+.dist-info METADATA (or .egg-info PKG-INFO) file, using a thread pool, and
+stored in a SQLite database in the cache directory. The index is refreshed
+incrementally: a site-packages directory is only scanned again if its mtime
+has changed (installing, upgrading or removing a distribution adds or
+removes a metadata directory), so a refresh is a stat of each site-packages
+directory.
+
+    whichvenvs "requests<2.20"
+"""
+import io
+import os
+import sys
+import sqlite3
+import argparse
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .cache import get_cache_dir
+from .find import find_site_packages
+from .find import get_virtualenv_dir
+from .find import get_virtualenv_paths
+from .wheels import canonical_name
+
+INVENTORY = 'inventory.sqlite3'
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS site_packages (
+    path TEXT PRIMARY KEY,
+    environment TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS distributions (
+    site_packages TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    name TEXT NOT NULL,
+    project_name TEXT NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS distributions_name ON distributions (name);
+CREATE INDEX IF NOT EXISTS distributions_site_packages ON distributions (site_packages);
+"""
+
+
+def get_inventory_path():
+    """Get the path to the inventory database in the cache directory"""
+    return os.path.join(get_cache_dir(), INVENTORY)
+
+
+def connect(path=None):
+    """
+    Open the inventory database, creating the tables if needed
+
+    Keyword Args:
+        path: path to the database (defaults to the cache directory)
+    """
+    connection = sqlite3.connect(path or get_inventory_path())
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def read_metadata(path):
+    """
+    Read the name and version from the headers of a METADATA or PKG-INFO file
+
+    Args:
+        path: path to the metadata file
+
+    Returns a tuple of the name and version (None if not found)
+    """
+    name = version = None
+    with io.open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                # The headers end at the first blank line
+                break
+            key, sep, value = line.partition(':')
+            if key == 'Name':
+                name = value.strip()
+            elif key == 'Version':
+                version = value.strip()
+            if name is not None and version is not None:
+                break
+    return name, version
+
+
+def scan_site_packages(site_packages):
+    """
+    Read the distributions installed in a site-packages directory from their
+    metadata
+
+    Args:
+        site_packages: the site-packages directory
+
+    Returns a list of (name, version) tuples
+    """
+    distributions = []
+    try:
+        entries = sorted(os.listdir(site_packages))
+    except OSError:
+        return distributions
+    for entry in entries:
+        path = os.path.join(site_packages, entry)
+        if entry.endswith('.dist-info'):
+            path = os.path.join(path, 'METADATA')
+        elif entry.endswith('.egg-info'):
+            if os.path.isdir(path):
+                path = os.path.join(path, 'PKG-INFO')
+        else:
+            continue
+        try:
+            name, version = read_metadata(path)
+        except (IOError, OSError):
+            continue
+        if name and version:
+            distributions.append((name, version))
+    return distributions
+
+
+def refresh(connection, version_virtualenv_dirs, prune=True, workers=None):
+    """
+    Update the inventory for the site-packages directories that have changed
+    since they were last scanned
+
+    Args:
+        connection: the inventory database connection
+        version_virtualenv_dirs: list of virtual environment directories
+
+    Keyword Args:
+        prune: remove the environments that are not in the list
+        workers: number of threads used to scan (defaults to the CPU count)
+
+    Returns the number of site-packages directories scanned
+    """
+    version_virtualenv_dirs = [os.path.abspath(u) for u in version_virtualenv_dirs]
+    known = {}
+    for path, environment, mtime in connection.execute('SELECT path, environment, mtime FROM site_packages'):
+        known.setdefault(environment, {})[path] = mtime
+    removed = []
+    changed = []
+    for environment in version_virtualenv_dirs:
+        if environment in known:
+            paths = known[environment]
+        else:
+            paths = dict((os.path.abspath(u), None) for u in find_site_packages(environment))
+        for path, mtime in paths.items():
+            try:
+                current_mtime = os.stat(path).st_mtime
+            except OSError:
+                removed.append(path)
+                continue
+            if current_mtime != mtime:
+                changed.append((path, environment, current_mtime))
+    if prune:
+        current = set(version_virtualenv_dirs)
+        removed += [path for environment, paths in known.items() if environment not in current for path in paths]
+    scanned = []
+    if changed:
+        pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(changed)))
+        try:
+            scanned = pool.map(lambda u: scan_site_packages(u[0]), changed, chunksize=8)
+        finally:
+            pool.close()
+            pool.join()
+    with connection:
+        for path in removed + [u[0] for u in changed]:
+            connection.execute('DELETE FROM site_packages WHERE path = ?', (path,))
+            connection.execute('DELETE FROM distributions WHERE site_packages = ?', (path,))
+        for (path, environment, mtime), distributions in zip(changed, scanned):
+            connection.execute('INSERT INTO site_packages VALUES (?, ?, ?)', (path, environment, mtime))
+            connection.executemany('INSERT INTO distributions VALUES (?, ?, ?, ?, ?)',
+                                   [(path, environment, canonical_name(name), name, version) for name, version in distributions])
+    return len(changed)
+
+
+def parse_requirement(requirement):
+    """
+    Parse a requirement string (e.g. requests<2.20)
+
+    Args:
+        requirement: the requirement string
+
+    Returns a tuple of the canonical name and the version specifier, raises
+    ValueError if the requirement cannot be parsed
+    """
+    try:
+        from packaging.requirements import Requirement
+    except ImportError:
+        from pkg_resources.extern.packaging.requirements import Requirement
+    try:
+        parsed = Requirement(requirement)
+    except Exception as e:
+        raise ValueError('Invalid requirement {}: {}'.format(requirement, e))
+    return canonical_name(parsed.name), parsed.specifier
+
+
+def _matches(specifier, version):
+    """Check if a version matches a specifier, treating invalid versions as not matching"""
+    try:
+        return specifier.contains(version, prereleases=True)
+    except Exception:
+        return False
+
+
+def query(connection, requirement):
+    """
+    Find the environments with a distribution matching a requirement
+
+    Args:
+        connection: the inventory database connection
+        requirement: requirement string (e.g. requests<2.20)
+
+    Returns a sorted list of (environment, project name, version) tuples
+    """
+    name, specifier = parse_requirement(requirement)
+    rows = connection.execute('SELECT environment, project_name, version FROM distributions WHERE name = ?', (name,))
+    return sorted(row for row in rows if _matches(specifier, row[2]))
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Find the virtual environments with installed distributions matching requirements, using an index of the installed distributions')
+    parser.add_argument(dest='requirements', metavar='Requirement', type=str, nargs='+', help='Requirement to match (e.g. "requests<2.20")')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Directory of the virtual environments to index (default VENV_DIR)", default=None)
+    parser.add_argument('--no-refresh', dest='refresh', action="store_false", help="Query the index without checking for changed environments", default=True)
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of threads used to scan (default the CPU count)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def which_command(args=None):
+    """
+    Print the virtual environments with distributions matching requirements
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+
+    Returns 0 if any environment matches, 1 otherwise (like grep)
+    """
+    options = create_parser().parse_args(args)
+    connection = connect()
+    try:
+        if options.refresh:
+            refresh(connection, get_virtualenv_paths(options.virtualenv_dir or get_virtualenv_dir()), workers=options.workers)
+        matches = []
+        for requirement in options.requirements:
+            try:
+                matches += query(connection, requirement)
+            except ValueError as e:
+                print(e)
+                return 2
+    finally:
+        connection.close()
+    for environment, name, version in sorted(set(matches)):
+        print('{}  {} {}'.format(environment, name, version))
+    return 0 if matches else 1
+
+
+if __name__ == '__main__':
+    sys.exit(which_command(sys.argv[1:]))
@@ -0,0 +1,130 @@
+"""
+locking.py
+**********
+Make creating a virtual environment safe when several processes (e.g. CI
+jobs on the same machine) create the same environment at the same time.
+
+An advisory fcntl lock is held on a lock file in the cache directory, named
+by a hash of the environment's path, for the whole create, so the other
+processes wait for it and then reuse the environment it built (the create
+phases are skipped using the manifest). The lock file is not removed, as
+removing it would let a waiting process and a new process lock different
+files, but it is kept out of the project and VENV_DIR directories.
+
+A new environment is built in a hidden temporary sibling directory, its
+temporary path is rewritten to the final path (see relocate.py), the bytecode
+compiled with the temporary path is removed (to be compiled again by the
+precompile phase or on import), and it is renamed into place, so a half built
+environment is never at the final path (e.g. if create is interrupted). The
+hidden directory is skipped when scanning the virtual environment directory.
+
+fcntl is not available on Windows, where the environments are not locked.
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .cache import get_cache_path
+from .relocate import relocate
+from .relocate import remove_prefix_bytecode
+from .store import _makedirs
+
+LOCKS_DIR = 'locks'
+
+
+def get_lock_path(version_virtualenv_dir):
+    """
+    Get the path of the lock file for a virtual environment
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    path = os.path.abspath(version_virtualenv_dir)
+    key = hashlib.sha256(path.encode('utf-8')).hexdigest()[:32]
+    return get_cache_path(LOCKS_DIR, '{}-{}.lock'.format(os.path.split(path)[-1], key))
+
+
+class EnvironmentLock(object):
+    """
+    Exclusive lock on a virtual environment, as a context manager
+
+    The waited attribute is True if another process held the lock when it
+    was acquired, i.e. the environment may just have been created.
+    """
+
+    def __init__(self, version_virtualenv_dir):
+        self.path = get_lock_path(version_virtualenv_dir)
+        self.waited = False
+        self._fd = None
+
+    def acquire(self):
+        """Acquire the lock, blocking until it is released by any other process"""
+        if fcntl is None:
+            return
+        _makedirs(os.path.dirname(self.path))
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            self.waited = True
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(self._fd)
+                self._fd = None
+                raise
+
+    def release(self):
+        """Release the lock"""
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.release()
+
+
+@contextlib.contextmanager
+def staging_directory(version_virtualenv_dir):
+    """
+    Get the path to build a new virtual environment in, inside a hidden
+    temporary sibling directory (so it is on the same filesystem and has the
+    same name) that is removed on exit
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    parent, name = os.path.split(os.path.abspath(version_virtualenv_dir))
+    _makedirs(parent)
+    staging_dir = tempfile.mkdtemp(prefix='.{}.'.format(name), suffix='.tmp', dir=parent)
+    try:
+        yield os.path.join(staging_dir, name)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def publish_environment(build_dir, version_virtualenv_dir):
+    """
+    Move a virtual environment built in a staging directory into place,
+    rewriting its paths (and removing the bytecode compiled with the staging
+    path) first so it is complete when it appears
+
+    Args:
+        build_dir: Directory the virtual environment was built in
+        version_virtualenv_dir: Directory of the virtual environment directory (must not exist)
+    """
+    relocate(build_dir, build_dir, new_prefix=version_virtualenv_dir)
+    remove_prefix_bytecode(build_dir, build_dir)
+    os.rename(build_dir, version_virtualenv_dir)
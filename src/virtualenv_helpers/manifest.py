@@ -0,0 +1,154 @@
+"""
+manifest.py
+***********
+Record the inputs of each create phase in a manifest in the virtual
+environment, so that running create again can skip the phases whose inputs
+have not changed.
+
+The phases are:
+
+environment: creating the environment (backend, arguments and interpreter path and mtime)
+wheels: installing the default wheels (hash of the default wheels directory listing)
+develop: installing the project as develop (hash of setup.py, setup.cfg, pyproject.toml and requirements files)
+precompile: compiling the bytecode (the directories compiled)
+
+If a phase runs, the later phases are run too.
+"""
+import os
+import json
+import glob
+import hashlib
+
+from .precompile import get_precompile_paths
+from .wheels import is_compatible_wheel
+
+MANIFEST = 'virtualenv_helpers.json'
+PHASES = ('environment', 'wheels', 'develop', 'precompile')
+PROJECT_FILES = ('setup.py', 'setup.cfg', 'pyproject.toml', 'requirements*.txt')
+
+
+def get_manifest_path(version_virtualenv_dir):
+    """
+    Get the path to the manifest of a virtual environment
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    return os.path.join(version_virtualenv_dir, MANIFEST)
+
+
+def read_manifest(version_virtualenv_dir):
+    """
+    Read the manifest of a virtual environment (empty if there is none)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    try:
+        with open(get_manifest_path(version_virtualenv_dir)) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def write_manifest(version_virtualenv_dir, manifest):
+    """
+    Write the manifest of a virtual environment
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        manifest: dictionary of phase to inputs
+    """
+    with open(get_manifest_path(version_virtualenv_dir), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def find_executable(executable):
+    """
+    Get the real path of an executable, searching the PATH if it is not a path
+
+    Args:
+        executable: executable name or path
+    """
+    if os.path.dirname(executable):
+        return os.path.realpath(executable)
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(path, executable)
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return os.path.realpath(candidate)
+    return None
+
+
+def environment_inputs(backend, executable, args):
+    """
+    Get the inputs of the environment phase
+
+    Args:
+        backend: name of the backend
+        executable: python executable for the version
+        args: list of additional arguments for the backend
+    """
+    path = find_executable(executable)
+    try:
+        mtime = os.stat(path).st_mtime if path is not None else None
+    except OSError:
+        mtime = None
+    return {'backend': backend, 'args': list(args), 'interpreter': path, 'interpreter_mtime': mtime}
+
+
+def wheels_inputs(wheels_dir, version):
+    """
+    Get the inputs of the wheels phase, a hash of the names, sizes and mtimes
+    of the wheels (and exe installers) for the version
+
+    Args:
+        wheels_dir: the default wheels directory
+        version: python version string for the virtual environment
+    """
+    digest = hashlib.sha256()
+    installers = glob.glob(os.path.join(wheels_dir, '*.whl')) + glob.glob(os.path.join(wheels_dir, '*.exe'))
+    for installer in sorted(installers):
+        if is_compatible_wheel(installer, version):
+            stat = os.stat(installer)
+            digest.update('{}\0{}\0{}\n'.format(os.path.split(installer)[-1], stat.st_size, stat.st_mtime).encode('utf-8'))
+    return {'wheels_dir': os.path.abspath(wheels_dir), 'index': digest.hexdigest()}
+
+
+def develop_inputs(project_dir):
+    """
+    Get the inputs of the develop phase, a hash of the project's setup files
+
+    Args:
+        project_dir: the project directory
+    """
+    digest = hashlib.sha256()
+    for pattern in PROJECT_FILES:
+        for path in sorted(glob.glob(os.path.join(project_dir, pattern))):
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest.update(os.path.split(path)[-1].encode('utf-8') + b'\0' + content + b'\0')
+    return {'project': os.path.abspath(project_dir), 'hash': digest.hexdigest()}
+
+
+def precompile_inputs(version_virtualenv_dir, version):
+    """
+    Get the inputs of the precompile phase, the directories to compile
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+    """
+    return {'paths': get_precompile_paths(version_virtualenv_dir, version)}
+
+
+def is_up_to_date(manifest, phase, inputs):
+    """
+    Check if a phase was recorded in the manifest with the same inputs
+
+    Args:
+        manifest: dictionary of phase to inputs
+        phase: phase name
+        inputs: dictionary of the inputs of the phase
+    """
+    return manifest.get(phase, None) == json.loads(json.dumps(inputs))
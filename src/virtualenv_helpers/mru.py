@@ -0,0 +1,177 @@
+"""
+mru.py
+******
+Most recently used virtual environments, so that workon can try the
+environment last activated for a project before searching.
+
+Each activation is appended to a log in the cache directory as a single line
+(time, python version, project directory and environment path), which is
+cheap and safe for concurrent workon commands without locking. When the log
+grows past COMPACT_SIZE it is compacted to the last line for each project,
+version and environment, by writing a new log and renaming it into place.
+"""
+import os
+import time
+import tempfile
+
+from .cache import get_cache_dir
+from .cache import get_cache_path
+
+MRU_LOG = 'mru.log'
+COMPACT_SIZE = 64 * 1024
+
+
+def get_mru_path():
+    """Get the path to the most recently used log in the cache directory"""
+    return os.path.join(get_cache_dir(), MRU_LOG)
+
+
+def _format_entry(when, python_version, project_dir, version_virtualenv_dir):
+    """Format a log line"""
+    return '{:.3f}\t{}\t{}\t{}\n'.format(when, python_version or '', project_dir or '', version_virtualenv_dir)
+
+
+def read_log():
+    """
+    Read the most recently used log, skipping malformed lines (e.g. a line
+    being appended)
+
+    Returns a list of (time, python version, project directory, environment
+    path) tuples in the order they were recorded
+    """
+    try:
+        # Reading does not create the cache directory
+        with open(get_cache_path(MRU_LOG)) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return []
+    entries = []
+    for line in lines:
+        parts = line.split('\t')
+        if len(parts) != 4 or not parts[3]:
+            continue
+        try:
+            when = float(parts[0])
+        except ValueError:
+            continue
+        entries.append((when, parts[1] or None, parts[2] or None, parts[3]))
+    return entries
+
+
+def _write_log(entries):
+    """Replace the most recently used log with a list of entries"""
+    mru_path = get_mru_path()
+    handle, temp_path = tempfile.mkstemp(prefix=MRU_LOG, dir=os.path.dirname(mru_path))
+    try:
+        with os.fdopen(handle, 'w') as f:
+            f.write(''.join(_format_entry(*entry) for entry in entries))
+        getattr(os, 'replace', os.rename)(temp_path, mru_path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def compact():
+    """
+    Rewrite the most recently used log keeping the last entry for each
+    project, python version and environment
+
+    Returns the number of entries kept
+    """
+    latest = {}
+    for entry in read_log():
+        latest[entry[1:]] = entry
+    entries = sorted(latest.values())
+    _write_log(entries)
+    return len(entries)
+
+
+def move_entries(old_path, new_path):
+    """
+    Rewrite the entries of a virtual environment that has been moved
+
+    Args:
+        old_path: the old virtual environment directory
+        new_path: the new virtual environment directory
+
+    Returns a list of the project directories it was used for
+    """
+    old_path, new_path = os.path.abspath(old_path), os.path.abspath(new_path)
+    entries = read_log()
+    if not any(entry[3] == old_path for entry in entries):
+        return []
+    _write_log([entry[:3] + (new_path,) if entry[3] == old_path else entry for entry in entries])
+    return sorted(set(entry[2] for entry in entries if entry[3] == old_path and entry[2] is not None))
+
+
+def record_use(version_virtualenv_dir, project_dir=None, python_version=None, when=None):
+    """
+    Append the use of a virtual environment to the most recently used log,
+    compacting the log if it has grown too large
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Keyword Args:
+        project_dir: the project directory it was used for
+        python_version: python version string
+        when: time it was used (defaults to now)
+    """
+    line = _format_entry(time.time() if when is None else when, python_version,
+                         project_dir and os.path.abspath(project_dir), os.path.abspath(version_virtualenv_dir))
+    try:
+        # A single write in append mode, so concurrent lines are not interleaved
+        fd = os.open(get_mru_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > COMPACT_SIZE:
+            compact()
+    except OSError:
+        pass
+
+
+def get_last_used():
+    """Get a dictionary of environment path to the time it was last used"""
+    last_used = {}
+    for when, python_version, project_dir, path in read_log():
+        last_used[path] = max(when, last_used.get(path, when))
+    return last_used
+
+
+def find_last_used(python_version, max_levels=None):
+    """
+    Find the virtual environment last used for the python version in the
+    current (or higher) project directory, checking it still exists with a
+    single stat
+
+    Args:
+        python_version: python version string
+
+    Keyword Args:
+        max_levels: integer number of levels to check (if None, checks to the system root)
+
+    Returns a tuple of the virtual environment path and the project
+    directory, or (None, None)
+    """
+    if python_version is None:
+        return None, None
+    latest = {}
+    for when, version, project_dir, path in read_log():
+        if version == python_version and project_dir is not None:
+            latest[project_dir] = path
+    if not latest:
+        return None, None
+    current_dir = os.getcwd()
+    levels_checked = 0
+    while len(os.path.split(current_dir)[-1]):
+        path = latest.get(current_dir, None)
+        if path is not None:
+            return (path, current_dir) if os.path.isdir(path) else (None, None)
+        levels_checked += 1
+        if max_levels is not None and levels_checked >= max_levels:
+            break
+        current_dir = os.path.split(current_dir)[0]
+    return None, None
@@ -0,0 +1,114 @@
+"""
+precompile.py
+*************
+Compile the bytecode of a virtual environment's site-packages and of the
+projects installed into it as develop/editable, so that the first import
+of everything in a new environment does not have to write the .pyc files.
+
+compileall is run with the environment's python (the bytecode depends on
+the interpreter), with a worker process for each CPU.
+"""
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from .tracing import traced
+from .wheels import get_site_packages
+
+is_windows = sys.platform.startswith('win')
+
+if is_windows:
+    SCRIPT_DIR = 'Scripts'
+    PYTHON = 'python.exe'
+else:
+    SCRIPT_DIR = 'bin'
+    PYTHON = 'python'
+
+# Skip local virtual environments, tox/nox environments, version control and build folders in projects
+EXCLUDE = r'[/\\](\.venv|\.tox|\.nox|\.git|build)[/\\]'
+
+
+def get_precompile_paths(version_virtualenv_dir, version):
+    """
+    Get the directories to compile: the site-packages directory and the
+    project directories added to it by .pth files (develop/editable installs)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+    """
+    site_packages = get_site_packages(version_virtualenv_dir, version)
+    paths = [site_packages]
+    try:
+        entries = sorted(os.listdir(site_packages))
+    except OSError:
+        return paths
+    virtualenv_dir = os.path.abspath(version_virtualenv_dir) + os.sep
+    for entry in entries:
+        if not entry.endswith('.pth'):
+            continue
+        try:
+            with open(os.path.join(site_packages, entry)) as f:
+                lines = f.read().splitlines()
+        except (IOError, OSError):
+            continue
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(('#', 'import ', 'import\t')):
+                continue
+            path = os.path.abspath(os.path.join(site_packages, line))
+            if os.path.isdir(path) and not (path + os.sep).startswith(virtualenv_dir) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def _has_parallel_compileall(version):
+    """Check if compileall supports -j (python 3.5+)"""
+    try:
+        return tuple(int(u) for u in version.split('.')[:2]) >= (3, 5)
+    except ValueError:
+        return True
+
+
+@traced
+def precompile(version_virtualenv_dir, version, workers=None):
+    """
+    Compile the bytecode of a virtual environment, reporting the time taken
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Keyword Args:
+        workers: number of worker processes (defaults to the CPU count)
+
+    Returns the compileall exit code (non-zero if any file failed to compile)
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    python = os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON)
+    paths = get_precompile_paths(version_virtualenv_dir, version)
+    start = time.time()
+    if _has_parallel_compileall(version):
+        code = subprocess.call([python, '-m', 'compileall', '-q', '-j', str(workers), '-x', EXCLUDE] + paths)
+    else:
+        # No -j option, so split the top level entries between the workers
+        entries = []
+        for path in paths:
+            try:
+                entries += [os.path.join(path, entry) for entry in sorted(os.listdir(path))]
+            except OSError:
+                pass
+        chunks = [entries[i::workers] for i in range(workers) if entries[i::workers]]
+        pool = ThreadPool(max(len(chunks), 1))
+        try:
+            codes = pool.map(lambda chunk: subprocess.call([python, '-m', 'compileall', '-q', '-x', EXCLUDE] + chunk), chunks)
+        finally:
+            pool.close()
+            pool.join()
+        code = max(codes) if codes else 0
+    print('Precompiled {} in {:.2f}s'.format(version_virtualenv_dir, time.time() - start))
+    return code
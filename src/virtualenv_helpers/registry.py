@@ -0,0 +1,502 @@
+"""
+registry.py
+***********
+Registry of the virtual environments, so that their details do not have to be
+inferred from directory names.
+
+Each environment is recorded with its name, path, python version and base
+interpreter, the project it was created for, when it was created and last
+used, and its size on disk. The registry is a SQLite database in the cache
+directory, in WAL mode so that many workon commands can read it while
+another command writes to it.
+
+create records the environments it builds, and the last use times are
+taken from the most recently used log written by workon (see mru.py).
+Reading the registry (e.g. workon and the shell completion) never creates
+it. lsvenv lists the registered environments, prunevenvs removes the
+records of environments that have been deleted (and can delete
+environments that have not been used for a number of days), and
+rebuildvenvregistry rebuilds the registry by scanning the VENV_DIR
+directory.
+"""
+import os
+import sys
+import json
+import time
+import stat
+import shutil
+import sqlite3
+import argparse
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .cache import get_cache_dir
+from .cache import get_cache_path
+from .find import get_virtualenv_dir
+from .find import get_virtualenv_paths
+from .find import split_virtualenv_name
+from .find import update_names_index
+from .manifest import read_manifest
+from .manifest import get_manifest_path
+from .mru import get_last_used
+
+REGISTRY = 'registry.sqlite3'
+FIELDS = ('path', 'name', 'version', 'interpreter', 'project_dir', 'created', 'last_used', 'size')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS environments (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT,
+    interpreter TEXT,
+    project_dir TEXT,
+    created REAL,
+    last_used REAL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS environments_name ON environments (name);
+CREATE INDEX IF NOT EXISTS environments_project_dir ON environments (project_dir);
+"""
+
+
+def get_registry_path():
+    """Get the path to the registry database in the cache directory"""
+    return os.path.join(get_cache_dir(), REGISTRY)
+
+
+def connect(path=None):
+    """
+    Open the registry database in WAL mode, creating the table if needed
+
+    Keyword Args:
+        path: path to the database (defaults to the cache directory)
+    """
+    # Wait for another writer rather than failing, readers are not blocked in WAL mode
+    connection = sqlite3.connect(path or get_registry_path(), timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def open_registry():
+    """
+    Open the registry database for reading, without creating it (or the
+    cache directory)
+
+    Returns the connection, or None if there is no registry
+    """
+    path = get_cache_path(REGISTRY)
+    if not os.path.isfile(path):
+        return None
+    return sqlite3.connect(path, timeout=30)
+
+
+def read_pyvenv_cfg(version_virtualenv_dir):
+    """
+    Read the settings in a virtual environment's pyvenv.cfg (empty if there is
+    none)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    settings = {}
+    try:
+        with open(os.path.join(version_virtualenv_dir, 'pyvenv.cfg')) as f:
+            for line in f:
+                key, sep, value = line.partition('=')
+                if sep:
+                    settings[key.strip()] = value.strip()
+    except (IOError, OSError):
+        pass
+    return settings
+
+
+def get_environment_size(version_virtualenv_dir):
+    """
+    Get the size on disk of a virtual environment, counting files hardlinked
+    more than once inside it once
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    size = 0
+    seen = set()
+    for root, dirs, files in os.walk(version_virtualenv_dir):
+        for name in files:
+            try:
+                file_stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            if file_stat.st_nlink > 1:
+                if (file_stat.st_dev, file_stat.st_ino) in seen:
+                    continue
+                seen.add((file_stat.st_dev, file_stat.st_ino))
+            size += file_stat.st_size
+    return size
+
+
+def read_environment(version_virtualenv_dir):
+    """
+    Get the registry record of a virtual environment from the files in it (the
+    manifest written by create and pyvenv.cfg)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Returns a dictionary of the registry fields (last_used is None)
+    """
+    path = os.path.abspath(version_virtualenv_dir)
+    name, version = split_virtualenv_name(os.path.split(path)[-1])
+    manifest = read_manifest(path)
+    settings = read_pyvenv_cfg(path)
+    if version is None:
+        version = '.'.join(settings.get('version', settings.get('version_info', '')).split('.')[:2]) or None
+    interpreter = manifest.get('environment', {}).get('interpreter', None)
+    if interpreter is None and 'home' in settings:
+        interpreter = settings['home']
+    created = None
+    # pyvenv.cfg is written when the environment is created, the manifest when create last ran
+    for candidate in (os.path.join(path, 'pyvenv.cfg'), get_manifest_path(path), path):
+        try:
+            created = os.stat(candidate).st_mtime
+            break
+        except OSError:
+            continue
+    return {'path': path, 'name': name, 'version': version, 'interpreter': interpreter,
+            'project_dir': manifest.get('develop', {}).get('project', None), 'created': created,
+            'last_used': None, 'size': get_environment_size(path)}
+
+
+def register(connection, record):
+    """
+    Add or update the record of a virtual environment, keeping the creation
+    and last use times already recorded if the record has none
+
+    Args:
+        connection: the registry database connection
+        record: dictionary of the registry fields (see read_environment)
+    """
+    record = dict((field, record.get(field, None)) for field in FIELDS)
+    with connection:
+        row = connection.execute('SELECT created, last_used FROM environments WHERE path = ?', (record['path'],)).fetchone()
+        if row is not None:
+            record['created'] = record['created'] or row[0]
+            record['last_used'] = record['last_used'] or row[1]
+        connection.execute('INSERT OR REPLACE INTO environments ({}) VALUES ({})'.format(', '.join(FIELDS), ', '.join('?' * len(FIELDS))),
+                           [record[field] for field in FIELDS])
+
+
+def register_environment(version_virtualenv_dir, **fields):
+    """
+    Record a virtual environment in the registry, ignoring registry errors so
+    that they never stop a command
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Keyword Args:
+        fields: registry fields overriding those read from the environment
+    """
+    try:
+        record = read_environment(version_virtualenv_dir)
+        record.update(fields)
+        connection = connect()
+        try:
+            register(connection, record)
+        finally:
+            connection.close()
+    except (sqlite3.Error, IOError, OSError) as e:
+        print('Unable to update the virtual environment registry: {}'.format(e))
+
+
+def move_environment(old_path, new_path):
+    """
+    Move the record of a virtual environment that has been moved, keeping its
+    creation and last use times and project directory, ignoring registry
+    errors so that they never stop a command
+
+    Args:
+        old_path: the old virtual environment directory
+        new_path: the new virtual environment directory
+
+    Returns the project directory recorded for it (or None)
+    """
+    try:
+        record = read_environment(new_path)
+        connection = connect()
+        try:
+            row = connection.execute('SELECT created, last_used, project_dir FROM environments WHERE path = ?',
+                                     (os.path.abspath(old_path),)).fetchone()
+            if row is not None:
+                record['created'], record['last_used'] = row[0], row[1]
+                record['project_dir'] = record['project_dir'] or row[2]
+                with connection:
+                    connection.execute('DELETE FROM environments WHERE path = ?', (os.path.abspath(old_path),))
+            register(connection, record)
+        finally:
+            connection.close()
+        return record['project_dir']
+    except (sqlite3.Error, IOError, OSError) as e:
+        print('Unable to update the virtual environment registry: {}'.format(e))
+        return None
+
+
+def get_environments(connection, virtualenv_dir=None, project_dir=None, version=None):
+    """
+    Get the records of the registered virtual environments, sorted by path
+
+    Args:
+        connection: the registry database connection
+
+    Keyword Args:
+        virtualenv_dir: only include environments in this directory
+        project_dir: only include environments created for this project (or
+                     any of a list of projects)
+        version: only include environments for this python version
+
+    Returns a list of dictionaries of the registry fields
+    """
+    conditions = []
+    parameters = []
+    if project_dir is not None:
+        # Uses the project_dir index
+        project_dirs = [project_dir] if isinstance(project_dir, str) else list(project_dir)
+        conditions.append('project_dir IN ({})'.format(', '.join('?' * len(project_dirs))))
+        parameters += [os.path.abspath(u) for u in project_dirs]
+    if version is not None:
+        conditions.append('version = ?')
+        parameters.append(version)
+    where = ' WHERE {}'.format(' AND '.join(conditions)) if conditions else ''
+    rows = connection.execute('SELECT {} FROM environments{} ORDER BY path'.format(', '.join(FIELDS), where), parameters)
+    environments = [dict(zip(FIELDS, row)) for row in rows]
+    last_used = get_last_used()
+    for environment in environments:
+        if environment['path'] in last_used:
+            environment['last_used'] = max(environment['last_used'] or 0, last_used[environment['path']])
+    if virtualenv_dir is not None:
+        virtualenv_dir = os.path.abspath(virtualenv_dir)
+        environments = [u for u in environments if os.path.dirname(u['path']) == virtualenv_dir]
+    return environments
+
+
+def read_environments(virtualenv_dir=None, project_dir=None, version=None):
+    """
+    Get the records of the registered virtual environments, returning an empty
+    list if there is no registry or it cannot be read
+
+    Keyword Args:
+        virtualenv_dir: only include environments in this directory
+        project_dir: only include environments created for this project (or
+                     any of a list of projects)
+        version: only include environments for this python version
+    """
+    try:
+        connection = open_registry()
+        if connection is None:
+            return []
+        try:
+            return get_environments(connection, virtualenv_dir, project_dir, version)
+        finally:
+            connection.close()
+    except (sqlite3.Error, IOError, OSError):
+        return []
+
+
+def rebuild(connection, version_virtualenv_dirs, workers=None):
+    """
+    Rebuild the registry from the virtual environments on disk, keeping the
+    recorded creation and last use times. The records of environments that
+    are not in the list are removed
+
+    Args:
+        connection: the registry database connection
+        version_virtualenv_dirs: list of virtual environment directories
+
+    Keyword Args:
+        workers: number of threads used to read the environments (defaults to
+                 the CPU count)
+
+    Returns the number of environments registered
+    """
+    records = []
+    if version_virtualenv_dirs:
+        pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(version_virtualenv_dirs)))
+        try:
+            records = pool.map(read_environment, version_virtualenv_dirs)
+        finally:
+            pool.close()
+            pool.join()
+    current = set(u['path'] for u in records)
+    with connection:
+        for (path,) in connection.execute('SELECT path FROM environments').fetchall():
+            if path not in current:
+                connection.execute('DELETE FROM environments WHERE path = ?', (path,))
+    for record in records:
+        register(connection, record)
+    return len(records)
+
+
+def prune(connection, unused_days=None, dry_run=False):
+    """
+    Remove the records of virtual environments that no longer exist, and
+    optionally delete the environments that have not been used for a number
+    of days
+
+    Args:
+        connection: the registry database connection
+
+    Keyword Args:
+        unused_days: delete environments last used (or created, if never
+                     used) more than this many days ago
+        dry_run: only report what would be removed
+
+    Returns a tuple of the lists of missing and deleted environment paths
+    """
+    missing = []
+    deleted = []
+    cutoff = None if unused_days is None else time.time() - unused_days * 24 * 60 * 60
+    for record in get_environments(connection):
+        if not os.path.isdir(record['path']):
+            missing.append(record['path'])
+        elif cutoff is not None and (record['last_used'] or record['created'] or cutoff) < cutoff:
+            deleted.append(record['path'])
+    if not dry_run:
+        for path in deleted:
+            shutil.rmtree(path)
+        with connection:
+            connection.executemany('DELETE FROM environments WHERE path = ?', [(u,) for u in missing + deleted])
+        virtualenv_dir = os.path.abspath(get_virtualenv_dir())
+        if any(os.path.dirname(path) == virtualenv_dir for path in missing + deleted):
+            # So completion does not offer the removed environments
+            update_names_index(virtualenv_dir)
+    return missing, deleted
+
+
+def format_size(size):
+    """
+    Format a size in bytes for display
+
+    Args:
+        size: the size in bytes (or None)
+    """
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+        size /= 1024.0
+    return '{:.1f} GB'.format(size)
+
+
+def format_time(timestamp):
+    """
+    Format a time for display
+
+    Args:
+        timestamp: the time (or None)
+    """
+    return '-' if timestamp is None else time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+SORT_KEYS = {'name': lambda u: (u['name'], u['version'] or '', u['path']),
+             'size': lambda u: -(u['size'] or 0),
+             'created': lambda u: -(u['created'] or 0),
+             'recent': lambda u: -(u['last_used'] or 0)}
+
+
+def create_list_parser():
+    """Create the command line parser for lsvenv"""
+    parser = argparse.ArgumentParser(description='List the registered virtual environments')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Only list the environments in this directory", default=None)
+    parser.add_argument('-s', '--sort', dest='sort', choices=sorted(SORT_KEYS), help="Sort order (default name)", default='name')
+    parser.add_argument('--json', dest='json', action="store_true", help="Print the records as JSON", default=False)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def list_command(args=None):
+    """
+    List the registered virtual environments
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_list_parser().parse_args(args)
+    environments = sorted(read_environments(options.virtualenv_dir), key=SORT_KEYS[options.sort])
+    if options.json:
+        print(json.dumps(environments, indent=2, sort_keys=True))
+        return 0
+    rows = [('Name', 'Version', 'Size', 'Created', 'Last used', 'Path')]
+    rows += [(u['name'], u['version'] or '-', format_size(u['size']), format_time(u['created']), format_time(u['last_used']), u['path'])
+             for u in environments]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)) + '  ' + row[-1])
+    return 0
+
+
+def create_prune_parser():
+    """Create the command line parser for prunevenvs"""
+    parser = argparse.ArgumentParser(description='Remove the registry records of deleted virtual environments, and optionally delete unused environments')
+    parser.add_argument('--unused-days', dest='unused_days', type=float, metavar='DAYS', help="Delete the environments that have not been used for DAYS days", default=None)
+    parser.add_argument('-n', '--dry-run', dest='dry_run', action="store_true", help="Only print what would be removed", default=False)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def prune_command(args=None):
+    """
+    Prune the registry
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_prune_parser().parse_args(args)
+    connection = connect()
+    try:
+        missing, deleted = prune(connection, options.unused_days, options.dry_run)
+    finally:
+        connection.close()
+    for path in missing:
+        print('{} the record of {} (not found)'.format('Would remove' if options.dry_run else 'Removed', path))
+    for path in deleted:
+        print('{} {} (unused)'.format('Would delete' if options.dry_run else 'Deleted', path))
+    return 0
+
+
+def create_rebuild_parser():
+    """Create the command line parser for rebuildvenvregistry"""
+    parser = argparse.ArgumentParser(description='Rebuild the virtual environment registry from the environments on disk')
+    parser.add_argument(dest='paths', metavar='Path', type=str, nargs='*', help='Virtual environments to register (default all the environments in VENV_DIR)')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Directory of the virtual environments to register (default VENV_DIR)", default=None)
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of threads to use (default the CPU count)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def rebuild_command(args=None):
+    """
+    Rebuild the registry
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_rebuild_parser().parse_args(args)
+    paths = options.paths or get_virtualenv_paths(options.virtualenv_dir or get_virtualenv_dir())
+    connection = connect()
+    try:
+        count = rebuild(connection, paths, options.workers)
+    finally:
+        connection.close()
+    print('Registered {} virtual environments'.format(count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(list_command(sys.argv[1:]))
@@ -0,0 +1,236 @@
+"""
+relocate.py
+***********
+Relocate a virtual environment that has been moved, copied or restored, by
+rewriting its old absolute path in the files that contain it (script
+shebangs, activate scripts, pyvenv.cfg and .pth files).
+
+The environment is scanned once, searching each file for the old path with
+mmap (so files are not read into memory), and only the files that contain it
+are rewritten, in parallel. Binary files (including .pyc files and shared
+libraries, which are not searched) are not rewritten, as a path of a different
+length would corrupt them.
+"""
+import os
+import sys
+import mmap
+import stat
+import shutil
+import argparse
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .find import update_names_index
+from .find import get_virtualenv_dir
+from .find import read_virtualenv_pointer
+from .find import update_virtualenv_pointer
+from .mru import move_entries
+from .registry import move_environment
+from .tracing import traced
+
+# Files that are never rewritten, so are not searched
+BINARY_EXTENSIONS = ('.pyc', '.pyo', '.so', '.pyd', '.dll', '.dylib', '.a', '.lib', '.exe', '.whl', '.zip')
+
+
+def contains(path, data):
+    """
+    Check if a file contains a byte string, using mmap
+
+    Args:
+        path: path to the file
+        data: byte string to search for
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < len(data):
+            return False
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return mapped.find(data) != -1
+        finally:
+            mapped.close()
+
+
+@traced
+def find_prefix_files(version_virtualenv_dir, prefix):
+    """
+    Find the text files in a virtual environment that contain a path
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        prefix: the path to search for
+
+    Returns a list of paths relative to the virtual environment directory
+    (using /)
+    """
+    prefix = prefix.encode(sys.getfilesystemencoding())
+    found = []
+    for root, dirs, files in os.walk(version_virtualenv_dir):
+        for name in files:
+            if name.endswith(BINARY_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if not stat.S_ISREG(os.lstat(path).st_mode) or not contains(path, prefix) or contains(path, b'\0'):
+                    continue
+            except (IOError, OSError, ValueError):
+                continue
+            found.append(os.path.relpath(path, version_virtualenv_dir).replace(os.sep, '/'))
+    return sorted(found)
+
+
+@traced
+def remove_prefix_bytecode(version_virtualenv_dir, prefix):
+    """
+    Remove the bytecode files in a virtual environment that were compiled
+    with a path in their source file names (which cannot be rewritten), so
+    they are compiled again from the current path
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        prefix: the path to search for
+
+    Returns the number of bytecode files removed
+    """
+    prefix = prefix.encode(sys.getfilesystemencoding())
+    removed = 0
+    for root, dirs, files in os.walk(version_virtualenv_dir):
+        for name in files:
+            if not name.endswith(('.pyc', '.pyo')):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if stat.S_ISREG(os.lstat(path).st_mode) and contains(path, prefix):
+                    os.remove(path)
+                    removed += 1
+            except (IOError, OSError, ValueError):
+                continue
+    return removed
+
+
+def rewrite_file(path, old, new):
+    """
+    Replace a byte string in a file, by writing a new file and renaming it
+    into place (so hardlinked files are not modified)
+
+    Args:
+        path: path to the file
+        old: byte string to replace
+        new: replacement byte string
+
+    Returns True if the file was rewritten
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if old not in data:
+        return False
+    temp_path = '{}.{}.relocate'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(data.replace(old, new))
+    os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))
+    getattr(os, 'replace', os.rename)(temp_path, path)
+    return True
+
+
+@traced
+def relocate(version_virtualenv_dir, old_prefix, workers=None, new_prefix=None):
+    """
+    Rewrite the old path of a virtual environment to its current path
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        old_prefix: the path the virtual environment was created at
+
+    Keyword Args:
+        workers: number of threads to use (defaults to the CPU count)
+        new_prefix: the path to rewrite to (defaults to the current path,
+                    set it to relocate before moving the environment)
+
+    Returns the list of rewritten files (relative to the virtual environment
+    directory, using /)
+    """
+    version_virtualenv_dir = os.path.abspath(version_virtualenv_dir)
+    old_prefix = os.path.abspath(old_prefix)
+    new_prefix = os.path.abspath(new_prefix or version_virtualenv_dir)
+    if old_prefix == new_prefix:
+        return []
+    encoding = sys.getfilesystemencoding()
+    old, new = old_prefix.encode(encoding), new_prefix.encode(encoding)
+    paths = find_prefix_files(version_virtualenv_dir, old_prefix)
+    if not paths:
+        return []
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(paths)))
+    try:
+        pool.map(lambda u: rewrite_file(os.path.join(version_virtualenv_dir, *u.split('/')), old, new), paths)
+    finally:
+        pool.close()
+        pool.join()
+    return paths
+
+
+def update_references(old_prefix, version_virtualenv_dir):
+    """
+    Point the registry, the most recently used log and the project pointer
+    files at a virtual environment that has been moved
+
+    Args:
+        old_prefix: the old virtual environment directory
+        version_virtualenv_dir: Directory of the virtual environment directory
+    """
+    old_prefix, new_prefix = os.path.abspath(old_prefix), os.path.abspath(version_virtualenv_dir)
+    project_dirs = set(move_entries(old_prefix, new_prefix))
+    project_dirs.add(move_environment(old_prefix, new_prefix))
+    for project_dir in project_dirs:
+        if project_dir is None:
+            continue
+        pointers = dict((version, new_prefix) for version, path in read_virtualenv_pointer(project_dir).items()
+                        if os.path.abspath(path) == old_prefix)
+        if pointers:
+            try:
+                update_virtualenv_pointer(project_dir, pointers)
+            except (IOError, OSError) as e:
+                print('Unable to update {}: {}'.format(project_dir, e))
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Move a virtual environment, rewriting its old path in its scripts, pyvenv.cfg and .pth files')
+    parser.add_argument(dest='source', metavar='Source', type=str, help='Path of the virtual environment')
+    parser.add_argument(dest='target', metavar='Target', type=str, nargs='?', help='Path to move the virtual environment to', default=None)
+    parser.add_argument('--from', dest='old_prefix', metavar='PATH', help="Relocate a virtual environment that has already been moved from PATH", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def relocate_command(args=None):
+    """
+    Move and relocate a virtual environment
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    parser = create_parser()
+    options = parser.parse_args(args)
+    if (options.target is None) == (options.old_prefix is None):
+        parser.error('Either a target path or --from is needed')
+    if options.target is not None:
+        if os.path.exists(options.target):
+            print('{} already exists'.format(options.target))
+            return 1
+        # Copied and removed if the target is on another filesystem
+        shutil.move(options.source, options.target)
+        version_virtualenv_dir, old_prefix = options.target, options.source
+    else:
+        version_virtualenv_dir, old_prefix = options.source, options.old_prefix
+    rewritten = relocate(version_virtualenv_dir, old_prefix)
+    update_references(old_prefix, version_virtualenv_dir)
+    print('Relocated {} ({} files rewritten)'.format(os.path.abspath(version_virtualenv_dir), len(rewritten)))
+    virtualenv_dir = os.path.abspath(get_virtualenv_dir())
+    if virtualenv_dir in (os.path.dirname(os.path.abspath(version_virtualenv_dir)), os.path.dirname(os.path.abspath(old_prefix))):
+        update_names_index(virtualenv_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    relocate_command(sys.argv[1:])
@@ -0,0 +1,140 @@
+"""
+run.py
+******
+Run a command in several virtual environments at once (e.g. running the tests
+in each python version's environment of a project), without starting a shell.
+
+The command is run directly with each environment's activated environment
+variables, its output is shown line by line prefixed with the environment's
+name, and the worst exit code is returned.
+"""
+import os
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+import subprocess
+
+if 'win32' in sys.platform:
+    script_dir = 'Scripts'
+else:
+    script_dir = 'bin'
+
+
+def get_activation_env(virtualenv_path, environ=None):
+    """
+    Get the environment variables set by activating a virtual environment
+
+    Args:
+        virtualenv_path: path to the virtual environment
+
+    Keyword Args:
+        environ: environment variables to start from (defaults to os.environ)
+    """
+    env = dict(os.environ if environ is None else environ)
+    virtualenv_path = os.path.abspath(virtualenv_path)
+    env['VIRTUAL_ENV'] = virtualenv_path
+    env['PATH'] = os.pathsep.join([os.path.join(virtualenv_path, script_dir)] + [u for u in env.get('PATH', '').split(os.pathsep) if u])
+    env.pop('PYTHONHOME', None)
+    return env
+
+
+def find_command(command, path):
+    """
+    Find an executable on a PATH (as the environment's PATH is not searched on
+    windows), returning the command unchanged if it is not found
+
+    Args:
+        command: name or path of the executable
+        path: PATH string to search
+    """
+    if os.path.dirname(command):
+        return command
+    extensions = os.environ.get('PATHEXT', '.EXE;.BAT;.CMD').split(';') if 'win32' in sys.platform else []
+    for directory in path.split(os.pathsep):
+        for name in [command] + [command + u for u in extensions]:
+            candidate = os.path.join(directory, name)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+    return command
+
+
+def get_exit_code(returncode):
+    """
+    Get the exit code of a process as a shell would report it (128 + the
+    signal number for a process killed by a signal)
+
+    Args:
+        returncode: the subprocess return code
+    """
+    return 128 - returncode if returncode < 0 else returncode
+
+
+def run_in_virtualenv(virtualenv_path, command, prefix, lock, stream=None):
+    """
+    Run a command in a virtual environment, writing each line of its output
+    (stdout and stderr) to a stream with a prefix
+
+    Args:
+        virtualenv_path: path to the virtual environment
+        command: list of the command and its arguments
+        prefix: string to prefix each line of output with
+        lock: lock held while writing to the stream
+
+    Keyword Args:
+        stream: stream to write the output to (defaults to sys.stdout)
+
+    Returns the exit code
+    """
+    stream = sys.stdout if stream is None else stream
+    env = get_activation_env(virtualenv_path)
+    argv = [find_command(command[0], env['PATH'])] + list(command[1:])
+    # The commands run at the same time, so none of them can read the terminal
+    with open(os.devnull, 'rb') as devnull:
+        try:
+            process = subprocess.Popen(argv, env=env, stdin=devnull, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError as e:
+            with lock:
+                stream.write('{}{}: {}\n'.format(prefix, command[0], e.strerror))
+                stream.flush()
+            return 127
+    for line in iter(process.stdout.readline, b''):
+        with lock:
+            stream.write(prefix + line.decode('utf-8', 'replace').rstrip('\r\n') + '\n')
+            stream.flush()
+    process.stdout.close()
+    code = get_exit_code(process.wait())
+    if code != 0:
+        with lock:
+            stream.write('{}exited with code {}\n'.format(prefix, code))
+            stream.flush()
+    return code
+
+
+def run_in_virtualenvs(virtualenv_paths, command, jobs=None, stream=None):
+    """
+    Run a command in several virtual environments in parallel
+
+    Args:
+        virtualenv_paths: list of paths to the virtual environments
+        command: list of the command and its arguments
+
+    Keyword Args:
+        jobs: number of environments to run the command in at once (defaults
+              to all of them)
+        stream: stream to write the output to (defaults to sys.stdout)
+
+    Returns the worst (highest) exit code
+    """
+    if not virtualenv_paths:
+        return 0
+    names = [os.path.split(os.path.normpath(u))[-1] for u in virtualenv_paths]
+    width = max(len(u) for u in names)
+    lock = threading.Lock()
+    pool = ThreadPool(min(jobs or len(virtualenv_paths), len(virtualenv_paths)))
+    try:
+        codes = pool.map(lambda u: run_in_virtualenv(u[0], command, '{} | '.format(u[1].ljust(width)), lock, stream),
+                         zip(virtualenv_paths, names), chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return max(codes)
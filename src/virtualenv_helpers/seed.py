@@ -0,0 +1,166 @@
+"""
+seed.py
+*******
+Manage the offline cache of seed wheels (pip, setuptools and wheel) that are
+unpacked into new virtual environments instead of letting virtualenv or
+ensurepip install them.
+
+The cache defaults to ~/virtualenv_seed_wheels (next to the default wheels
+directory) but can be changed using the VENV_SEED_WHEELS_DIR environment
+variable. It holds one folder of pinned wheels per interpreter tag (e.g. cp36),
+which can be refreshed from an existing wheelhouse using refreshvenvseeds.
+"""
+import os
+import sys
+import glob
+import shutil
+import argparse
+import zipfile
+import subprocess
+
+from . import __version__
+from .tracing import span
+from .wheels import UnsupportedWheel
+from .wheels import canonical_name
+from .wheels import install_wheel
+from .wheels import is_compatible_wheel
+from .wheels import parse_version
+from .wheels import parse_wheel_filename
+
+default_seed_wheels_dir = os.path.join(os.path.expanduser('~'), 'virtualenv_seed_wheels')
+SEED_PACKAGES = ('pip', 'setuptools', 'wheel')
+is_windows = sys.platform.startswith('win')
+
+if is_windows:
+    SCRIPT_DIR = 'Scripts'
+    PYTHON = 'python.exe'
+else:
+    SCRIPT_DIR = 'bin'
+    PYTHON = 'python'
+
+
+def get_seed_wheels_dir():
+    """Get the seed wheels cache directory"""
+    return os.environ.get('VENV_SEED_WHEELS_DIR', default_seed_wheels_dir)
+
+
+def get_interpreter_tag(version):
+    """
+    Get the interpreter tag (e.g. cp36) for a python version
+
+    Args:
+        version: python version string
+    """
+    return 'cp{}'.format(version.replace('.', ''))
+
+
+def get_seed_wheels(version):
+    """
+    Get the cached seed wheels for a python version
+
+    Args:
+        version: python version string
+    """
+    return sorted(glob.glob(os.path.join(get_seed_wheels_dir(), get_interpreter_tag(version), '*.whl')))
+
+
+def has_seed_wheels(version):
+    """
+    Check if the cache has a pip seed wheel for a python version
+
+    Args:
+        version: python version string
+    """
+    return any(canonical_name(parse_wheel_filename(u)[0]) == 'pip' for u in get_seed_wheels(version))
+
+
+def refresh_seed_wheels(wheelhouse, versions):
+    """
+    Refresh the cached seed wheels from a wheelhouse, pinning the newest
+    compatible pip, setuptools and wheel for each python version
+
+    Args:
+        wheelhouse: directory containing the wheels to copy from
+        versions: list of python version strings
+
+    Returns a dictionary of python version to the list of cached wheels
+    """
+    refreshed = {}
+    for version in versions:
+        tag_dir = os.path.join(get_seed_wheels_dir(), get_interpreter_tag(version))
+        newest = {}
+        for wheel in glob.glob(os.path.join(wheelhouse, '*.whl')):
+            name, wheel_version, _ = parse_wheel_filename(wheel)
+            name = canonical_name(name)
+            if name not in SEED_PACKAGES or not is_compatible_wheel(wheel, version):
+                continue
+            if name not in newest or parse_version(wheel_version) > parse_version(parse_wheel_filename(newest[name])[1]):
+                newest[name] = wheel
+        if not os.path.isdir(tag_dir):
+            os.makedirs(tag_dir)
+        for cached in glob.glob(os.path.join(tag_dir, '*.whl')):
+            if canonical_name(parse_wheel_filename(cached)[0]) in newest:
+                os.remove(cached)
+        for name in SEED_PACKAGES:
+            if name in newest:
+                shutil.copy2(newest[name], tag_dir)
+            else:
+                print('No {} wheel for python {} found in {}'.format(name, version, wheelhouse))
+        refreshed[version] = get_seed_wheels(version)
+    return refreshed
+
+
+def seed_environment(version_virtualenv_dir, version):
+    """
+    Install pip, setuptools and wheel into a virtual environment created
+    without them. The cached seed wheels are unpacked if there are any for the
+    python version (including pip), otherwise (or if one cannot be unpacked)
+    the wheels bundled with ensurepip are used (so no network access is
+    needed either way)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Returns the exit code (0 if the environment was seeded)
+    """
+    # A cache without pip (e.g. only setuptools was refreshed) would leave the environment without pip
+    if has_seed_wheels(version):
+        wheels = get_seed_wheels(version)
+        try:
+            with span('seed', version=version, wheels=wheels):
+                for wheel in wheels:
+                    install_wheel(wheel, version_virtualenv_dir, version)
+            return 0
+        except (UnsupportedWheel, zipfile.BadZipfile) as e:
+            print('Unable to unpack {}, falling back to ensurepip: {}'.format(os.path.split(wheel)[-1], e))
+    python = os.path.join(version_virtualenv_dir, SCRIPT_DIR, PYTHON)
+    argv = [python, '-m', 'ensurepip', '--default-pip']
+    with span('seed', version=version, argv=argv):
+        return subprocess.call(argv, stdout=sys.stdout, stderr=sys.stderr)
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Refresh the seed wheels (pip, setuptools and wheel) used for new virtual environments from a wheelhouse')
+    parser.add_argument(dest='wheelhouse', metavar='Wheelhouse', type=str, help='Directory of wheels to copy the seed wheels from')
+    parser.add_argument('-p', '--py-version', '--python-version', dest='python_versions', help="Python versions to refresh the seed wheels for (default the current version)", default=None, nargs='+', action='append')
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def refresh(args=None):
+    """
+    Refresh the seed wheels cache
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_parser().parse_args(args)
+    if options.python_versions is None:
+        versions = ['{}.{}'.format(sys.version_info.major, sys.version_info.minor)]
+    else:
+        versions = [ver.lower().lstrip('py').lstrip('thon') for u in options.python_versions for ver in u]
+    for version, wheels in sorted(refresh_seed_wheels(options.wheelhouse, versions).items()):
+        print('Python {}: {}'.format(version, ', '.join(os.path.split(u)[-1] for u in wheels) or 'no seed wheels'))
@@ -0,0 +1,39 @@
+# bash completion for workon and create_venv
+#
+# Source this file from ~/.bashrc:
+#     source "$(python -m virtualenv_helpers.completion --script bash)"
+#
+# Names are read from the index kept in the VENV_DIR directory, python is only
+# started when the index is missing or older than the directory.
+
+_virtualenv_helpers_names() {
+    local venv_dir="${VENV_DIR:-$HOME/virtualenvs}"
+    local index="$venv_dir/.venv_names"
+    if [ -f "$index" ] && ! [ "$venv_dir" -nt "$index" ]; then
+        echo "$(<"$index")"
+    elif [ -d "$venv_dir" ]; then
+        "${VENV_HELPERS_PYTHON:-python}" -m virtualenv_helpers.completion 2>/dev/null
+    fi
+}
+
+_virtualenv_helpers_complete() {
+    local cur="${COMP_WORDS[COMP_CWORD]}"
+    local prev="${COMP_WORDS[COMP_CWORD-1]}"
+    COMPREPLY=()
+    case "$prev" in
+        --path|--virtualenv-path|-d|--directory)
+            COMPREPLY=( $(compgen -d -- "$cur") )
+            return 0
+            ;;
+        -p|--py|--py-version|--python-version|-e|--editor)
+            return 0
+            ;;
+    esac
+    if [[ "$cur" != -* ]]; then
+        COMPREPLY=( $(compgen -W "$(_virtualenv_helpers_names)" -- "$cur") )
+    fi
+}
+
+complete -o default -F _virtualenv_helpers_complete workon
+complete -o default -F _virtualenv_helpers_complete create_venv3
+complete -o default -F _virtualenv_helpers_complete create_venv
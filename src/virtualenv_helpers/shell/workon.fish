@@ -0,0 +1,30 @@
+# fish completion for workon and create_venv
+#
+# Source this file from ~/.config/fish/config.fish:
+#     source (python -m virtualenv_helpers.completion --script fish)
+#
+# Names are read from the index kept in the VENV_DIR directory, python is only
+# started when the index is missing or older than the directory.
+
+function __virtualenv_helpers_names
+    set -l venv_dir $VENV_DIR
+    if test -z "$venv_dir"
+        set venv_dir $HOME/virtualenvs
+    end
+    set -l index $venv_dir/.venv_names
+    if test -f $index; and not command test $venv_dir -nt $index
+        while read -l name
+            echo $name
+        end < $index
+    else if test -d $venv_dir
+        set -l python $VENV_HELPERS_PYTHON
+        if test -z "$python"
+            set python python
+        end
+        $python -m virtualenv_helpers.completion 2>/dev/null
+    end
+end
+
+complete -c workon -a '(__virtualenv_helpers_names)'
+complete -c create_venv3 -a '(__virtualenv_helpers_names)'
+complete -c create_venv -a '(__virtualenv_helpers_names)'
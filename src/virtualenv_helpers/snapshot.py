@@ -0,0 +1,274 @@
+"""
+snapshot.py
+***********
+Pack a virtual environment into a compressed tar archive, and restore it into
+a new location, so that a heavy environment can be restored in seconds instead
+of recreated.
+
+The first member of the archive is a manifest with the environment's original
+path and the files that contain it (scripts, activate scripts, pyvenv.cfg and
+.pth files). Restoring stream-extracts the archive and rewrites the original
+path in those files as they are extracted, in a single pass. The archive can
+be written to stdout or read from stdin using -.
+"""
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import tarfile
+import contextlib
+import argparse
+
+from . import __version__
+from .find import get_virtualenv_dir
+from .find import get_virtualenv_path
+from .find import update_names_index
+from .relocate import find_prefix_files
+from .registry import register_environment
+from .tracing import traced
+
+SNAPSHOT_MANIFEST = 'virtualenv_helpers_snapshot.json'
+COMPRESSIONS = {'.tar.gz': 'gz', '.tgz': 'gz', '.tar.bz2': 'bz2', '.tar.xz': 'xz', '.tar': ''}
+
+
+def get_compression(archive):
+    """
+    Get the compression for an archive from its extension (gz by default)
+
+    Args:
+        archive: path to the archive
+    """
+    for extension, compression in COMPRESSIONS.items():
+        if archive.endswith(extension):
+            return compression
+    return 'gz'
+
+
+def _open_archive(archive):
+    """Open a streaming tar archive for reading, using stdin for -"""
+    if archive != '-':
+        return tarfile.open(archive, 'r|*')
+    return tarfile.open(fileobj=getattr(sys.stdin, 'buffer', sys.stdin), mode='r|*')
+
+
+@contextlib.contextmanager
+def _write_archive(archive, compression, level):
+    """Open a streaming tar archive for writing, using stdout for -"""
+    raw = getattr(sys.stdout, 'buffer', sys.stdout) if archive == '-' else open(archive, 'wb')
+    try:
+        if compression == 'gz':
+            compressed = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level)
+        elif compression == 'bz2':
+            import bz2
+            compressed = bz2.BZ2File(raw, 'wb', compresslevel=level)
+        elif compression == 'xz':
+            import lzma
+            compressed = lzma.LZMAFile(raw, 'wb', preset=level)
+        else:
+            compressed = None
+        try:
+            with tarfile.open(fileobj=compressed or raw, mode='w|') as tar:
+                yield tar
+        finally:
+            if compressed is not None:
+                compressed.close()
+    finally:
+        if archive != '-':
+            raw.close()
+
+
+@traced
+def snapshot(version_virtualenv_dir, archive, compression=None, level=6):
+    """
+    Pack a virtual environment into a tar archive with streaming compression
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        archive: path to the archive (- for stdout)
+
+    Keyword Args:
+        compression: gz, bz2, xz or '' (defaults to the archive extension)
+        level: compression level (the default 6 is much faster than 9 for a
+               slightly larger archive)
+
+    Returns the snapshot manifest
+    """
+    if compression is None:
+        compression = get_compression(archive)
+    version_virtualenv_dir = os.path.abspath(version_virtualenv_dir)
+    manifest = {'name': os.path.split(version_virtualenv_dir)[-1],
+                'prefix': version_virtualenv_dir,
+                'rewrite': find_prefix_files(version_virtualenv_dir, version_virtualenv_dir)}
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    with _write_archive(archive, compression, level) as tar:
+        info = tarfile.TarInfo(SNAPSHOT_MANIFEST)
+        info.size = len(data)
+        info.mtime = time.time()
+        tar.addfile(info, io.BytesIO(data))
+        for root, dirs, files in os.walk(version_virtualenv_dir):
+            for name in sorted(dirs) + sorted(files):
+                path = os.path.join(root, name)
+                tar.add(path, arcname=os.path.relpath(path, version_virtualenv_dir).replace(os.sep, '/'), recursive=False)
+    return manifest
+
+
+def _is_safe(name):
+    """Check that an archive member is extracted inside the target directory"""
+    parts = name.replace('\\', '/').split('/')
+    return not (name.startswith(('/', '\\')) or os.path.splitdrive(name)[0] or '..' in parts)
+
+
+def _has_symlink(version_virtualenv_dir, name):
+    """Check if any component of an archive member's path is a symlink already extracted"""
+    path = version_virtualenv_dir
+    for part in name.split('/'):
+        path = os.path.join(path, part)
+        if os.path.islink(path):
+            return True
+    return False
+
+
+@traced
+def restore(archive, version_virtualenv_dir=None, virtualenv_dir=None):
+    """
+    Restore a virtual environment from a snapshot archive, rewriting the
+    original path to the new location while extracting
+
+    Args:
+        archive: path to the archive (- for stdin)
+
+    Keyword Args:
+        version_virtualenv_dir: Directory of the new virtual environment
+                                directory (defaults to the original name in
+                                virtualenv_dir)
+        virtualenv_dir: Directory to restore the virtual environment directory
+                        in (defaults to the VENV_DIR directory)
+
+    Returns a tuple of the restored virtual environment directory and the
+    snapshot manifest
+    """
+    encoding = sys.getfilesystemencoding()
+    with _open_archive(archive) as tar:
+        member = tar.next()
+        if member is None or member.name != SNAPSHOT_MANIFEST:
+            raise ValueError('{} is not a virtual environment snapshot'.format(archive))
+        manifest = json.loads(tar.extractfile(member).read().decode('utf-8'))
+        if version_virtualenv_dir is None:
+            version_virtualenv_dir = os.path.join(virtualenv_dir or get_virtualenv_dir(), manifest['name'])
+        version_virtualenv_dir = os.path.abspath(version_virtualenv_dir)
+        if os.path.exists(version_virtualenv_dir):
+            raise ValueError('{} already exists'.format(version_virtualenv_dir))
+        old = manifest['prefix'].encode(encoding)
+        new = version_virtualenv_dir.encode(encoding)
+        rewrite = set(manifest['rewrite'])
+        os.makedirs(version_virtualenv_dir)
+        kwargs = {'filter': 'tar'} if hasattr(tarfile, 'tar_filter') else {}
+        try:
+            # Iterate with next() as a stream cannot be rewound
+            for member in iter(tar.next, None):
+                if not _is_safe(member.name):
+                    raise ValueError('Unsafe path {} in {}'.format(member.name, archive))
+                if member.isfile() and member.name in rewrite:
+                    # Written directly rather than by tarfile, so do not follow a symlink out of the environment
+                    if _has_symlink(version_virtualenv_dir, member.name):
+                        raise ValueError('Unsafe path {} in {}'.format(member.name, archive))
+                    path = os.path.join(version_virtualenv_dir, *member.name.split('/'))
+                    data = tar.extractfile(member).read().replace(old, new)
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                    os.chmod(path, member.mode)
+                else:
+                    tar.extract(member, version_virtualenv_dir, **kwargs)
+        except BaseException:
+            # A partly restored environment would stop the restore being retried
+            shutil.rmtree(version_virtualenv_dir, ignore_errors=True)
+            raise
+    home = _read_home(version_virtualenv_dir)
+    if home is not None and not os.path.isdir(home):
+        print('Warning: the base python directory {} in pyvenv.cfg does not exist'.format(home))
+    return version_virtualenv_dir, manifest
+
+
+def _read_home(version_virtualenv_dir):
+    """Read the base python directory from pyvenv.cfg"""
+    try:
+        with open(os.path.join(version_virtualenv_dir, 'pyvenv.cfg')) as f:
+            for line in f:
+                key, _, value = line.partition('=')
+                if key.strip() == 'home':
+                    return value.strip()
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def create_snapshot_parser():
+    """Create the command line parser for snapshotvenv"""
+    parser = argparse.ArgumentParser(description='Pack a virtual environment into a compressed tar archive that can be restored with restorevenv')
+    parser.add_argument(dest='archive', metavar='Archive', type=str, help='Path to the archive (.tar.gz, .tar.bz2, .tar.xz or .tar), - for stdout')
+    parser.add_argument(dest='path', metavar='Path', type=str, nargs='?', help='Path or name of the virtual environment (default found from the current directory)', default=None)
+    parser.add_argument('-p', '--py', '--py-version', dest='python_version', help='Python version of the virtual environment', default=None)
+    parser.add_argument('-c', '--compression', dest='compression', choices=('gz', 'bz2', 'xz', 'none'), help="Compression (default from the archive extension, or gz)", default=None)
+    parser.add_argument('-l', '--level', dest='level', type=int, choices=range(1, 10), metavar='1-9', help="Compression level (default 6)", default=6)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def create_restore_parser():
+    """Create the command line parser for restorevenv"""
+    parser = argparse.ArgumentParser(description='Restore a virtual environment from an archive created with snapshotvenv')
+    parser.add_argument(dest='archive', metavar='Archive', type=str, help='Path to the archive, - for stdin')
+    parser.add_argument(dest='name', metavar='Name', type=str, nargs='?', help='Name of the restored virtual environment (default the original name)', default=None)
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Directory to restore the virtual environment in (default VENV_DIR)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def snapshot_command(args=None):
+    """
+    Snapshot a virtual environment
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_snapshot_parser().parse_args(args)
+    python_version = options.python_version or '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+    virtualenv_path = get_virtualenv_path(python_version.lower().lstrip('py').lstrip('thon'), options.path)[0]
+    if virtualenv_path is None:
+        print('No virtual environment found')
+        return 1
+    compression = '' if options.compression == 'none' else options.compression
+    start = time.time()
+    manifest = snapshot(virtualenv_path, options.archive, compression, options.level)
+    if options.archive != '-':
+        print('Snapshot of {} written to {} in {:.2f}s ({} files to relocate)'.format(
+            virtualenv_path, options.archive, time.time() - start, len(manifest['rewrite'])))
+    return 0
+
+
+def restore_command(args=None):
+    """
+    Restore a virtual environment
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_restore_parser().parse_args(args)
+    virtualenv_dir = options.virtualenv_dir or get_virtualenv_dir()
+    version_virtualenv_dir = None if options.name is None else os.path.join(virtualenv_dir, options.name)
+    start = time.time()
+    try:
+        version_virtualenv_dir = restore(options.archive, version_virtualenv_dir, virtualenv_dir)[0]
+    except ValueError as e:
+        print(e)
+        return 1
+    if os.path.abspath(virtualenv_dir) == os.path.abspath(get_virtualenv_dir()):
+        update_names_index(virtualenv_dir)
+    register_environment(version_virtualenv_dir)
+    print('Restored {} in {:.2f}s'.format(version_virtualenv_dir, time.time() - start))
+    return 0
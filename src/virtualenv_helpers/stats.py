@@ -0,0 +1,176 @@
+"""
+stats.py
+********
+Count the filesystem probes (os.path.exists, os.stat, os.scandir, ...) and
+subprocess launches made by virtualenv_helpers, broken down by the function
+making them.
+
+Use the collect context manager::
+
+    with collect() as stats:
+        find_virtualenv('3.6')
+    stats.count('find.find_local_env', 'exists')
+
+or set the VENV_HELPERS_STATS environment variable to 1 to print a summary
+when the process exits.
+"""
+import os
+import sys
+import time
+import atexit
+import threading
+import functools
+import subprocess
+import contextlib
+
+timer = getattr(time, 'perf_counter', time.time)
+PROBES = [(os.path, 'exists'), (os.path, 'isdir'), (os.path, 'isfile'), (os.path, 'islink'),
+          (os, 'stat'), (os, 'lstat'), (os, 'listdir'), (os, 'scandir')]
+SUBPROCESS_FUNCTIONS = ['call', 'check_call', 'check_output', 'run']
+SUBPROCESS = 'subprocess'
+_package = __name__.rsplit('.', 1)[0]
+_active = []
+_originals = {}
+_lock = threading.Lock()
+_state = threading.local()
+
+
+class Stats(object):
+    """Counts and timings of filesystem probes and subprocess launches by function"""
+
+    def __init__(self):
+        self.counts = {}
+        self.times = {}
+
+    def record(self, function, kind, duration):
+        key = (function, kind)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.times[key] = self.times.get(key, 0.0) + duration
+
+    def count(self, function=None, kind=None):
+        """
+        Get the number of calls, optionally filtered by function and kind
+
+        Keyword Args:
+            function: function name (module.function, e.g. find.find_local_env)
+            kind: probe name (e.g. exists, stat, scandir) or subprocess
+        """
+        return sum(count for (f, k), count in self.counts.items()
+                   if (function is None or f == function) and (kind is None or k == kind))
+
+    def probes(self, function=None):
+        """
+        Get the number of filesystem probes, optionally for one function
+
+        Keyword Args:
+            function: function name (module.function, e.g. find.find_local_env)
+        """
+        return self.count(function) - self.count(function, SUBPROCESS)
+
+    def subprocesses(self, function=None):
+        """
+        Get the number of subprocess launches, optionally for one function
+
+        Keyword Args:
+            function: function name (module.function, e.g. create.create)
+        """
+        return self.count(function, SUBPROCESS)
+
+    def summary(self):
+        """Get a text summary of the counts and timings"""
+        lines = ['{:<48} {:<12} {:>8} {:>12}'.format('function', 'call', 'count', 'time (ms)')]
+        for key in sorted(self.counts):
+            lines.append('{:<48} {:<12} {:>8} {:>12.3f}'.format(key[0], key[1], self.counts[key], self.times[key]*1e3))
+        lines.append('{} filesystem probes, {} subprocesses'.format(self.probes(), self.subprocesses()))
+        return '\n'.join(lines)
+
+
+def _caller():
+    """Get the name of the innermost virtualenv_helpers function on the stack"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(_package+'.') and module != __name__ and not module.startswith(_package+'.tests'):
+            return '{}.{}'.format(module[len(_package)+1:], frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+def _instrument(function, kind):
+    """Wrap a function so calls made from virtualenv_helpers are recorded"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, 'active', False):
+            # Nested call (e.g. os.stat inside os.path.exists)
+            return function(*args, **kwargs)
+        caller = _caller()
+        if caller is None:
+            return function(*args, **kwargs)
+        _state.active = True
+        start = timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            duration = timer() - start
+            _state.active = False
+            for stats in list(_active):
+                stats.record(caller, kind, duration)
+    return wrapper
+
+
+def _install():
+    for module, name in PROBES:
+        if hasattr(module, name):
+            _originals[(module, name)] = getattr(module, name)
+            setattr(module, name, _instrument(getattr(module, name), name))
+    for name in SUBPROCESS_FUNCTIONS:
+        if hasattr(subprocess, name):
+            _originals[(subprocess, name)] = getattr(subprocess, name)
+            setattr(subprocess, name, _instrument(getattr(subprocess, name), SUBPROCESS))
+    _originals[(subprocess, 'Popen')] = subprocess.Popen
+    popen = subprocess.Popen
+
+    class Popen(popen):
+        __init__ = _instrument(popen.__init__, SUBPROCESS)
+
+    subprocess.Popen = Popen
+
+
+def _uninstall():
+    for (module, name), function in _originals.items():
+        setattr(module, name, function)
+    _originals.clear()
+
+
+@contextlib.contextmanager
+def collect():
+    """Collect the filesystem probe and subprocess counts made during the with block"""
+    stats = Stats()
+    with _lock:
+        if not _active:
+            _install()
+        _active.append(stats)
+    try:
+        yield stats
+    finally:
+        with _lock:
+            _active.remove(stats)
+            if not _active:
+                _uninstall()
+
+
+def print_on_exit(stream=None):
+    """
+    Collect counts for the rest of the process and print a summary on exit
+
+    Keyword Args:
+        stream: file object to print to (defaults to stderr)
+    """
+    context = collect()
+    stats = context.__enter__()
+
+    def report():
+        context.__exit__(None, None, None)
+        (stream or sys.stderr).write(stats.summary()+'\n')
+    atexit.register(report)
+    return stats
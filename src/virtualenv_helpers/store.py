@@ -0,0 +1,224 @@
+"""
+store.py
+********
+Content-addressed store of the files installed into virtual environments, so
+that identical files (e.g. the same numpy wheel in many environments) are kept
+once and hardlinked into each environment.
+
+The store is opt-in: files unpacked from wheels are linked from the store when
+the VENV_STORE_DIR environment variable is set. Existing environments can be
+converted in place using dedupevenvs, which uses VENV_STORE_DIR or defaults to
+~/virtualenv_store.
+
+Files in the store are made read-only, as they are shared between
+environments, and are keyed by the sha256 of their contents (and whether they
+are executable). Files are always replaced rather than written in place, so a
+shared file is never modified.
+"""
+import os
+import sys
+import stat
+import errno
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .find import find_site_packages
+from .find import get_virtualenv_paths
+
+default_store_dir = os.path.join(os.path.expanduser('~'), 'virtualenv_store')
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_store_dir():
+    """Get the store directory used for installs, or None if the store is not enabled"""
+    return os.environ.get('VENV_STORE_DIR', None) or None
+
+
+def get_store_path(store_dir, digest, executable=False):
+    """
+    Get the path of a file in the store
+
+    Args:
+        store_dir: the store directory
+        digest: sha256 hex digest of the file contents
+
+    Keyword Args:
+        executable: whether the file is executable
+    """
+    return os.path.join(store_dir, digest[:2], digest[2:] + ('.x' if executable else ''))
+
+
+def _makedirs(path):
+    """Create a directory (and parents) if it does not exist, allowing for concurrent use"""
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+
+
+def _replace_with_link(source, target):
+    """Replace target with a hardlink to source, atomically if it exists"""
+    temp_path = '{}.{}.link'.format(target, os.getpid())
+    os.link(source, temp_path)
+    try:
+        getattr(os, 'replace', os.rename)(temp_path, target)
+    except OSError:
+        os.remove(temp_path)
+        raise
+
+
+def link_data(store_dir, data, target, executable=False):
+    """
+    Install a file by hardlinking it from the store, adding it to the store if
+    it is not there yet. Falls back to writing the file if it cannot be linked
+    (e.g. the store is on another filesystem)
+
+    Args:
+        store_dir: the store directory
+        data: file contents (bytes)
+        target: path to install the file to
+
+    Keyword Args:
+        executable: whether the file is executable
+    """
+    stored = get_store_path(store_dir, hashlib.sha256(data).hexdigest(), executable)
+    mode = 0o555 if executable else 0o444
+    try:
+        if not os.path.exists(stored):
+            _makedirs(os.path.dirname(stored))
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(stored))
+            with os.fdopen(handle, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_path, mode)
+            getattr(os, 'replace', os.rename)(temp_path, stored)
+        _replace_with_link(stored, target)
+        return True
+    except (IOError, OSError):
+        if os.path.lexists(target):
+            os.remove(target)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if executable:
+            os.chmod(target, 0o755)
+        return False
+
+
+def file_digest(path):
+    """
+    Get the sha256 hex digest of a file's contents
+
+    Args:
+        path: path to the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dedupe_file(store_dir, path):
+    """
+    Replace a file with a hardlink to the identical file in the store, adding
+    it to the store if it is not there yet
+
+    Args:
+        store_dir: the store directory
+        path: path to the file
+
+    Returns the number of bytes saved
+    """
+    try:
+        file_stat = os.lstat(path)
+    except OSError:
+        return 0
+    if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+        return 0
+    executable = bool(file_stat.st_mode & 0o111)
+    stored = get_store_path(store_dir, file_digest(path), executable)
+    try:
+        try:
+            stored_stat = os.stat(stored)
+        except OSError:
+            # New content, so the file becomes the stored copy
+            _makedirs(os.path.dirname(stored))
+            try:
+                os.link(path, stored)
+                os.chmod(stored, 0o555 if executable else 0o444)
+                return 0
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            stored_stat = os.stat(stored)
+        if (stored_stat.st_dev, stored_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino):
+            return 0
+        _replace_with_link(stored, path)
+    except OSError as e:
+        # e.g. the store is on another filesystem, or the file has too many links
+        print('Unable to link {}: {}'.format(path, e))
+        return 0
+    return file_stat.st_size
+
+
+def dedupe(version_virtualenv_dirs, store_dir, workers=None):
+    """
+    Convert the site-packages of virtual environments in place to hardlinks
+    into the store, using a thread pool
+
+    Args:
+        version_virtualenv_dirs: list of virtual environment directories
+        store_dir: the store directory
+
+    Keyword Args:
+        workers: number of threads to use (defaults to the CPU count)
+
+    Returns a tuple of the number of files checked and the bytes saved
+    """
+    paths = []
+    for version_virtualenv_dir in version_virtualenv_dirs:
+        for site_packages in find_site_packages(version_virtualenv_dir):
+            for root, dirs, files in os.walk(site_packages):
+                paths += [os.path.join(root, u) for u in files]
+    if not paths:
+        return 0, 0
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(paths)))
+    try:
+        saved = pool.map(lambda path: dedupe_file(store_dir, path), paths, chunksize=64)
+    finally:
+        pool.close()
+        pool.join()
+    return len(paths), sum(saved)
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Deduplicate the site-packages of virtual environments by hardlinking identical files from a content-addressed store')
+    parser.add_argument(dest='paths', metavar='Path', type=str, nargs='*', help='Virtual environments to deduplicate (default all the environments in VENV_DIR)')
+    parser.add_argument('-s', '--store', dest='store_dir', help="Store directory (default VENV_STORE_DIR or ~/virtualenv_store)", default=get_store_dir() or default_store_dir)
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of threads to use (default the CPU count)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def dedupe_command(args=None):
+    """
+    Deduplicate virtual environments
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+    """
+    options = create_parser().parse_args(args)
+    paths = options.paths or get_virtualenv_paths()
+    files, saved = dedupe(paths, options.store_dir, options.workers)
+    print('Checked {} files in {} environments, saved {:.1f} MB'.format(files, len(paths), saved / (1024.0 * 1024)))
+
+
+if __name__ == '__main__':
+    dedupe_command(sys.argv[1:])
@@ -0,0 +1,64 @@
+"""
+builders.py
+***********
+Build test fixtures (wheels and virtual environment skeletons)
+"""
+import os
+import sys
+import zipfile
+
+
+def make_wheel(wheels_dir, name, version, tag='py2.py3-none-any', files=None, entry_points=None, requires=()):
+    """
+    Build a minimal wheel
+
+    Args:
+        wheels_dir: directory to write the wheel to
+        name: distribution name
+        version: distribution version
+
+    Keyword Args:
+        tag: wheel tag
+        files: dictionary of archive path to contents (defaults to a module named after the distribution)
+        entry_points: contents of entry_points.txt
+        requires: list of Requires-Dist requirement strings
+    """
+    dist_info = '{}-{}.dist-info'.format(name, version)
+    if files is None:
+        files = {'{}.py'.format(name): 'VALUE = {!r}\n'.format(version)}
+    files = dict(files)
+    metadata = 'Metadata-Version: 2.1\nName: {}\nVersion: {}\n'.format(name, version)
+    metadata += ''.join('Requires-Dist: {}\n'.format(u) for u in requires)
+    files['{}/METADATA'.format(dist_info)] = metadata
+    files['{}/WHEEL'.format(dist_info)] = 'Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: {}\n'.format(tag)
+    if entry_points is not None:
+        files['{}/entry_points.txt'.format(dist_info)] = entry_points
+    files['{}/RECORD'.format(dist_info)] = ''.join('{},,\n'.format(u) for u in sorted(files)) + '{}/RECORD,,\n'.format(dist_info)
+    wheel_path = os.path.join(wheels_dir, '{}-{}-{}.whl'.format(name, version, tag))
+    with zipfile.ZipFile(wheel_path, 'w') as wheel:
+        for filename, content in sorted(files.items()):
+            wheel.writestr(filename, content)
+    return wheel_path
+
+
+def make_virtualenv(version_virtualenv_dir, version=None):
+    """
+    Create the skeleton of a virtual environment (scripts and site-packages
+    directories), returning the site-packages directory
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+
+    Keyword Args:
+        version: python version string (defaults to the current version)
+    """
+    if version is None:
+        version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+    if sys.platform.startswith('win'):
+        site_packages = os.path.join(version_virtualenv_dir, 'Lib', 'site-packages')
+        os.makedirs(os.path.join(version_virtualenv_dir, 'Scripts'))
+    else:
+        site_packages = os.path.join(version_virtualenv_dir, 'lib', 'python{}'.format(version), 'site-packages')
+        os.makedirs(os.path.join(version_virtualenv_dir, 'bin'))
+    os.makedirs(site_packages)
+    return site_packages
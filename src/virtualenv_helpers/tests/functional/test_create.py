@@ -39,7 +39,7 @@ class CreateTestCase(unittest.TestCase):
 
     def test_create(self):
         with TemporaryDirectory() as virtualenv_dir, Quiet():
-            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path, VENV_HELPERS_CACHE_DIR=os.path.join(virtualenv_dir.path, '.cache')):
                 current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
                 create(['test_virtual_env'])
                 self.assertTrue(os.path.exists(os.path.join(virtualenv_dir.path, 'test_virtual_env-{}'.format(current_version))))
@@ -130,6 +130,18 @@ class ActivateTestCase(unittest.TestCase):
         options, version = parse_options(['--virtualenv-path', 'test'])
         self.assertEqual(options.virtualenv_path, 'test')
 
+    def test_parse_options_command(self):
+        options, version = parse_options(['--all', '-p', '2.7,3.6', '--', 'pytest', '-x', '--', 'abc'])
+        self.assertTrue(options.all)
+        self.assertEqual(options.python_version, '2.7,3.6')
+        self.assertEqual(options.command, ['pytest', '-x', '--', 'abc'])
+        options, version = parse_options(['abc', '--', 'pip', 'list'])
+        self.assertFalse(options.all)
+        self.assertEqual(options.path, 'abc')
+        self.assertEqual(options.command, ['pip', 'list'])
+        options, version = parse_options([])
+        self.assertIsNone(options.command)
+
     def test_create_parser(self):
         parser = create_parser()
         self.assertIsInstance(parser, argparse.ArgumentParser)
@@ -0,0 +1,57 @@
+"""test_virtualenv_helpers/backends.py
+**************************************
+Provides unit tests for virtualenv_helpers/backends.py
+"""
+
+import unittest
+import os
+import sys
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import Quiet
+
+import virtualenv_helpers.backends as backends
+from virtualenv_helpers.backends import create_venv_parser
+from virtualenv_helpers.backends import is_running_python
+from virtualenv_helpers.backends import create_environment
+
+
+class BackendsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._seed_environment = backends.seed_environment
+        self.seeded = []
+        backends.seed_environment = lambda path, version: self.seeded.append(path)
+
+    def tearDown(self):
+        backends.seed_environment = self._seed_environment
+
+    def test_create_venv_parser(self):
+        options, unknown = create_venv_parser().parse_known_args(['--clear', '--copies', '--prompt', 'abc', '--no-download'])
+        self.assertTrue(options.clear)
+        self.assertFalse(options.symlinks)
+        self.assertFalse(options.system_site_packages)
+        self.assertEqual(options.prompt, 'abc')
+        self.assertEqual(unknown, ['--no-download'])
+
+    def test_is_running_python(self):
+        self.assertTrue(is_running_python('{}.{}'.format(sys.version_info.major, sys.version_info.minor)))
+        self.assertFalse(is_running_python('1.0'))
+
+    def test_create_environment_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_environment('abc', '2.7', 'env', 'python2.7', [])
+
+    @unittest.skipIf(backends.venv is None, 'Test requires the venv module')
+    def test_create_environment_venv_in_process(self):
+        current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+        with TemporaryDirectory() as t, Quiet():
+            env_dir = os.path.join(t.path, 'env')
+            create_environment('venv', current_version, env_dir, sys.executable, ['--system-site-packages'])
+            with open(os.path.join(env_dir, 'pyvenv.cfg')) as f:
+                self.assertIn('include-system-site-packages = true', f.read())
+            self.assertEqual(self.seeded, [env_dir])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""test_virtualenv_helpers/batch.py
+***********************************
+Provides unit tests for virtualenv_helpers/batch.py
+"""
+
+import unittest
+import os
+import json
+import threading
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+
+import virtualenv_helpers.batch as batch
+from virtualenv_helpers.batch import read_batch_file
+from virtualenv_helpers.batch import get_create_args
+from virtualenv_helpers.batch import run_batch
+from virtualenv_helpers.batch import format_summary
+from virtualenv_helpers.batch import batch_command
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self._call = batch.subprocess.call
+
+        def call(argv, cwd=None, stdout=None, stderr=None):
+            with self.lock:
+                self.calls.append((os.path.split(cwd)[-1], argv[3:]))
+            stdout.write(b'output\n')
+            return 3 if os.path.split(cwd)[-1] == 'bad' else 0
+        batch.subprocess.call = call
+
+    def tearDown(self):
+        batch.subprocess.call = self._call
+
+    def write_batch(self, projects, defaults=None):
+        with open('projects.json', 'w') as f:
+            json.dump({'defaults': defaults or {}, 'projects': projects}, f)
+        return 'projects.json'
+
+    def test_read_batch_file_json(self):
+        with TemporaryDirectory() as t:
+            path = self.write_batch([{'path': 'abc'}, {'path': 'def', 'name': 'ghi', 'versions': '2.7'}], {'wheels': True})
+            projects = read_batch_file(path)
+            self.assertEqual([u['path'] for u in projects], [os.path.join(t.path, 'abc'), os.path.join(t.path, 'def')])
+            self.assertEqual([u['name'] for u in projects], ['abc', 'ghi'])
+            self.assertEqual([u['versions'] for u in projects], [[], ['2.7']])
+            self.assertTrue(all(u['wheels'] for u in projects))
+
+    @unittest.skipIf(batch.tomllib is None, 'No TOML parser available')
+    def test_read_batch_file_toml(self):
+        with TemporaryDirectory() as t:
+            with open('projects.toml', 'w') as f:
+                f.write('[defaults]\nversions = ["3.6"]\n\n[[projects]]\npath = "abc"\nargs = ["--backend", "venv"]\n')
+            projects = read_batch_file('projects.toml')
+            self.assertEqual(projects[0]['path'], os.path.join(t.path, 'abc'))
+            self.assertEqual(projects[0]['versions'], ['3.6'])
+            self.assertEqual(projects[0]['args'], ['--backend', 'venv'])
+
+    def test_read_batch_file_invalid(self):
+        with TemporaryDirectory():
+            with open('projects.json', 'w') as f:
+                f.write('{')
+            self.assertRaises(ValueError, read_batch_file, 'projects.json')
+            self.assertRaises(ValueError, read_batch_file, self.write_batch({}))
+            self.assertRaises(ValueError, read_batch_file, self.write_batch([{'name': 'abc'}]))
+            self.assertRaises(ValueError, read_batch_file, self.write_batch([{'path': 'abc', 'colour': 'red'}]))
+            self.assertRaises(ValueError, read_batch_file, self.write_batch([{'path': 'abc'}, {'path': 'def', 'name': 'abc'}]))
+
+    def test_get_create_args(self):
+        project = dict(batch.PROJECT_DEFAULTS, name='abc')
+        self.assertEqual(get_create_args(project), ['abc'])
+        project.update(versions=['2.7', '3.6'], wheels=True, backend='venv', args=['--clear'])
+        self.assertEqual(get_create_args(project), ['abc', '--ignore-current-version', '--py-version', '2.7', '3.6',
+                                                    '--wheels', '--backend', 'venv', '--clear'])
+
+    def test_run_batch(self):
+        with TemporaryDirectory() as t:
+            for name in ('abc', 'bad', 'def'):
+                os.mkdir(name)
+            os.mkdir('logs')
+            projects = read_batch_file(self.write_batch([{'path': 'abc'}, {'path': 'bad'}, {'path': 'missing'},
+                                                         {'path': 'def', 'precompile': False}]))
+            results = run_batch(projects, os.path.join(t.path, 'logs'), io_jobs=2, cpu_jobs=1)
+            self.assertEqual([u['status'] for u in results], ['ok', 'create failed (3)', 'not found', 'ok'])
+            self.assertEqual(sorted(u[0] for u in self.calls), ['abc', 'abc', 'bad', 'def'])
+            # Create without compiling, then compile
+            abc = [u[1] for u in self.calls if u[0] == 'abc']
+            self.assertEqual(abc[0][-1], '--no-precompile')
+            self.assertEqual(abc[1][-2], '--jobs')
+            with open(os.path.join('logs', 'abc.log'), 'rb') as f:
+                self.assertEqual(f.read().count(b'output\n'), 2)
+            self.assertIsNotNone(results[0]['precompile'])
+            self.assertIsNone(results[3]['precompile'])
+            summary = format_summary(results).splitlines()
+            self.assertEqual(len(summary), 5)
+            self.assertTrue(summary[0].startswith('Project  Status'))
+
+    def test_batch_command(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            os.mkdir('abc')
+            path = self.write_batch([{'path': 'abc'}])
+            self.assertEqual(batch_command(path), 0)
+            self.assertTrue(os.path.exists(os.path.join(t.path, 'cache', 'batch', 'abc.log')))
+            os.mkdir('bad')
+            path = self.write_batch([{'path': 'abc'}, {'path': 'bad'}])
+            self.assertEqual(batch_command(path, log_dir='logs'), 1)
+            self.assertTrue(os.path.exists(os.path.join('logs', 'bad.log')))
+            self.assertEqual(batch_command('missing.json'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""test_virtualenv_helpers/clone.py
+***********************************
+Provides unit tests for virtualenv_helpers/clone.py
+"""
+
+import unittest
+import os
+import sys
+import errno
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+import virtualenv_helpers.clone as clone
+from virtualenv_helpers.clone import available_methods
+from virtualenv_helpers.clone import copy_file
+from virtualenv_helpers.clone import copy_tree
+from virtualenv_helpers.clone import clone_environment
+
+
+def unsupported(source, target, mode):
+    open(target, 'w').close()
+    raise OSError(errno.EOPNOTSUPP, 'Not supported')
+
+
+class CloneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._copy_functions = dict(clone._copy_functions)
+        clone._methods.clear()
+
+    def tearDown(self):
+        clone._copy_functions.update(self._copy_functions)
+        clone._methods.clear()
+
+    def test_available_methods(self):
+        methods = available_methods(1, 2)
+        self.assertNotIn('reflink', methods)
+        self.assertNotIn('hardlink', methods)
+        self.assertEqual(methods[-1], 'copy')
+        self.assertIn('hardlink' if hasattr(os, 'link') else 'copy', available_methods(1, 1))
+
+    def test_copy_file_detected_once(self):
+        calls = []
+
+        def reflink(source, target, mode):
+            calls.append(source)
+            unsupported(source, target, mode)
+        clone._copy_functions['reflink'] = reflink
+        clone._copy_functions['copy_file_range'] = unsupported
+        with TemporaryDirectory():
+            for name in ('a', 'b'):
+                with open(name, 'w') as f:
+                    f.write(name)
+            self.assertEqual(copy_file('a', 'a2', 1, 1, 0o644), 'copy')
+            self.assertEqual(copy_file('b', 'b2', 1, 1, 0o644), 'copy')
+            with open('b2') as f:
+                self.assertEqual(f.read(), 'b')
+            self.assertEqual(calls, ['a'] if 'reflink' in available_methods(1, 1) else [])
+
+    def test_copy_file_hardlink_read_only(self):
+        if not hasattr(os, 'link'):
+            raise unittest.SkipTest('Hardlinks not supported')
+        clone._copy_functions['reflink'] = unsupported
+        clone._copy_functions['copy_file_range'] = unsupported
+        with TemporaryDirectory():
+            for name in ('a', 'b'):
+                with open(name, 'w') as f:
+                    f.write(name)
+            dev = os.stat('a').st_dev
+            self.assertEqual(copy_file('a', 'a2', dev, dev, 0o444), 'hardlink')
+            self.assertEqual(os.stat('a').st_ino, os.stat('a2').st_ino)
+            self.assertEqual(copy_file('b', 'b2', dev, dev, 0o644), 'copy')
+            self.assertNotEqual(os.stat('b').st_ino, os.stat('b2').st_ino)
+
+    def test_copy_file_error(self):
+        def failed(source, target, mode):
+            raise OSError(errno.ENOSPC, 'No space left')
+        clone._copy_functions['reflink'] = failed
+        clone._copy_functions['copy_file_range'] = failed
+        clone._copy_functions['copy'] = failed
+        with TemporaryDirectory():
+            open('a', 'w').close()
+            self.assertRaises(OSError, copy_file, 'a', 'a2', 1, 2, 0o644)
+
+    def test_copy_tree(self):
+        with TemporaryDirectory():
+            os.makedirs(os.path.join('source', 'a', 'b'))
+            with open(os.path.join('source', 'a', 'b', 'c.py'), 'w') as f:
+                f.write('abc')
+            with open(os.path.join('source', 'run'), 'w') as f:
+                f.write('#!/bin/sh')
+            os.chmod(os.path.join('source', 'run'), 0o755)
+            if hasattr(os, 'symlink') and not sys.platform.startswith('win'):
+                os.symlink('run', os.path.join('source', 'link'))
+                os.symlink('a', os.path.join('source', 'dir_link'))
+            counts = copy_tree('source', 'target', workers=2)
+            self.assertEqual(sum(counts.values()), 2)
+            with open(os.path.join('target', 'a', 'b', 'c.py')) as f:
+                self.assertEqual(f.read(), 'abc')
+            if not sys.platform.startswith('win'):
+                self.assertTrue(os.stat(os.path.join('target', 'run')).st_mode & 0o100)
+                self.assertEqual(os.readlink(os.path.join('target', 'link')), 'run')
+                self.assertEqual(os.readlink(os.path.join('target', 'dir_link')), 'a')
+
+    def test_clone_environment(self):
+        with TemporaryDirectory() as t:
+            make_virtualenv('source', '3.6')
+            script_dir = 'Scripts' if sys.platform.startswith('win') else 'bin'
+            with open(os.path.join('source', script_dir, 'activate'), 'w') as f:
+                f.write('VIRTUAL_ENV="{}"\n'.format(os.path.join(t.path, 'source')))
+            with open(os.path.join('source', 'pyvenv.cfg'), 'w') as f:
+                f.write('home = /usr/bin\n')
+            clone_environment('source', 'target')
+            with open(os.path.join('target', script_dir, 'activate')) as f:
+                self.assertEqual(f.read(), 'VIRTUAL_ENV="{}"\n'.format(os.path.join(t.path, 'target')))
+            with open(os.path.join('source', script_dir, 'activate')) as f:
+                self.assertEqual(f.read(), 'VIRTUAL_ENV="{}"\n'.format(os.path.join(t.path, 'source')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""test_virtualenv_helpers/completion.py
+****************************************
+Provides unit tests for virtualenv_helpers/completion.py
+"""
+
+import unittest
+import os
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+
+from virtualenv_helpers.completion import SHELLS
+from virtualenv_helpers.completion import get_completion_script
+from virtualenv_helpers.completion import create_parser
+
+
+class CompletionTestCase(unittest.TestCase):
+
+    def test_get_completion_script(self):
+        for shell in SHELLS:
+            script = get_completion_script(shell)
+            self.assertTrue(os.path.exists(script))
+            with open(script) as f:
+                self.assertIn('.venv_names', f.read())
+
+    def test_create_parser(self):
+        options = create_parser().parse_args(['--script', 'zsh'])
+        self.assertEqual(options.script, 'zsh')
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            options = create_parser().parse_args(['-d', virtualenv_dir.path, '--update'])
+            self.assertEqual(options.virtualenv_dir, virtualenv_dir.path)
+            self.assertTrue(options.update)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,26 +4,49 @@ Provides unit tests for virtualenv_helpers/create.py
 """
 
 import unittest
+import os
 import sys
+import time
 import argparse
+import threading
 
 from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
 
 
 import virtualenv_helpers.create as create
+from virtualenv_helpers import locking
+from virtualenv_helpers.find import POINTER_FILE
+from virtualenv_helpers.registry import read_environments
 from virtualenv_helpers.create import parse_options
 from virtualenv_helpers.create import create_parser
 from virtualenv_helpers.create import get_python_versions
 from virtualenv_helpers.create import get_python_executable
+from virtualenv_helpers.create import install_default_wheels
+from virtualenv_helpers.create import install_module_as_develop
+from virtualenv_helpers.wheels import installed_distributions
 
 
 class CreateTestCase(unittest.TestCase):
 
     def setUp(self):
         create.is_windows = sys.platform.startswith('win')
+        self.calls = []
+        self._call = create.subprocess.call
+        create.subprocess.call = lambda argv, *args, **kwargs: self.calls.append(argv)
+        # The registry is kept in the cache directory
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
 
     def tearDown(self):
         create.is_windows = sys.platform.startswith('win')
+        create.subprocess.call = self._call
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
 
     def test_parse_options_version(self):
         options, unknown = parse_options(['-p', 'Python2.1'])
@@ -183,6 +206,241 @@ class CreateTestCase(unittest.TestCase):
         create.is_windows = False
         self.assertEqual(get_python_executable('2.7'), 'python2.7')
 
+    def test_install_default_wheels(self):
+        current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+        other_version = '2.7' if current_version != '2.7' else '3.6'
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(t.path, 'wheels'),
+                                                             VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            os.mkdir('wheels')
+            make_wheel('wheels', 'abc', '1.0', 'py{}-none-any'.format(current_version[0]))
+            make_wheel('wheels', 'other', '1.0', 'cp{0}-cp{0}m-linux_x86_64'.format(other_version.replace('.', '')))
+            unsupported = make_wheel('wheels', 'unsafe', '1.0', 'py{}-none-any'.format(current_version[0]), files={'../unsafe.py': ''})
+            site_packages = make_virtualenv('env')
+            install_default_wheels(current_version, 'env')
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc.py')))
+            self.assertFalse(os.path.exists(os.path.join(site_packages, 'other.py')))
+            # Only the wheel that could not be unpacked is installed using pip
+            self.assertEqual(len(self.calls), 1)
+            self.assertEqual(self.calls[0][1:5], ['install', os.path.join(t.path, unsupported), '--no-deps', '--no-index'])
+
+    def test_install_default_wheels_dependency_order(self):
+        current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+        tag = 'py{}-none-any'.format(current_version[0])
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(t.path, 'wheels'),
+                                                             VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            os.mkdir('wheels')
+            # Neither can be unpacked, so they are installed with pip in dependency order
+            make_wheel('wheels', 'abc', '1.0', tag, files={'../abc.py': ''}, requires=['xyz>=1.0'])
+            make_wheel('wheels', 'xyz', '1.0', tag, files={'../xyz.py': ''})
+            make_wheel('wheels', 'xyz', '1.1', tag, files={'../xyz.py': ''})
+            make_virtualenv('env')
+            install_default_wheels(current_version, 'env')
+            self.assertEqual([os.path.split(call[2])[-1] for call in self.calls],
+                             ['xyz-1.1-{}.whl'.format(tag), 'abc-1.0-{}.whl'.format(tag)])
+
+    def test_install_default_wheels_up_to_date(self):
+        current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(t.path, 'wheels'),
+                                                             VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            os.mkdir('wheels')
+            make_wheel('wheels', 'abc', '1.0', 'py{}-none-any'.format(current_version[0]))
+            site_packages = make_virtualenv('env')
+            install_default_wheels(current_version, 'env')
+            os.remove(os.path.join(site_packages, 'abc.py'))
+            install_default_wheels(current_version, 'env')
+            self.assertFalse(os.path.exists(os.path.join(site_packages, 'abc.py')))
+            make_wheel('wheels', 'abc', '1.1', 'py{}-none-any'.format(current_version[0]))
+            os.remove(os.path.join('wheels', 'abc-1.0-py{}-none-any.whl'.format(current_version[0])))
+            install_default_wheels(current_version, 'env')
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc.py')))
+
+    def test_install_default_wheels_upgrade(self):
+        current_version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+        tag = 'py{}-none-any'.format(current_version[0])
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(t.path, 'wheels'),
+                                                             VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            os.mkdir('wheels')
+            make_wheel('wheels', 'pkga', '1.0', tag, files={'pkga/__init__.py': '', 'pkga/old.py': ''})
+            site_packages = make_virtualenv('env')
+            install_default_wheels(current_version, 'env')
+            make_wheel('wheels', 'pkga', '1.1', tag, files={'pkga/__init__.py': '', 'pkga/new.py': ''})
+            install_default_wheels(current_version, 'env')
+            # The old version is removed before the new one is unpacked
+            self.assertEqual(sorted(os.listdir(site_packages)), ['pkga', 'pkga-1.1.dist-info'])
+            self.assertEqual(sorted(os.listdir(os.path.join(site_packages, 'pkga'))), ['__init__.py', 'new.py'])
+            self.assertEqual(installed_distributions(site_packages), {'pkga': '1.1'})
+            self.assertEqual(self.calls, [])
+
+    def test_create_incremental(self):
+        created = []
+
+        def create_environment(backend, version, version_virtualenv_dir, executable, args):
+            created.append(version_virtualenv_dir)
+            if not os.path.exists(version_virtualenv_dir):
+                make_virtualenv(version_virtualenv_dir, version)
+            open(os.path.join(version_virtualenv_dir, create.SCRIPT_DIR, create.PYTHON), 'w').close()
+            return 0
+        _create_environment = create.create_environment
+        create.create_environment = create_environment
+        try:
+            with TemporaryDirectory() as t, Quiet():
+                os.mkdir('project')
+                os.chdir('project')
+                # C extensions need setup.py develop
+                with open('setup.py', 'w') as f:
+                    f.write('ext_modules = []')
+                args = ['-d', os.path.join(t.path, 'venvs'), '--backend', 'venv', '--ignore-current-version', '-p', '3.6', '--no-precompile']
+                create.create(args)
+                self.assertEqual(len(created), 1)
+                self.assertEqual(len(self.calls), 1)
+                # Nothing has changed
+                create.create(args)
+                self.assertEqual(len(created), 1)
+                self.assertEqual(len(self.calls), 1)
+                # The project has changed
+                with open('setup.py', 'w') as f:
+                    f.write('ext_modules = [] ')
+                create.create(args)
+                self.assertEqual(len(created), 1)
+                self.assertEqual(len(self.calls), 2)
+                # The arguments have changed
+                create.create(args + ['--clear'])
+                self.assertEqual(len(created), 2)
+                self.assertEqual(len(self.calls), 3)
+                # Forced
+                create.create(args + ['--clear', '--force'])
+                self.assertEqual(len(created), 3)
+                self.assertEqual(len(self.calls), 4)
+        finally:
+            create.create_environment = _create_environment
+
+    def test_create_staged(self):
+        created = []
+
+        def create_environment(backend, version, version_virtualenv_dir, executable, args):
+            created.append(version_virtualenv_dir)
+            make_virtualenv(version_virtualenv_dir, version)
+            with open(os.path.join(version_virtualenv_dir, create.SCRIPT_DIR, create.PYTHON), 'w') as f:
+                f.write('#!{}\n'.format(version_virtualenv_dir))
+            return 0
+        _create_environment = create.create_environment
+        create.create_environment = create_environment
+        try:
+            with TemporaryDirectory() as t, Quiet():
+                os.mkdir('project')
+                os.chdir('project')
+                args = ['-d', os.path.join(t.path, 'venvs'), '--backend', 'venv', '--ignore-current-version', '-p', '3.6', '--no-precompile']
+                self.assertEqual(create.create(args), 0)
+                # Built in a hidden sibling directory and renamed into place
+                path = os.path.join(t.path, 'venvs', 'project-3.6')
+                self.assertEqual(os.path.dirname(os.path.dirname(created[0])), os.path.join(t.path, 'venvs'))
+                self.assertNotEqual(created[0], path)
+                with open(os.path.join(path, create.SCRIPT_DIR, create.PYTHON)) as f:
+                    self.assertEqual(f.read(), '#!{}\n'.format(path))
+                # The staging directory is removed
+                self.assertEqual([u for u in os.listdir(os.path.join(t.path, 'venvs')) if u.endswith('.tmp')], [])
+        finally:
+            create.create_environment = _create_environment
+
+    def test_create_failed(self):
+        _create_environment = create.create_environment
+        create.create_environment = lambda backend, version, version_virtualenv_dir, executable, args: 1
+        try:
+            with TemporaryDirectory() as t, Quiet():
+                os.mkdir('project')
+                os.chdir('project')
+                with open('setup.py', 'w') as f:
+                    f.write('ext_modules = []')
+                args = ['-d', os.path.join(t.path, 'venvs'), '--backend', 'venv', '--ignore-current-version', '-p', '3.6', '-w']
+                self.assertEqual(create.create(args), 1)
+                # The later phases are not run
+                self.assertEqual(self.calls, [])
+                self.assertEqual([u for u in os.listdir(os.path.join(t.path, 'venvs')) if not u.startswith('.')], [])
+                # The project does not point at the environment that was not created
+                self.assertFalse(os.path.exists(os.path.join(t.path, 'project', POINTER_FILE)))
+        finally:
+            create.create_environment = _create_environment
+
+    @unittest.skipIf(locking.fcntl is None, 'fcntl is not available')
+    def test_create_concurrent(self):
+        created = []
+        building = threading.Event()
+
+        def create_environment(backend, version, version_virtualenv_dir, executable, args):
+            created.append(version_virtualenv_dir)
+            building.set()
+            time.sleep(0.3)
+            make_virtualenv(version_virtualenv_dir, version)
+            open(os.path.join(version_virtualenv_dir, create.SCRIPT_DIR, create.PYTHON), 'w').close()
+            return 0
+        _create_environment = create.create_environment
+        create.create_environment = create_environment
+        try:
+            with TemporaryDirectory() as t, Quiet():
+                os.mkdir('project')
+                os.chdir('project')
+                args = ['-d', os.path.join(t.path, 'venvs'), '--backend', 'venv', '--ignore-current-version', '-p', '3.6', '--no-precompile']
+                codes = []
+                first = threading.Thread(target=lambda: codes.append(create.create(args)))
+                first.start()
+                building.wait(5)
+                # Waits for the first create and reuses its environment, even when forced
+                second = threading.Thread(target=lambda: codes.append(create.create(args + ['--force'])))
+                second.start()
+                first.join()
+                second.join()
+                self.assertEqual(codes, [0, 0])
+                self.assertEqual(len(created), 1)
+                self.assertTrue(os.path.exists(os.path.join(t.path, 'venvs', 'project-3.6', create.SCRIPT_DIR, create.PYTHON)))
+        finally:
+            create.create_environment = _create_environment
+
+    def test_install_module_as_develop_editable(self):
+        with TemporaryDirectory() as t, Quiet():
+            site_packages = make_virtualenv('env', '3.6')
+            with open('setup.py', 'w') as f:
+                f.write('from setuptools import setup\nsetup()\n')
+            with open('setup.cfg', 'w') as f:
+                f.write('[metadata]\nname = abc\nversion = 1.0\n')
+            self.assertEqual(install_module_as_develop(os.path.join(t.path, 'env'), '3.6'), 0)
+            self.assertEqual(self.calls, [])
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc-1.0.dist-info', 'METADATA')))
+
+    def test_install_module_as_develop_fallback(self):
+        envs = []
+        create.subprocess.call = lambda argv, *args, **kwargs: (self.calls.append(argv), envs.append(kwargs['env']))
+        with TemporaryDirectory() as t, Quiet():
+            with open('setup.py', 'w') as f:
+                f.write('from setuptools import setup\nsetup(ext_modules=[])\n')
+            install_module_as_develop(os.path.join(t.path, 'env'), '3.6')
+            self.assertEqual(self.calls[0][1:3], ['setup.py', 'develop'])
+            if create.is_windows:
+                self.assertEqual(envs[0]['PYTHONPATH'], os.path.join(t.path, 'env', 'Lib', 'site-packages'))
+            else:
+                self.assertEqual(envs[0]['PYTHONPATH'], os.path.join(t.path, 'env', 'lib', 'python3.6', 'site-packages'))
+
+    def test_create_clone(self):
+        with TemporaryDirectory() as t, Quiet():
+            make_virtualenv(os.path.join('venvs', 'template-3.6'), '3.6')
+            open(os.path.join('venvs', 'template-3.6', create.SCRIPT_DIR, create.PYTHON), 'w').close()
+            os.mkdir('project')
+            os.chdir('project')
+            args = ['-d', os.path.join(t.path, 'venvs'), '--ignore-current-version', '-p', '3.6', '--no-precompile', '--clone', 'template']
+            create.create(args)
+            self.assertTrue(os.path.exists(os.path.join(t.path, 'venvs', 'project-3.6', create.SCRIPT_DIR, create.PYTHON)))
+            self.assertEqual(self.calls, [])
+            manifest = create.read_manifest(os.path.join(t.path, 'venvs', 'project-3.6'))
+            self.assertEqual(manifest['environment']['clone'], os.path.join(t.path, 'venvs', 'template-3.6'))
+            registered = read_environments()
+            self.assertEqual([(u['name'], u['version'], u['project_dir']) for u in registered], [('project', '3.6', os.path.join(t.path, 'project'))])
+            # Up to date
+            create.create(args)
+
+    def test_install_default_wheels_no_directory(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(t.path, 'wheels')):
+            install_default_wheels('3.6', 'env')
+            self.assertEqual(self.calls, [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,194 @@
+"""test_virtualenv_helpers/editable.py
+**************************************
+Provides unit tests for virtualenv_helpers/editable.py
+"""
+
+import unittest
+import os
+import sys
+import json
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+import virtualenv_helpers.editable as editable
+from virtualenv_helpers.editable import UnsupportedProject
+from virtualenv_helpers.editable import read_setup_cfg
+from virtualenv_helpers.editable import read_egg_info
+from virtualenv_helpers.editable import run_egg_info
+from virtualenv_helpers.editable import missing_requirements
+from virtualenv_helpers.editable import remove_editable
+from virtualenv_helpers.editable import install_editable
+from virtualenv_helpers.wheels import install_wheel
+
+
+SETUP_CFG = """[metadata]
+name = my_project
+version = 1.0
+
+[options]
+package_dir =
+    =src
+install_requires =
+    six
+    enum34; python_version < "3.4"
+"""
+
+
+class EditableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self._call = editable.subprocess.call
+        editable.subprocess.call = lambda argv, *args, **kwargs: self.calls.append(argv)
+
+    def tearDown(self):
+        editable.subprocess.call = self._call
+
+    def test_read_setup_cfg(self):
+        with TemporaryDirectory() as t:
+            self.assertIsNone(read_setup_cfg(t.path))
+            with open('setup.cfg', 'w') as f:
+                f.write(SETUP_CFG)
+            metadata = read_setup_cfg(t.path)
+            self.assertEqual(metadata['name'], 'my_project')
+            self.assertEqual(metadata['version'], '1.0')
+            self.assertEqual(metadata['requires'], ['six', 'enum34; python_version < "3.4"'])
+            self.assertEqual(metadata['source_root'], os.path.join(t.path, 'src'))
+
+    def test_read_setup_cfg_version(self):
+        with TemporaryDirectory() as t:
+            with open('setup.cfg', 'w') as f:
+                f.write('[metadata]\nname = abc\nversion = attr: abc.__version__\n')
+            self.assertIsNone(read_setup_cfg(t.path))
+            with open('setup.cfg', 'w') as f:
+                f.write('[metadata]\nname = abc\nversion = file: VERSION\n')
+            with open('VERSION', 'w') as f:
+                f.write('2.0\n')
+            self.assertEqual(read_setup_cfg(t.path)['version'], '2.0')
+
+    def test_read_setup_cfg_scripts(self):
+        with TemporaryDirectory() as t:
+            with open('setup.cfg', 'w') as f:
+                f.write('[metadata]\nname = abc\nversion = 1.0\n\n[options.entry_points]\nconsole_scripts =\n    abc = abc:main\n')
+            self.assertRaises(UnsupportedProject, read_setup_cfg, t.path)
+
+    def test_read_egg_info(self):
+        with TemporaryDirectory() as t:
+            os.makedirs(os.path.join('src', 'abc'))
+            os.mkdir('abc.egg-info')
+            with open(os.path.join('abc.egg-info', 'PKG-INFO'), 'w') as f:
+                f.write('Metadata-Version: 2.1\nName: abc\nVersion: 1.0\nRequires-Python: >=3.6\n\nName: description\n')
+            with open(os.path.join('abc.egg-info', 'requires.txt'), 'w') as f:
+                f.write('six\n\n[:python_version < "3.4"]\nenum34\n\n[test]\npytest\n')
+            with open(os.path.join('abc.egg-info', 'top_level.txt'), 'w') as f:
+                f.write('abc\n')
+            metadata = read_egg_info('abc.egg-info', t.path)
+            self.assertEqual(metadata['name'], 'abc')
+            self.assertEqual(metadata['version'], '1.0')
+            self.assertEqual(metadata['requires_python'], '>=3.6')
+            self.assertEqual(metadata['requires'], ['six', 'enum34; python_version < "3.4"'])
+            self.assertEqual(metadata['source_root'], os.path.join(t.path, 'src'))
+            with open(os.path.join('abc.egg-info', 'entry_points.txt'), 'w') as f:
+                f.write('[console_scripts]\nabc = abc:main\n')
+            self.assertRaises(UnsupportedProject, read_egg_info, 'abc.egg-info', t.path)
+
+    def test_run_egg_info_cached(self):
+        def call(argv, *args, **kwargs):
+            self.calls.append(argv)
+            os.mkdir(os.path.join(argv[-1], 'abc.egg-info'))
+            return 0
+        editable.subprocess.call = call
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            with open('setup.py', 'w') as f:
+                f.write('setup()')
+            egg_info = run_egg_info(t.path, sys.executable)
+            self.assertEqual(os.path.split(egg_info)[-1], 'abc.egg-info')
+            self.assertEqual(run_egg_info(t.path, sys.executable), egg_info)
+            self.assertEqual(len(self.calls), 1)
+            with open('setup.py', 'w') as f:
+                f.write('setup(name="abc")')
+            self.assertNotEqual(run_egg_info(t.path, sys.executable), egg_info)
+            self.assertEqual(len(self.calls), 2)
+
+    def test_run_egg_info_dynamic_version(self):
+        def call(argv, *args, **kwargs):
+            self.calls.append(argv)
+            os.mkdir(os.path.join(argv[-1], 'abc.egg-info'))
+            return 0
+        editable.subprocess.call = call
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            with open('setup.py', 'w') as f:
+                f.write('import versioneer\nsetup(version=versioneer.get_version())')
+            egg_info = run_egg_info(t.path, sys.executable)
+            # The version can change with the setup files unchanged
+            self.assertEqual(run_egg_info(t.path, sys.executable), egg_info)
+            self.assertEqual(len(self.calls), 2)
+            self.assertEqual(len(os.listdir(os.path.join(t.path, 'cache', 'egg_info'))), 1)
+
+    def test_run_egg_info_failed(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            self.assertIsNone(run_egg_info(t.path, sys.executable))
+            self.assertEqual(os.listdir(os.path.join(t.path, 'cache', 'egg_info')), [])
+
+    def test_missing_requirements(self):
+        with TemporaryDirectory() as t:
+            os.mkdir('six-1.0.dist-info')
+            self.assertEqual(missing_requirements(['six>=1.0', 'enum34; python_version < "3.4"', 'abc'], t.path, '3.6'),
+                             ['abc'])
+
+    def test_install_editable(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_virtualenv('env', '3.6')
+            os.mkdir('six-1.0.dist-info')
+            os.mkdir(os.path.join(site_packages, 'six-1.0.dist-info'))
+            with open('setup.py', 'w') as f:
+                f.write('from setuptools import setup\nsetup()\n')
+            with open('setup.cfg', 'w') as f:
+                f.write(SETUP_CFG)
+            dist_info = install_editable(t.path, 'env', '3.6')
+            self.assertEqual(dist_info, os.path.join(site_packages, 'my_project-1.0.dist-info'))
+            self.assertEqual(self.calls, [])
+            with open(os.path.join(site_packages, '__editable__.my_project-1.0.pth')) as f:
+                self.assertEqual(f.read(), os.path.join(t.path, 'src') + '\n')
+            with open(os.path.join(dist_info, 'METADATA')) as f:
+                self.assertIn('Requires-Dist: six\n', f.read())
+            with open(os.path.join(dist_info, 'direct_url.json')) as f:
+                self.assertTrue(json.load(f)['dir_info']['editable'])
+            with open(os.path.join(dist_info, 'RECORD')) as f:
+                self.assertEqual(len(f.readlines()), 5)
+            # Reinstalling a new version replaces the old one
+            with open('setup.cfg', 'w') as f:
+                f.write(SETUP_CFG.replace('1.0', '1.1'))
+            install_editable(t.path, 'env', '3.6')
+            self.assertFalse(os.path.exists(dist_info))
+            self.assertFalse(os.path.exists(os.path.join(site_packages, '__editable__.my_project-1.0.pth')))
+            self.assertTrue(os.path.exists(os.path.join(site_packages, '__editable__.my_project-1.1.pth')))
+            # Another installer's install is uninstalled using its RECORD
+            remove_editable(site_packages, 'my_project')
+            install_wheel(make_wheel('.', 'my_project', '0.9', files={'my_project.py': ''}), 'env', '3.6')
+            install_editable(t.path, 'env', '3.6')
+            self.assertFalse(os.path.exists(os.path.join(site_packages, 'my_project.py')))
+            self.assertEqual(sorted(u for u in os.listdir(site_packages) if u.startswith('my_project')), ['my_project-1.1.dist-info'])
+            # Or needs setup.py develop without one
+            remove_editable(site_packages, 'my_project')
+            os.mkdir(os.path.join(site_packages, 'my_project-0.9-py3.6.egg-info'))
+            self.assertRaises(UnsupportedProject, install_editable, t.path, 'env', '3.6')
+
+    def test_install_editable_unsupported(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_virtualenv('env', '3.6')
+            with open('setup.cfg', 'w') as f:
+                f.write(SETUP_CFG)
+            # six is not installed
+            self.assertRaises(UnsupportedProject, install_editable, t.path, 'env', '3.6')
+            os.mkdir(os.path.join(site_packages, 'six-1.0.dist-info'))
+            with open('setup.py', 'w') as f:
+                f.write('from setuptools import setup, Extension\nsetup(ext_modules=[Extension("a", ["a.c"])])\n')
+            self.assertRaises(UnsupportedProject, install_editable, t.path, 'env', '3.6')
+
+
+if __name__ == "__main__":
+    unittest.main()
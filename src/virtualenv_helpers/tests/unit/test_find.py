@@ -18,10 +18,36 @@ from virtualenv_helpers.find import find_recursive_path_local_env
 from virtualenv_helpers.find import find_virtualenv
 from virtualenv_helpers.find import check_input_path
 from virtualenv_helpers.find import get_virtualenv_path
+from virtualenv_helpers.find import split_virtualenv_name
+from virtualenv_helpers.find import scan_virtualenv_names
+from virtualenv_helpers.find import get_names_index_path
+from virtualenv_helpers.find import names_index_is_stale
+from virtualenv_helpers.find import update_names_index
+from virtualenv_helpers.find import get_virtualenv_names
+from virtualenv_helpers.find import read_virtualenv_pointer
+from virtualenv_helpers.find import update_virtualenv_pointer
+from virtualenv_helpers.find import find_virtualenv_pointer
+from virtualenv_helpers.find import get_virtualenv_paths
+from virtualenv_helpers.find import find_virtualenvs
+from virtualenv_helpers.find import find_registered_virtualenv
+from virtualenv_helpers.mru import record_use
+from virtualenv_helpers.registry import connect
+from virtualenv_helpers.registry import register
+from virtualenv_helpers.find import find_site_packages
 
 
 class FindTestCase(unittest.TestCase):
 
+    def setUp(self):
+        # The registry is kept in the cache directory
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
+
+    def tearDown(self):
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
+
     def test_recursive_check(self):
 
         with TemporaryDirectory() as t:
@@ -252,6 +278,201 @@ class FindTestCase(unittest.TestCase):
             self.assertEqual(get_virtualenv_dir(),
                              os.path.join(os.path.expanduser('~'), 'virtualenvs'))
 
+    def test_split_virtualenv_name(self):
+        self.assertEqual(split_virtualenv_name('abc-3.6'), ('abc', '3.6'))
+        self.assertEqual(split_virtualenv_name('abc-def-2.7'), ('abc-def', '2.7'))
+        self.assertEqual(split_virtualenv_name('abc-def'), ('abc-def', None))
+        self.assertEqual(split_virtualenv_name('abc'), ('abc', None))
+
+    def test_scan_virtualenv_names(self):
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+            os.mkdir(os.path.join(virtualenv_dir.path, 'abc-3.6'))
+            os.mkdir(os.path.join(virtualenv_dir.path, 'def'))
+            os.mkdir(os.path.join(virtualenv_dir.path, '.hidden'))
+            open(os.path.join(virtualenv_dir.path, 'ghi-3.6'), 'w').close()
+            self.assertEqual(scan_virtualenv_names(virtualenv_dir.path), ['abc', 'abc-2.7', 'abc-3.6', 'def'])
+
+    def test_scan_virtualenv_names_missing(self):
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            self.assertEqual(scan_virtualenv_names(os.path.join(virtualenv_dir.path, 'missing')), [])
+
+    def test_update_names_index(self):
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+            self.assertTrue(names_index_is_stale(virtualenv_dir.path))
+            self.assertEqual(update_names_index(virtualenv_dir.path), ['abc', 'abc-2.7'])
+            self.assertFalse(names_index_is_stale(virtualenv_dir.path))
+            with open(get_names_index_path(virtualenv_dir.path)) as f:
+                self.assertEqual(f.read(), 'abc\nabc-2.7\n')
+
+    def test_get_virtualenv_names_stale(self):
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+            update_names_index(virtualenv_dir.path)
+            os.mkdir(os.path.join(virtualenv_dir.path, 'def-3.6'))
+            index_mtime = os.stat(get_names_index_path(virtualenv_dir.path)).st_mtime
+            os.utime(virtualenv_dir.path, (index_mtime+10, index_mtime+10))
+            self.assertTrue(names_index_is_stale(virtualenv_dir.path))
+            self.assertEqual(get_virtualenv_names(virtualenv_dir.path), ['abc', 'abc-2.7', 'def', 'def-3.6'])
+            self.assertFalse(names_index_is_stale(virtualenv_dir.path))
+
+    def test_get_virtualenv_names_from_index(self):
+        with TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            update_names_index(virtualenv_dir.path)
+            with open(get_names_index_path(virtualenv_dir.path), 'w') as f:
+                f.write('cached\n')
+            index_mtime = os.stat(get_names_index_path(virtualenv_dir.path)).st_mtime
+            os.utime(virtualenv_dir.path, (index_mtime-10, index_mtime-10))
+            self.assertEqual(get_virtualenv_names(virtualenv_dir.path), ['cached'])
+
+    def test_read_virtualenv_pointer_missing(self):
+        with TemporaryDirectory() as t:
+            self.assertEqual(read_virtualenv_pointer(t.path), {})
+
+    def test_update_virtualenv_pointer(self):
+        with TemporaryDirectory() as t:
+            update_virtualenv_pointer(t.path, {'2.7': '/abc-2.7', '3.6': '/abc-3.6'})
+            self.assertEqual(read_virtualenv_pointer(t.path), {'2.7': '/abc-2.7', '3.6': '/abc-3.6'})
+            update_virtualenv_pointer(t.path, {'2.7': None})
+            self.assertEqual(read_virtualenv_pointer(t.path), {'3.6': '/abc-3.6'})
+            update_virtualenv_pointer(t.path, {'3.6': None})
+            self.assertFalse(os.path.exists(os.path.join(t.path, '.venv-path')))
+
+    def test_find_virtualenv_pointer(self):
+        with TemporaryDirectory() as t:
+            os.makedirs(os.path.join('abc', 'def'))
+            update_virtualenv_pointer(os.path.join(t.path, 'abc'), {'2.7': '/abc-2.7'})
+            os.chdir(os.path.join('abc', 'def'))
+            self.assertEqual(find_virtualenv_pointer('2.7'), (os.path.join(t.path, 'abc'), '/abc-2.7'))
+            self.assertEqual(find_virtualenv_pointer('3.6'), (None, None))
+            self.assertEqual(find_virtualenv_pointer('2.7', max_levels=1), (None, None))
+
+    def test_find_virtualenv_pointer_preferred(self):
+        with TemporaryDirectory() as t, TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+                os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+                os.makedirs(os.path.join('abc', '.venv'))
+                update_virtualenv_pointer(os.path.join(t.path, 'abc'), {'2.7': os.path.join(virtualenv_dir.path, 'abc-2.7')})
+                os.chdir('abc')
+                path, matching = find_virtualenv('2.7')
+                self.assertEqual(path, os.path.join(virtualenv_dir.path, 'abc-2.7'))
+                self.assertEqual(matching, os.path.join(t.path, 'abc'))
+
+    def test_find_virtualenv_pointer_repaired(self):
+        with TemporaryDirectory() as t, TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+                os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+                os.mkdir('abc')
+                update_virtualenv_pointer(os.path.join(t.path, 'abc'), {'2.7': os.path.join(t.path, 'removed')})
+                os.chdir('abc')
+                path, matching = find_virtualenv('2.7')
+                self.assertEqual(path, os.path.join(virtualenv_dir.path, 'abc-2.7'))
+                self.assertEqual(read_virtualenv_pointer(os.path.join(t.path, 'abc')),
+                                 {'2.7': os.path.join(virtualenv_dir.path, 'abc-2.7')})
+
+    def test_find_virtualenv_pointer_dropped(self):
+        with TemporaryDirectory() as t, TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+                os.mkdir(os.path.join(virtualenv_dir.path, 'src'))
+                os.mkdir(os.path.join(virtualenv_dir.path, 'abc-2.7'))
+                os.makedirs(os.path.join('abc', 'src'))
+                update_virtualenv_pointer(os.path.join(t.path, 'abc', 'src'), {'2.7': os.path.join(t.path, 'removed'),
+                                                                               '3.6': os.path.join(t.path, 'removed')})
+                os.chdir(os.path.join('abc', 'src'))
+                # The parent project's environment is found, but not pointed to from this directory
+                path, matching = find_virtualenv('2.7')
+                self.assertEqual((path, matching), (os.path.join(virtualenv_dir.path, 'abc-2.7'), os.path.join(t.path, 'abc')))
+                self.assertEqual(read_virtualenv_pointer(os.path.join(t.path, 'abc', 'src')), {'3.6': os.path.join(t.path, 'removed')})
+                # As is an environment without a version
+                path, matching = find_virtualenv('3.6')
+                self.assertEqual(path, os.path.join(virtualenv_dir.path, 'src'))
+                self.assertEqual(read_virtualenv_pointer(os.path.join(t.path, 'abc', 'src')), {})
+
+    def test_find_virtualenvs(self):
+        with TemporaryDirectory() as t, TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+                for name in ('abc-2.7', 'abc-3.6', 'abc', 'abcd-3.6'):
+                    os.mkdir(os.path.join(virtualenv_dir.path, name))
+                os.makedirs(os.path.join('abc', '.venv-3.5'))
+                os.makedirs(os.path.join('other', 'abc-3.4'))
+                update_virtualenv_pointer(os.path.join(t.path, 'abc'), {'3.4': os.path.join(t.path, 'other', 'abc-3.4'),
+                                                                        '3.3': os.path.join(t.path, 'removed')})
+                os.makedirs(os.path.join('abc', 'src'))
+                os.chdir(os.path.join('abc', 'src'))
+                self.assertEqual(find_virtualenvs(), sorted([os.path.join(virtualenv_dir.path, 'abc-2.7'),
+                                                             os.path.join(virtualenv_dir.path, 'abc-3.6'),
+                                                             os.path.join(t.path, 'abc', '.venv-3.5'),
+                                                             os.path.join(t.path, 'other', 'abc-3.4')]))
+                self.assertEqual(find_virtualenvs(['3.6', '3.5']), sorted([os.path.join(virtualenv_dir.path, 'abc-3.6'),
+                                                                           os.path.join(t.path, 'abc', '.venv-3.5')]))
+                os.chdir(t.path)
+                self.assertEqual(find_virtualenvs(virtualenv_path='abcd'), [os.path.join(virtualenv_dir.path, 'abcd-3.6')])
+                self.assertEqual(find_virtualenvs(virtualenv_path=os.path.join('other', 'abc')),
+                                 sorted([os.path.join(t.path, 'other', 'abc-3.4'), os.path.join(virtualenv_dir.path, 'abc-2.7'),
+                                         os.path.join(virtualenv_dir.path, 'abc-3.6')]))
+
+    def test_find_virtualenv_last_used(self):
+        with TemporaryDirectory() as t, TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path):
+                os.mkdir(os.path.join(virtualenv_dir.path, 'abc-3.6'))
+                os.makedirs(os.path.join('abc', '.venv-3.6'))
+                os.chdir('abc')
+                self.assertEqual(find_virtualenv('3.6'), (os.path.join(t.path, 'abc', '.venv-3.6'), os.path.join(t.path, 'abc')))
+                record_use(os.path.join(virtualenv_dir.path, 'abc-3.6'), os.path.join(t.path, 'abc'), '3.6')
+                self.assertEqual(find_virtualenv('3.6'), (os.path.join(virtualenv_dir.path, 'abc-3.6'), os.path.join(t.path, 'abc')))
+
+    def test_find_virtualenv_last_used_farther(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs')):
+            os.makedirs(os.path.join('other-3.6'))
+            os.makedirs(os.path.join('proj', '.venv-3.6'))
+            os.makedirs(os.path.join('empty', 'src'))
+            # Used from the parent directory
+            record_use(os.path.join(t.path, 'other-3.6'), t.path, '3.6')
+            os.chdir('proj')
+            # A closer environment is used
+            self.assertEqual(find_virtualenv('3.6'), (os.path.join(t.path, 'proj', '.venv-3.6'), os.path.join(t.path, 'proj')))
+            os.chdir(os.path.join(t.path, 'empty', 'src'))
+            self.assertEqual(find_virtualenv('3.6'), (os.path.join(t.path, 'other-3.6'), t.path))
+
+    def test_find_registered_virtualenv(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs')):
+            os.makedirs(os.path.join('abc', 'src'))
+            os.makedirs(os.path.join('elsewhere', 'abc-env'))
+            connection = connect()
+            register(connection, {'path': os.path.join(t.path, 'elsewhere', 'abc-env'), 'name': 'abc-env', 'version': '3.6',
+                                  'project_dir': os.path.join(t.path, 'abc')})
+            connection.close()
+            os.chdir(os.path.join('abc', 'src'))
+            self.assertEqual(find_registered_virtualenv('3.6'), (os.path.join(t.path, 'elsewhere', 'abc-env'), os.path.join(t.path, 'abc')))
+            self.assertEqual(find_registered_virtualenv('2.7'), (None, None))
+            self.assertEqual(find_registered_virtualenv('3.6', max_levels=1), (None, None))
+            self.assertEqual(find_virtualenv('3.6'), (os.path.join(t.path, 'elsewhere', 'abc-env'), os.path.join(t.path, 'abc')))
+            self.assertEqual(find_virtualenvs(), [os.path.join(t.path, 'elsewhere', 'abc-env')])
+
+    def test_find_virtualenv_no_cache_dir(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs')):
+            # The cache directory cannot be created, it is only needed to write
+            with TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'file', 'cache')):
+                open('file', 'w').close()
+                self.assertEqual(find_registered_virtualenv('3.6'), (None, None))
+                self.assertEqual(find_virtualenv('3.6'), (None, None))
+                self.assertEqual(find_virtualenvs(), [])
+
+    def test_get_virtualenv_paths(self):
+        with TemporaryDirectory() as t:
+            os.mkdir('abc-2.7')
+            os.mkdir('.hidden')
+            open('.venv_names', 'w').close()
+            self.assertEqual(get_virtualenv_paths(t.path), [os.path.join(t.path, 'abc-2.7')])
+            self.assertEqual(get_virtualenv_paths(os.path.join(t.path, 'missing')), [])
+
+    def test_find_site_packages(self):
+        with TemporaryDirectory():
+            os.makedirs(os.path.join('env', 'lib', 'python3.6', 'site-packages'))
+            self.assertEqual(find_site_packages('env'), [os.path.join('env', 'lib', 'python3.6', 'site-packages')])
+            self.assertEqual(find_site_packages('missing'), [])
+
 
 if __name__ == "__main__":
     unittest.main()
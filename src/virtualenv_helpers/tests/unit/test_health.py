@@ -0,0 +1,218 @@
+"""test_virtualenv_helpers/health.py
+************************************
+Provides unit tests for virtualenv_helpers/health.py
+"""
+
+import unittest
+import os
+import sys
+import json
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.manifest import read_manifest
+from virtualenv_helpers.manifest import write_manifest
+from virtualenv_helpers.health import get_environment_version
+from virtualenv_helpers.health import check_environment
+from virtualenv_helpers.health import find_interpreter
+from virtualenv_helpers.health import update_pyvenv_cfg
+from virtualenv_helpers.health import repair_environment
+from virtualenv_helpers.health import check_environments
+from virtualenv_helpers.health import check_command
+
+VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+def make_base_python(path, version):
+    """Create the skeleton of a base python installation, returning its bin directory"""
+    home = os.path.join(os.path.abspath(path), 'bin')
+    os.makedirs(home)
+    with open(os.path.join(home, 'python{}'.format(version)), 'w') as f:
+        f.write('')
+    os.makedirs(os.path.join(path, 'lib', 'python{}'.format(version)))
+    with open(os.path.join(path, 'lib', 'python{}'.format(version), 'os.py'), 'w') as f:
+        f.write('')
+    return home
+
+
+def make_environment(path, home, version):
+    make_virtualenv(path, version)
+    os.symlink(os.path.join(home, 'python{}'.format(version)), os.path.join(path, 'bin', 'python'))
+    os.symlink('python', os.path.join(path, 'bin', 'python{}'.format(version)))
+    with open(os.path.join(path, 'pyvenv.cfg'), 'w') as f:
+        f.write('home = {}\ninclude-system-site-packages = false\nversion = {}.1\n'.format(home, version))
+    return os.path.abspath(path)
+
+
+@unittest.skipIf(sys.platform.startswith('win'), 'POSIX layout')
+class HealthTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
+
+    def tearDown(self):
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
+
+    def test_get_environment_version(self):
+        with TemporaryDirectory():
+            make_virtualenv('env', '3.6')
+            self.assertEqual(get_environment_version('env'), '3.6')
+            os.makedirs('other')
+            with open(os.path.join('other', 'pyvenv.cfg'), 'w') as f:
+                f.write('version = 3.8.2\n')
+            self.assertEqual(get_environment_version('other'), '3.8')
+
+    def test_check_ok(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            result = check_environment(make_environment('env', home, '3.6'))
+            self.assertTrue(result['ok'])
+            self.assertEqual(result['version'], '3.6')
+            self.assertEqual(sorted(result['checks']), ['home', 'interpreter', 'stdlib'])
+            self.assertTrue(all(u['ok'] for u in result['checks'].values()))
+
+    def test_check_removed_python(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            os.remove(os.path.join(home, 'python3.6'))
+            result = check_environment('env')
+            self.assertFalse(result['ok'])
+            self.assertFalse(result['checks']['interpreter']['ok'])
+            self.assertIn('broken symlink', result['checks']['interpreter']['detail'])
+            self.assertFalse(result['checks']['home']['ok'])
+            self.assertTrue(result['checks']['stdlib']['ok'])
+
+    def test_check_missing_stdlib(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            os.remove(os.path.join('base', 'lib', 'python3.6', 'os.py'))
+            result = check_environment('env')
+            self.assertFalse(result['ok'])
+            self.assertFalse(result['checks']['stdlib']['ok'])
+
+    def test_check_version_mismatch(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            with open(os.path.join('env', 'pyvenv.cfg'), 'w') as f:
+                f.write('home = {}\nversion = 3.7.0\n'.format(home))
+            result = check_environment('env')
+            self.assertFalse(result['checks']['stdlib']['ok'])
+            self.assertIn('3.7', result['checks']['stdlib']['detail'])
+
+    def test_check_no_pyvenv_cfg(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            os.remove(os.path.join('env', 'pyvenv.cfg'))
+            result = check_environment('env')
+            self.assertTrue(result['ok'])
+            self.assertIsNone(result['checks']['home']['ok'])
+
+    def test_find_interpreter(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            self.assertEqual(find_interpreter('env', '3.6'), os.path.realpath(os.path.join(home, 'python3.6')))
+            new_home = make_base_python('new', '3.6')
+            os.chmod(os.path.join(new_home, 'python3.6'), 0o755)
+            os.remove(os.path.join(home, 'python3.6'))
+            with TemporaryEnvironment(PATH=new_home):
+                self.assertEqual(find_interpreter('env', '3.6'), os.path.realpath(os.path.join(new_home, 'python3.6')))
+            with TemporaryEnvironment(PATH=''):
+                self.assertIsNone(find_interpreter('env', '3.6'))
+
+    def test_update_pyvenv_cfg(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            update_pyvenv_cfg('env', '/opt/python/bin/python3.6', '3.6.15')
+            with open(os.path.join('env', 'pyvenv.cfg')) as f:
+                self.assertEqual(f.read(), 'home = /opt/python/bin\ninclude-system-site-packages = false\nversion = 3.6.15\n')
+
+    def test_repair(self):
+        with TemporaryDirectory() as temp_dir:
+            # The environment's python was removed, the same version is on the PATH
+            home = make_base_python('old', VERSION)
+            make_environment('env', home, VERSION)
+            write_manifest('env', {'environment': {'backend': 'venv', 'args': [], 'interpreter': 'old', 'interpreter_mtime': 0}})
+            os.remove(os.path.join(home, 'python{}'.format(VERSION)))
+            os.makedirs('new')
+            os.symlink(sys.executable, os.path.join('new', 'python{}'.format(VERSION)))
+            with TemporaryEnvironment(PATH=os.path.join(temp_dir.path, 'new')):
+                result = repair_environment('env')
+            interpreter = os.path.realpath(sys.executable)
+            self.assertTrue(result['repaired'])
+            self.assertEqual(result['interpreter'], interpreter)
+            self.assertEqual(os.readlink(os.path.join('env', 'bin', 'python')), interpreter)
+            # Links within the environment are kept
+            self.assertEqual(os.readlink(os.path.join('env', 'bin', 'python{}'.format(VERSION))), 'python')
+            with open(os.path.join('env', 'pyvenv.cfg')) as f:
+                self.assertIn('home = {}\n'.format(os.path.dirname(interpreter)), f.read())
+            environment = read_manifest('env')['environment']
+            self.assertEqual(environment['interpreter'], interpreter)
+            self.assertEqual(environment['backend'], 'venv')
+            self.assertTrue(result['checks']['interpreter']['ok'])
+            self.assertTrue(result['checks']['home']['ok'])
+
+    def test_repair_not_found(self):
+        with TemporaryDirectory():
+            home = make_base_python('old', '3.6')
+            make_environment('env', home, '3.6')
+            os.remove(os.path.join(home, 'python3.6'))
+            with TemporaryEnvironment(PATH=''):
+                result = repair_environment('env')
+            self.assertFalse(result['ok'])
+            self.assertFalse(result['repaired'])
+            self.assertIn('recreated', result['error'])
+
+    def test_repair_ok_unchanged(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            make_environment('env', home, '3.6')
+            result = repair_environment('env')
+            self.assertTrue(result['ok'])
+            self.assertFalse(result['repaired'])
+
+    def test_check_environments(self):
+        with TemporaryDirectory():
+            home = make_base_python('base', '3.6')
+            paths = [make_environment('env{}'.format(i), home, '3.6') for i in range(5)]
+            os.remove(os.path.join('env3', 'bin', 'python'))
+            results = check_environments(paths, workers=2)
+            self.assertEqual([u['path'] for u in results], paths)
+            self.assertEqual([u['ok'] for u in results], [True, True, True, False, True])
+            self.assertEqual(check_environments([]), [])
+
+    def test_check_command_json(self):
+        with TemporaryDirectory() as temp_dir:
+            home = make_base_python('base', '3.6')
+            make_environment(os.path.join('venvs', 'project-3.6'), home, '3.6')
+            make_environment(os.path.join('venvs', 'other-3.6'), home, '3.6')
+            os.remove(os.path.join('venvs', 'other-3.6', 'bin', 'python'))
+            with TemporaryEnvironment(VENV_DIR=os.path.join(temp_dir.path, 'venvs')):
+                with open('out', 'w') as f:
+                    stdout, sys.stdout = sys.stdout, f
+                    try:
+                        code = check_command(['--json'])
+                    finally:
+                        sys.stdout = stdout
+            with open('out') as f:
+                report = json.load(f)
+            self.assertEqual(code, 1)
+            self.assertEqual([(os.path.basename(u['path']), u['ok']) for u in report], [('other-3.6', False), ('project-3.6', True)])
+            with Quiet():
+                self.assertEqual(check_command([os.path.join('venvs', 'project-3.6')]), 0)
+                self.assertEqual(check_command([os.path.join('venvs', 'other-3.6')]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""test_virtualenv_helpers/inventory.py
+***************************************
+Provides unit tests for virtualenv_helpers/inventory.py
+"""
+
+import unittest
+import os
+import shutil
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.inventory import connect
+from virtualenv_helpers.inventory import read_metadata
+from virtualenv_helpers.inventory import scan_site_packages
+from virtualenv_helpers.inventory import refresh
+from virtualenv_helpers.inventory import parse_requirement
+from virtualenv_helpers.inventory import query
+from virtualenv_helpers.inventory import which_command
+
+
+def add_distribution(site_packages, name, version, egg_info=False):
+    if egg_info:
+        path = os.path.join(site_packages, '{}-{}.egg-info'.format(name, version))
+        os.mkdir(path)
+        path = os.path.join(path, 'PKG-INFO')
+    else:
+        path = os.path.join(site_packages, '{}-{}.dist-info'.format(name.replace('-', '_'), version))
+        os.mkdir(path)
+        path = os.path.join(path, 'METADATA')
+    with open(path, 'w') as f:
+        f.write('Metadata-Version: 2.1\nName: {}\nVersion: {}\n\nName: not a header\n'.format(name, version))
+
+
+class InventoryTestCase(unittest.TestCase):
+
+    def test_read_metadata(self):
+        with TemporaryDirectory():
+            with open('METADATA', 'w') as f:
+                f.write('Metadata-Version: 2.1\nName: abc\nSummary: x\nVersion: 1.0\n\nVersion: 2.0\n')
+            self.assertEqual(read_metadata('METADATA'), ('abc', '1.0'))
+            open('empty', 'w').close()
+            self.assertEqual(read_metadata('empty'), (None, None))
+
+    def test_scan_site_packages(self):
+        with TemporaryDirectory():
+            site_packages = make_virtualenv('env', '3.6')
+            add_distribution(site_packages, 'abc', '1.0')
+            add_distribution(site_packages, 'def', '2.0', egg_info=True)
+            os.mkdir(os.path.join(site_packages, 'broken-1.0.dist-info'))
+            self.assertEqual(scan_site_packages(site_packages), [('abc', '1.0'), ('def', '2.0')])
+            self.assertEqual(scan_site_packages('missing'), [])
+
+    def test_parse_requirement(self):
+        name, specifier = parse_requirement('Requests<2.20')
+        self.assertEqual(name, 'requests')
+        self.assertTrue(specifier.contains('2.19.1'))
+        self.assertFalse(specifier.contains('2.20.0'))
+        self.assertRaises(ValueError, parse_requirement, '<2.0')
+
+    def test_refresh_and_query(self):
+        with TemporaryDirectory() as t:
+            abc = make_virtualenv('abc-3.6', '3.6')
+            add_distribution(abc, 'requests', '2.19.1')
+            add_distribution(abc, 'Flask-Login', '0.4')
+            defg = make_virtualenv('def-3.6', '3.6')
+            add_distribution(defg, 'requests', '2.21.0')
+            connection = connect(os.path.join(t.path, 'inventory.sqlite3'))
+            paths = [os.path.join(t.path, 'abc-3.6'), os.path.join(t.path, 'def-3.6')]
+            self.assertEqual(refresh(connection, paths), 2)
+            self.assertEqual(query(connection, 'requests<2.20'), [(paths[0], 'requests', '2.19.1')])
+            self.assertEqual(query(connection, 'flask_login'), [(paths[0], 'Flask-Login', '0.4')])
+            self.assertEqual(len(query(connection, 'requests')), 2)
+            # Unchanged
+            self.assertEqual(refresh(connection, paths), 0)
+            # Upgraded
+            shutil.rmtree(os.path.join(abc, 'requests-2.19.1.dist-info'))
+            add_distribution(abc, 'requests', '2.22.0')
+            os.utime(abc, (0, 0))
+            self.assertEqual(refresh(connection, paths), 1)
+            self.assertEqual(query(connection, 'requests<2.20'), [])
+            # Removed
+            shutil.rmtree('def-3.6')
+            self.assertEqual(refresh(connection, paths[:1]), 0)
+            self.assertEqual(query(connection, 'requests'), [(paths[0], 'requests', '2.22.0')])
+            connection.close()
+
+    def test_which_command(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            add_distribution(make_virtualenv(os.path.join('venvs', 'abc-3.6'), '3.6'), 'requests', '2.19.1')
+            self.assertEqual(which_command(['requests<2.20', '-d', 'venvs']), 0)
+            self.assertEqual(which_command(['requests>=2.20', '-d', 'venvs']), 1)
+            self.assertEqual(which_command(['requests<2.20', '--no-refresh']), 0)
+            self.assertEqual(which_command(['<2.20', '-d', 'venvs']), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
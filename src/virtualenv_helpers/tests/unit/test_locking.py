@@ -0,0 +1,99 @@
+"""test_virtualenv_helpers/locking.py
+*************************************
+Provides unit tests for virtualenv_helpers/locking.py
+"""
+
+import unittest
+import os
+import sys
+import time
+import threading
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers import locking
+from virtualenv_helpers.locking import get_lock_path
+from virtualenv_helpers.locking import EnvironmentLock
+from virtualenv_helpers.locking import staging_directory
+from virtualenv_helpers.locking import publish_environment
+
+
+class LockingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
+
+    def tearDown(self):
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
+
+    def test_get_lock_path(self):
+        with TemporaryDirectory() as t:
+            path = get_lock_path(os.path.join('venvs', 'abc-3.6'))
+            self.assertEqual(os.path.dirname(path), os.path.join(self.cache_dir.path, 'locks'))
+            self.assertTrue(os.path.basename(path).startswith('abc-3.6-'))
+            self.assertEqual(get_lock_path(os.path.join(t.path, 'venvs', 'abc-3.6')), path)
+            self.assertNotEqual(get_lock_path(os.path.join('other', 'abc-3.6')), path)
+            self.assertFalse(os.path.exists(os.path.join(self.cache_dir.path, 'locks')))
+
+    @unittest.skipIf(locking.fcntl is None, 'fcntl is not available')
+    def test_lock_waits(self):
+        with TemporaryDirectory() as t:
+            path = os.path.join(t.path, 'venvs', 'abc-3.6')
+            events = []
+            with EnvironmentLock(path) as lock:
+                self.assertFalse(lock.waited)
+                self.assertTrue(os.path.exists(get_lock_path(path)))
+
+                def wait():
+                    with EnvironmentLock(path) as other:
+                        events.append(('acquired', other.waited))
+                thread = threading.Thread(target=wait)
+                thread.start()
+                time.sleep(0.2)
+                events.append(('released', None))
+            thread.join()
+            self.assertEqual(events, [('released', None), ('acquired', True)])
+            with EnvironmentLock(path) as lock:
+                self.assertFalse(lock.waited)
+
+    def test_staging_directory(self):
+        with TemporaryDirectory() as t:
+            path = os.path.join(t.path, 'venvs', 'abc-3.6')
+            with staging_directory(path) as build_dir:
+                self.assertEqual(os.path.basename(build_dir), 'abc-3.6')
+                staging_dir = os.path.dirname(build_dir)
+                self.assertEqual(os.path.dirname(staging_dir), os.path.join(t.path, 'venvs'))
+                self.assertTrue(os.path.basename(staging_dir).startswith('.abc-3.6.'))
+                os.mkdir(build_dir)
+            self.assertEqual(os.listdir(os.path.join(t.path, 'venvs')), [])
+
+    def test_publish_environment(self):
+        with TemporaryDirectory() as t:
+            path = os.path.join(t.path, 'venvs', 'abc-3.6')
+            with staging_directory(path) as build_dir:
+                site_packages = make_virtualenv(build_dir, '3.6')
+                script_dir = 'Scripts' if sys.platform.startswith('win') else 'bin'
+                with open(os.path.join(build_dir, script_dir, 'activate'), 'w') as f:
+                    f.write('VIRTUAL_ENV="{}"\n'.format(build_dir))
+                os.makedirs(os.path.join(site_packages, '__pycache__'))
+                with open(os.path.join(site_packages, '__pycache__', 'abc.cpython-36.pyc'), 'wb') as f:
+                    f.write(b'\0' + os.path.join(site_packages, 'abc.py').encode('utf-8'))
+                with open(os.path.join(site_packages, '__pycache__', 'other.cpython-36.pyc'), 'wb') as f:
+                    f.write(b'\0other.py')
+                publish_environment(build_dir, path)
+                self.assertFalse(os.path.exists(build_dir))
+            with open(os.path.join(path, script_dir, 'activate')) as f:
+                self.assertEqual(f.read(), 'VIRTUAL_ENV="{}"\n'.format(path))
+            # The bytecode compiled in the staging directory is compiled again
+            pycache = os.path.join(path, os.path.relpath(site_packages, build_dir), '__pycache__')
+            self.assertEqual(os.listdir(pycache), ['other.cpython-36.pyc'])
+            self.assertEqual(os.listdir(os.path.join(t.path, 'venvs')), ['abc-3.6'])
+
+
+if __name__ == "__main__":
+    unittest.main()
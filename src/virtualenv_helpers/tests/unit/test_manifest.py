@@ -0,0 +1,77 @@
+"""test_virtualenv_helpers/manifest.py
+**************************************
+Provides unit tests for virtualenv_helpers/manifest.py
+"""
+
+import unittest
+import os
+import sys
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+
+from virtualenv_helpers.manifest import read_manifest
+from virtualenv_helpers.manifest import write_manifest
+from virtualenv_helpers.manifest import find_executable
+from virtualenv_helpers.manifest import environment_inputs
+from virtualenv_helpers.manifest import wheels_inputs
+from virtualenv_helpers.manifest import develop_inputs
+from virtualenv_helpers.manifest import is_up_to_date
+
+
+class ManifestTestCase(unittest.TestCase):
+
+    def test_read_write_manifest(self):
+        with TemporaryDirectory() as t:
+            self.assertEqual(read_manifest(t.path), {})
+            write_manifest(t.path, {'environment': {'backend': 'venv'}})
+            self.assertEqual(read_manifest(t.path), {'environment': {'backend': 'venv'}})
+            with open(os.path.join(t.path, 'virtualenv_helpers.json'), 'w') as f:
+                f.write('not json')
+            self.assertEqual(read_manifest(t.path), {})
+
+    def test_find_executable(self):
+        self.assertEqual(find_executable(sys.executable), os.path.realpath(sys.executable))
+        with TemporaryEnvironment(PATH=os.path.dirname(sys.executable)):
+            self.assertEqual(find_executable(os.path.split(sys.executable)[-1]), os.path.realpath(sys.executable))
+            self.assertIsNone(find_executable('not_an_executable_abcdef'))
+
+    def test_environment_inputs(self):
+        inputs = environment_inputs('venv', sys.executable, ('--clear',))
+        self.assertEqual(inputs['backend'], 'venv')
+        self.assertEqual(inputs['args'], ['--clear'])
+        self.assertEqual(inputs['interpreter'], os.path.realpath(sys.executable))
+        self.assertEqual(inputs['interpreter_mtime'], os.stat(os.path.realpath(sys.executable)).st_mtime)
+
+    def test_wheels_inputs(self):
+        with TemporaryDirectory() as t:
+            empty = wheels_inputs(t.path, '3.6')
+            open('abc-1.0-py2-none-any.whl', 'w').close()
+            self.assertEqual(wheels_inputs(t.path, '3.6'), empty)
+            open('abc-1.0-py3-none-any.whl', 'w').close()
+            self.assertNotEqual(wheels_inputs(t.path, '3.6'), empty)
+
+    def test_develop_inputs(self):
+        with TemporaryDirectory() as t:
+            empty = develop_inputs(t.path)
+            self.assertEqual(empty['project'], t.path)
+            with open('setup.py', 'w') as f:
+                f.write('abc')
+            with_setup = develop_inputs(t.path)
+            self.assertNotEqual(with_setup, empty)
+            with open('README.md', 'w') as f:
+                f.write('abc')
+            self.assertEqual(develop_inputs(t.path), with_setup)
+            with open('requirements-dev.txt', 'w') as f:
+                f.write('abc')
+            self.assertNotEqual(develop_inputs(t.path), with_setup)
+
+    def test_is_up_to_date(self):
+        manifest = {'environment': {'args': ['a']}}
+        self.assertTrue(is_up_to_date(manifest, 'environment', {'args': ('a',)}))
+        self.assertFalse(is_up_to_date(manifest, 'environment', {'args': ['b']}))
+        self.assertFalse(is_up_to_date(manifest, 'wheels', {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""test_virtualenv_helpers/mru.py
+*********************************
+Provides unit tests for virtualenv_helpers/mru.py
+"""
+
+import unittest
+import os
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+
+import virtualenv_helpers.mru as mru
+from virtualenv_helpers.mru import get_mru_path
+from virtualenv_helpers.mru import read_log
+from virtualenv_helpers.mru import compact
+from virtualenv_helpers.mru import move_entries
+from virtualenv_helpers.mru import record_use
+from virtualenv_helpers.mru import get_last_used
+from virtualenv_helpers.mru import find_last_used
+
+
+class MRUTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
+        self._compact_size = mru.COMPACT_SIZE
+
+    def tearDown(self):
+        mru.COMPACT_SIZE = self._compact_size
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
+
+    def test_record_use(self):
+        with TemporaryDirectory() as t:
+            record_use('abc-3.6', 'abc', '3.6', when=1.0)
+            record_use('def', when=2.0)
+            with open(get_mru_path(), 'a') as f:
+                f.write('partial line\n3.0\t3.6\n')
+            self.assertEqual(read_log(), [(1.0, '3.6', os.path.join(t.path, 'abc'), os.path.join(t.path, 'abc-3.6')),
+                                          (2.0, None, None, os.path.join(t.path, 'def'))])
+            self.assertEqual(get_last_used(), {os.path.join(t.path, 'abc-3.6'): 1.0, os.path.join(t.path, 'def'): 2.0})
+
+    def test_compact(self):
+        with TemporaryDirectory() as t:
+            for i in range(5):
+                record_use('abc-3.6', 'abc', '3.6', when=float(i))
+                record_use('.venv', 'abc', '3.6', when=float(i) + 0.5)
+            self.assertEqual(len(read_log()), 10)
+            self.assertEqual(compact(), 2)
+            self.assertEqual(read_log(), [(4.0, '3.6', os.path.join(t.path, 'abc'), os.path.join(t.path, 'abc-3.6')),
+                                          (4.5, '3.6', os.path.join(t.path, 'abc'), os.path.join(t.path, '.venv'))])
+            # Compacted automatically when the log grows too large
+            mru.COMPACT_SIZE = 200
+            for i in range(10):
+                record_use('abc-3.6', 'abc', '3.6', when=10.0 + i)
+            self.assertLess(len(read_log()), 5)
+            self.assertEqual(get_last_used()[os.path.join(t.path, 'abc-3.6')], 19.0)
+
+    def test_move_entries(self):
+        with TemporaryDirectory() as t:
+            record_use('abc-3.6', 'abc', '3.6', when=1.0)
+            record_use('abc-3.6', None, '3.6', when=2.0)
+            record_use('def-3.6', 'def', '3.6', when=3.0)
+            self.assertEqual(move_entries('abc-3.6', 'ghi-3.6'), [os.path.join(t.path, 'abc')])
+            self.assertEqual([entry[3] for entry in read_log()], [os.path.join(t.path, 'ghi-3.6')] * 2 + [os.path.join(t.path, 'def-3.6')])
+            self.assertEqual(move_entries('abc-3.6', 'ghi-3.6'), [])
+
+    def test_find_last_used(self):
+        with TemporaryDirectory() as t:
+            os.makedirs(os.path.join('abc', 'src'))
+            os.mkdir('abc-3.6')
+            os.mkdir('.venv')
+            self.assertEqual(find_last_used('3.6'), (None, None))
+            record_use('abc-3.6', 'abc', '3.6', when=1.0)
+            record_use('.venv', 'abc', '3.6', when=2.0)
+            record_use('abc-3.6', 'abc', '2.7', when=3.0)
+            os.chdir(os.path.join('abc', 'src'))
+            self.assertEqual(find_last_used('3.6'), (os.path.join(t.path, '.venv'), os.path.join(t.path, 'abc')))
+            self.assertEqual(find_last_used('3.6', max_levels=1), (None, None))
+            self.assertEqual(find_last_used('3.5'), (None, None))
+            self.assertEqual(find_last_used(None), (None, None))
+            # Removed since it was used
+            os.rmdir(os.path.join(t.path, '.venv'))
+            self.assertEqual(find_last_used('3.6'), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
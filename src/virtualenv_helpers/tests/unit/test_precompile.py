@@ -0,0 +1,73 @@
+"""test_virtualenv_helpers/precompile.py
+****************************************
+Provides unit tests for virtualenv_helpers/precompile.py
+"""
+
+import unittest
+import os
+import sys
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+import virtualenv_helpers.precompile as precompile_module
+from virtualenv_helpers.precompile import get_precompile_paths
+from virtualenv_helpers.precompile import precompile
+
+
+class PrecompileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self._call = precompile_module.subprocess.call
+        precompile_module.subprocess.call = lambda argv, *args, **kwargs: self.calls.append(argv) or 0
+
+    def tearDown(self):
+        precompile_module.subprocess.call = self._call
+
+    def test_get_precompile_paths(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_virtualenv('env', '3.6')
+            os.makedirs(os.path.join('project', 'src'))
+            with open(os.path.join(site_packages, '__editable__.abc-1.0.pth'), 'w') as f:
+                f.write(os.path.join(t.path, 'project', 'src') + '\n')
+            with open(os.path.join(site_packages, 'easy-install.pth'), 'w') as f:
+                f.write('import sys\n{}\n./abc.egg\n{}\n'.format(os.path.join(t.path, 'project'), os.path.join(t.path, 'missing')))
+            os.mkdir(os.path.join(site_packages, 'abc.egg'))
+            self.assertEqual(get_precompile_paths('env', '3.6'),
+                             [site_packages, os.path.join(t.path, 'project', 'src'), os.path.join(t.path, 'project')])
+
+    def test_precompile(self):
+        with TemporaryDirectory(), Quiet():
+            site_packages = make_virtualenv('env', '3.6')
+            self.assertEqual(precompile('env', '3.6', workers=3), 0)
+            self.assertEqual(len(self.calls), 1)
+            self.assertEqual(self.calls[0][1:6], ['-m', 'compileall', '-q', '-j', '3'])
+            self.assertEqual(self.calls[0][-1], site_packages)
+
+    def test_precompile_no_parallel_compileall(self):
+        with TemporaryDirectory(), Quiet():
+            site_packages = make_virtualenv('env', '2.7')
+            for name in ('a.py', 'b.py', 'c.py'):
+                open(os.path.join(site_packages, name), 'w').close()
+            precompile('env', '2.7', workers=2)
+            self.assertEqual(sorted(len(call) for call in self.calls), [7, 8])
+            self.assertNotIn('-j', self.calls[0])
+
+    def test_precompile_compiles(self):
+        if sys.platform.startswith('win'):
+            raise unittest.SkipTest('Uses a symlink to the python executable')
+        precompile_module.subprocess.call = self._call
+        with TemporaryDirectory(), Quiet():
+            version = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+            site_packages = make_virtualenv('env', version)
+            os.symlink(sys.executable, os.path.join('env', 'bin', 'python'))
+            with open(os.path.join(site_packages, 'abc.py'), 'w') as f:
+                f.write('x = 1\n')
+            self.assertEqual(precompile('env', version, workers=2), 0)
+            self.assertTrue(os.listdir(os.path.join(site_packages, '__pycache__')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+"""test_virtualenv_helpers/registry.py
+**************************************
+Provides unit tests for virtualenv_helpers/registry.py
+"""
+
+import unittest
+import os
+import json
+import time
+import shutil
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.find import get_virtualenv_paths
+from virtualenv_helpers.find import update_names_index
+from virtualenv_helpers.manifest import write_manifest
+from virtualenv_helpers.mru import record_use
+from virtualenv_helpers.registry import connect
+from virtualenv_helpers.registry import read_pyvenv_cfg
+from virtualenv_helpers.registry import get_environment_size
+from virtualenv_helpers.registry import read_environment
+from virtualenv_helpers.registry import register
+from virtualenv_helpers.registry import register_environment
+from virtualenv_helpers.registry import get_environments
+from virtualenv_helpers.registry import read_environments
+from virtualenv_helpers.registry import rebuild
+from virtualenv_helpers.registry import prune
+from virtualenv_helpers.registry import format_size
+from virtualenv_helpers.registry import list_command
+from virtualenv_helpers.registry import prune_command
+from virtualenv_helpers.registry import rebuild_command
+
+
+def make_environment(path, version='3.6', project_dir=None):
+    make_virtualenv(path, version)
+    with open(os.path.join(path, 'pyvenv.cfg'), 'w') as f:
+        f.write('home = /usr/bin\nversion = {}.1\n'.format(version))
+    if project_dir is not None:
+        write_manifest(path, {'environment': {'interpreter': '/usr/bin/python{}'.format(version)},
+                              'develop': {'project': project_dir, 'hash': ''}})
+    return os.path.abspath(path)
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = TemporaryDirectory(change_directory=False)
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=self.cache_dir.path)
+        self.environment.__enter__()
+
+    def tearDown(self):
+        self.environment.__exit__()
+        self.cache_dir.delete_temporary_directory()
+
+    def test_connect_wal(self):
+        connection = connect()
+        self.assertEqual(connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        connection.close()
+
+    def test_read_environments_no_registry(self):
+        with TemporaryDirectory() as t:
+            # Reading does not create the registry (or the cache directory)
+            with TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+                self.assertEqual(read_environments(), [])
+                self.assertFalse(os.path.exists(os.path.join(t.path, 'cache')))
+            open('file', 'w').close()
+            with TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'file', 'cache')):
+                self.assertEqual(read_environments(), [])
+
+    def test_read_environments_filters(self):
+        with TemporaryDirectory() as t:
+            make_environment(os.path.join('venvs', 'abc-3.6'), '3.6', project_dir=os.path.join(t.path, 'abc'))
+            make_environment(os.path.join('venvs', 'abc-2.7'), '2.7', project_dir=os.path.join(t.path, 'abc'))
+            make_environment(os.path.join('venvs', 'def-3.6'), '3.6', project_dir=os.path.join(t.path, 'def'))
+            connection = connect()
+            rebuild(connection, get_virtualenv_paths(os.path.join(t.path, 'venvs')))
+            connection.close()
+            self.assertEqual([u['name'] for u in read_environments(project_dir=os.path.join(t.path, 'abc'))], ['abc', 'abc'])
+            self.assertEqual([u['name'] for u in read_environments(project_dir=[os.path.join(t.path, 'abc'), os.path.join(t.path, 'def')], version='3.6')],
+                             ['abc', 'def'])
+            self.assertEqual(read_environments(project_dir=[]), [])
+
+    def test_read_pyvenv_cfg(self):
+        with TemporaryDirectory():
+            make_environment('env')
+            self.assertEqual(read_pyvenv_cfg('env'), {'home': '/usr/bin', 'version': '3.6.1'})
+            self.assertEqual(read_pyvenv_cfg('missing'), {})
+
+    def test_get_environment_size(self):
+        with TemporaryDirectory():
+            os.makedirs(os.path.join('env', 'lib'))
+            with open(os.path.join('env', 'a'), 'wb') as f:
+                f.write(b'a' * 10)
+            with open(os.path.join('env', 'lib', 'b'), 'wb') as f:
+                f.write(b'b' * 5)
+            if hasattr(os, 'link'):
+                os.link(os.path.join('env', 'a'), os.path.join('env', 'lib', 'c'))
+            self.assertEqual(get_environment_size('env'), 15)
+
+    def test_read_environment(self):
+        with TemporaryDirectory() as t:
+            path = make_environment('abc-3.6', project_dir=os.path.join(t.path, 'abc'))
+            record = read_environment('abc-3.6')
+            self.assertEqual(record['path'], path)
+            self.assertEqual(record['name'], 'abc')
+            self.assertEqual(record['version'], '3.6')
+            self.assertEqual(record['interpreter'], '/usr/bin/python3.6')
+            self.assertEqual(record['project_dir'], os.path.join(t.path, 'abc'))
+            self.assertIsNotNone(record['created'])
+            self.assertGreater(record['size'], 0)
+            # No manifest and no version in the name
+            make_environment('def', '2.7')
+            record = read_environment('def')
+            self.assertEqual((record['name'], record['version'], record['interpreter'], record['project_dir']), ('def', '2.7', '/usr/bin', None))
+
+    def test_register(self):
+        connection = connect()
+        register(connection, {'path': '/abc-3.6', 'name': 'abc', 'created': 1.0, 'last_used': 2.0})
+        register(connection, {'path': '/abc-3.6', 'name': 'abc', 'version': '3.6', 'created': None})
+        self.assertEqual(get_environments(connection), [{'path': '/abc-3.6', 'name': 'abc', 'version': '3.6', 'interpreter': None,
+                                                         'project_dir': None, 'created': 1.0, 'last_used': 2.0, 'size': None}])
+        connection.close()
+
+    def test_register_environment(self):
+        with TemporaryDirectory() as t:
+            path = make_environment('abc-3.6')
+            register_environment('abc-3.6', project_dir=os.path.join(t.path, 'abc'))
+            make_environment(os.path.join('other', 'abc-3.6'))
+            register_environment(os.path.join('other', 'abc-3.6'))
+            record_use('abc-3.6', when=10.0)
+            records = read_environments(virtualenv_dir=t.path)
+            self.assertEqual([(u['path'], u['project_dir'], u['last_used']) for u in records], [(path, os.path.join(t.path, 'abc'), 10.0)])
+            self.assertEqual(len(read_environments()), 2)
+            self.assertEqual(len(read_environments(project_dir='abc')), 1)
+
+    def test_rebuild(self):
+        with TemporaryDirectory() as t:
+            paths = [make_environment('abc-3.6'), make_environment('def-2.7', '2.7')]
+            connection = connect()
+            register(connection, {'path': os.path.join(t.path, 'removed-3.6'), 'name': 'removed'})
+            register(connection, {'path': paths[0], 'name': 'abc', 'last_used': 5.0})
+            self.assertEqual(rebuild(connection, paths, workers=2), 2)
+            records = get_environments(connection)
+            self.assertEqual([(u['path'], u['version'], u['last_used']) for u in records], [(paths[0], '3.6', 5.0), (paths[1], '2.7', None)])
+            connection.close()
+
+    def test_prune(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=t.path):
+            paths = [make_environment('abc-3.6'), make_environment('def-3.6'), make_environment('ghi-3.6')]
+            update_names_index(t.path)
+            connection = connect()
+            rebuild(connection, paths)
+            record_use(paths[1], when=time.time())
+            record_use(paths[2], when=time.time() - 10 * 24 * 60 * 60)
+            shutil.rmtree(paths[0])
+            self.assertEqual(prune(connection, unused_days=5, dry_run=True), ([paths[0]], [paths[2]]))
+            self.assertEqual(len(get_environments(connection)), 3)
+            self.assertEqual(prune(connection), ([paths[0]], []))
+            self.assertEqual(prune(connection, unused_days=5), ([], [paths[2]]))
+            self.assertFalse(os.path.exists(paths[2]))
+            self.assertEqual([u['path'] for u in get_environments(connection)], [paths[1]])
+            with open('.venv_names') as f:
+                self.assertEqual(f.read().split(), ['def', 'def-3.6'])
+            connection.close()
+
+    def test_format_size(self):
+        self.assertEqual(format_size(None), '-')
+        self.assertEqual(format_size(100), '100 B')
+        self.assertEqual(format_size(1536), '1.5 KB')
+        self.assertEqual(format_size(3 * 1024 ** 3), '3.0 GB')
+
+    def test_commands(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs')):
+            make_environment(os.path.join('venvs', 'abc-3.6'))
+            make_environment(os.path.join('venvs', 'def-2.7'), '2.7')
+            with Quiet():
+                self.assertEqual(rebuild_command([]), 0)
+                self.assertEqual(list_command(['--sort', 'size']), 0)
+                self.assertEqual(list_command(['--sort', 'recent']), 0)
+                self.assertEqual(prune_command(['-n', '--unused-days', '1']), 0)
+            self.assertEqual(len(read_environments()), 2)
+            with TemporaryDirectory(change_directory=False) as output:
+                with open(os.path.join(output.path, 'out'), 'w') as f:
+                    import sys
+                    stdout, sys.stdout = sys.stdout, f
+                    try:
+                        list_command(['--json'])
+                    finally:
+                        sys.stdout = stdout
+                with open(os.path.join(output.path, 'out')) as f:
+                    self.assertEqual([u['name'] for u in json.load(f)], ['abc', 'def'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""test_virtualenv_helpers/relocate.py
+**************************************
+Provides unit tests for virtualenv_helpers/relocate.py
+"""
+
+import unittest
+import os
+import sys
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.relocate import contains
+from virtualenv_helpers.relocate import find_prefix_files
+from virtualenv_helpers.relocate import rewrite_file
+from virtualenv_helpers.relocate import relocate
+from virtualenv_helpers.relocate import relocate_command
+from virtualenv_helpers.find import read_virtualenv_pointer
+from virtualenv_helpers.find import update_virtualenv_pointer
+from virtualenv_helpers.mru import read_log
+from virtualenv_helpers.mru import record_use
+from virtualenv_helpers.registry import read_environments
+from virtualenv_helpers.registry import register_environment
+
+SCRIPT_DIR = 'Scripts' if sys.platform.startswith('win') else 'bin'
+
+
+def make_environment(path):
+    site_packages = make_virtualenv(path, '3.6')
+    prefix = os.path.abspath(path)
+    with open(os.path.join(path, SCRIPT_DIR, 'tool'), 'w') as f:
+        f.write('#!{}\nimport tool\n'.format(os.path.join(prefix, SCRIPT_DIR, 'python')))
+    os.chmod(os.path.join(path, SCRIPT_DIR, 'tool'), 0o755)
+    with open(os.path.join(path, 'pyvenv.cfg'), 'w') as f:
+        f.write('home = /usr/bin\ncommand = python -m venv {}\n'.format(prefix))
+    with open(os.path.join(site_packages, 'local.pth'), 'w') as f:
+        f.write(os.path.join(prefix, 'src') + '\n')
+    with open(os.path.join(site_packages, 'binary.dat'), 'wb') as f:
+        f.write(b'\0' + prefix.encode('utf-8'))
+    with open(os.path.join(site_packages, 'module.pyc'), 'wb') as f:
+        f.write(prefix.encode('utf-8'))
+    open(os.path.join(site_packages, 'empty.py'), 'w').close()
+    return site_packages
+
+
+class RelocateTestCase(unittest.TestCase):
+
+    def test_contains(self):
+        with TemporaryDirectory():
+            with open('a', 'wb') as f:
+                f.write(b'abcdef')
+            open('empty', 'w').close()
+            self.assertTrue(contains('a', b'cde'))
+            self.assertFalse(contains('a', b'xyz'))
+            self.assertFalse(contains('empty', b'xyz'))
+
+    def test_find_prefix_files(self):
+        with TemporaryDirectory() as t:
+            make_environment('env')
+            self.assertEqual(find_prefix_files('env', os.path.join(t.path, 'env')),
+                             ['{}/tool'.format(SCRIPT_DIR), 'lib/python3.6/site-packages/local.pth', 'pyvenv.cfg'])
+
+    def test_rewrite_file(self):
+        with TemporaryDirectory():
+            with open('a', 'wb') as f:
+                f.write(b'abc abc')
+            os.chmod('a', 0o755)
+            if hasattr(os, 'link'):
+                os.link('a', 'b')
+            self.assertTrue(rewrite_file('a', b'abc', b'de'))
+            self.assertFalse(rewrite_file('a', b'abc', b'de'))
+            with open('a', 'rb') as f:
+                self.assertEqual(f.read(), b'de de')
+            if not sys.platform.startswith('win'):
+                self.assertTrue(os.stat('a').st_mode & 0o100)
+            if hasattr(os, 'link'):
+                with open('b', 'rb') as f:
+                    self.assertEqual(f.read(), b'abc abc')
+
+    def test_relocate(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_environment('env')
+            os.rename('env', 'moved')
+            site_packages = site_packages.replace('env', 'moved', 1)
+            self.assertEqual(len(relocate('moved', 'env', workers=2)), 3)
+            with open(os.path.join('moved', SCRIPT_DIR, 'tool')) as f:
+                self.assertEqual(f.readline(), '#!{}\n'.format(os.path.join(t.path, 'moved', SCRIPT_DIR, 'python')))
+            with open(os.path.join(site_packages, 'local.pth')) as f:
+                self.assertEqual(f.read(), os.path.join(t.path, 'moved', 'src') + '\n')
+            with open(os.path.join(site_packages, 'module.pyc'), 'rb') as f:
+                self.assertEqual(f.read(), os.path.join(t.path, 'env').encode('utf-8'))
+            self.assertEqual(relocate('moved', 'env'), [])
+            self.assertEqual(relocate('moved', 'moved'), [])
+
+    def test_relocate_command(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=t.path, VENV_HELPERS_CACHE_DIR=os.path.join(t.path, '.cache')), Quiet():
+            make_environment('abc-3.6')
+            os.mkdir('.project')
+            register_environment('abc-3.6', project_dir=os.path.join(t.path, '.project'))
+            record_use('abc-3.6', '.project', '3.6')
+            update_virtualenv_pointer('.project', {'3.6': os.path.join(t.path, 'abc-3.6')})
+            self.assertEqual(relocate_command(['abc-3.6', 'def-3.6']), 0)
+            self.assertFalse(os.path.exists('abc-3.6'))
+            with open(os.path.join('def-3.6', 'pyvenv.cfg')) as f:
+                self.assertIn(os.path.join(t.path, 'def-3.6'), f.read())
+            with open('.venv_names') as f:
+                self.assertEqual(f.read().split(), ['def', 'def-3.6'])
+            # The registry, the most recently used log and the pointer files follow it
+            self.assertEqual([(e['path'], e['project_dir']) for e in read_environments()],
+                             [(os.path.join(t.path, 'def-3.6'), os.path.join(t.path, '.project'))])
+            self.assertEqual([entry[3] for entry in read_log()], [os.path.join(t.path, 'def-3.6')])
+            self.assertEqual(read_virtualenv_pointer('.project'), {'3.6': os.path.join(t.path, 'def-3.6')})
+            os.rename('def-3.6', 'ghi-3.6')
+            self.assertEqual(relocate_command(['ghi-3.6', '--from', 'def-3.6']), 0)
+            with open(os.path.join('ghi-3.6', 'pyvenv.cfg')) as f:
+                self.assertIn(os.path.join(t.path, 'ghi-3.6'), f.read())
+            self.assertEqual(read_virtualenv_pointer('.project'), {'3.6': os.path.join(t.path, 'ghi-3.6')})
+            make_environment('abc-3.6')
+            self.assertEqual(relocate_command(['abc-3.6', 'ghi-3.6']), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""test_virtualenv_helpers/run.py
+*********************************
+Provides unit tests for virtualenv_helpers/run.py
+"""
+
+import unittest
+import os
+import io
+import sys
+import threading
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+
+from virtualenv_helpers.run import script_dir
+from virtualenv_helpers.run import get_activation_env
+from virtualenv_helpers.run import find_command
+from virtualenv_helpers.run import get_exit_code
+from virtualenv_helpers.run import run_in_virtualenv
+from virtualenv_helpers.run import run_in_virtualenvs
+
+
+def make_environment(path):
+    os.makedirs(os.path.join(path, script_dir))
+    return os.path.abspath(path)
+
+
+class RunTestCase(unittest.TestCase):
+
+    def test_get_activation_env(self):
+        env = get_activation_env('env', {'PATH': os.pathsep.join(['a', 'b']), 'PYTHONHOME': 'c', 'OTHER': 'd'})
+        self.assertEqual(env['VIRTUAL_ENV'], os.path.abspath('env'))
+        self.assertEqual(env['PATH'], os.pathsep.join([os.path.join(os.path.abspath('env'), script_dir), 'a', 'b']))
+        self.assertNotIn('PYTHONHOME', env)
+        self.assertEqual(env['OTHER'], 'd')
+
+    def test_find_command(self):
+        with TemporaryDirectory() as t:
+            make_environment('env')
+            tool = os.path.join(t.path, 'env', script_dir, 'tool')
+            with open(tool, 'w') as f:
+                f.write('')
+            os.chmod(tool, 0o755)
+            self.assertEqual(find_command('tool', os.path.join(t.path, 'env', script_dir)), tool)
+            self.assertEqual(find_command('missing', os.path.join(t.path, 'env', script_dir)), 'missing')
+            self.assertEqual(find_command(os.path.join('a', 'tool'), os.path.join(t.path, 'env', script_dir)), os.path.join('a', 'tool'))
+
+    def test_get_exit_code(self):
+        self.assertEqual(get_exit_code(0), 0)
+        self.assertEqual(get_exit_code(2), 2)
+        self.assertEqual(get_exit_code(-9), 137)
+
+    def test_run_in_virtualenv(self):
+        with TemporaryDirectory():
+            path = make_environment('abc-3.6')
+            stream = io.StringIO()
+            code = run_in_virtualenv(path, [sys.executable, '-c', 'import os, sys; print(os.environ["VIRTUAL_ENV"]); sys.exit(3)'],
+                                     'abc-3.6 | ', threading.Lock(), stream)
+            self.assertEqual(code, 3)
+            self.assertEqual(stream.getvalue().splitlines(), ['abc-3.6 | {}'.format(path), 'abc-3.6 | exited with code 3'])
+            stream = io.StringIO()
+            self.assertEqual(run_in_virtualenv(path, ['missing-command-abc'], 'abc | ', threading.Lock(), stream), 127)
+            self.assertTrue(stream.getvalue().startswith('abc | missing-command-abc: '))
+
+    def test_run_in_virtualenvs(self):
+        with TemporaryDirectory():
+            paths = [make_environment('abc-2.7'), make_environment('abc-3.6'), make_environment('abcdef')]
+            stream = io.StringIO()
+            code = run_in_virtualenvs(paths, [sys.executable, '-c', 'import os, sys; print("a"); sys.exit(2 if os.environ["VIRTUAL_ENV"].endswith("3.6") else 0)'],
+                                      stream=stream)
+            self.assertEqual(code, 2)
+            lines = stream.getvalue().splitlines()
+            self.assertEqual(sorted(lines), ['abc-2.7 | a', 'abc-3.6 | a', 'abc-3.6 | exited with code 2', 'abcdef  | a'])
+            self.assertEqual(run_in_virtualenvs([], ['abc']), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""test_virtualenv_helpers/seed.py
+**********************************
+Provides unit tests for virtualenv_helpers/seed.py
+"""
+
+import unittest
+import os
+import sys
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers import seed
+from virtualenv_helpers.seed import get_interpreter_tag
+from virtualenv_helpers.seed import get_seed_wheels
+from virtualenv_helpers.seed import has_seed_wheels
+from virtualenv_helpers.seed import refresh_seed_wheels
+from virtualenv_helpers.seed import seed_environment
+from virtualenv_helpers.seed import refresh
+
+VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+class SeedTestCase(unittest.TestCase):
+
+    def test_get_interpreter_tag(self):
+        self.assertEqual(get_interpreter_tag('3.6'), 'cp36')
+
+    def test_refresh_seed_wheels(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_SEED_WHEELS_DIR=os.path.join(t.path, 'seeds')), Quiet():
+            os.mkdir('house')
+            make_wheel('house', 'pip', '9.0.1', 'py2.py3-none-any')
+            make_wheel('house', 'pip', '10.0.1', 'py2.py3-none-any')
+            make_wheel('house', 'setuptools', '36.0.0', 'py2.py3-none-any')
+            make_wheel('house', 'numpy', '1.12.1', 'py2.py3-none-any')
+            self.assertFalse(has_seed_wheels('3.6'))
+            refreshed = refresh_seed_wheels('house', ['3.6'])
+            self.assertEqual([os.path.split(u)[-1] for u in refreshed['3.6']],
+                             ['pip-10.0.1-py2.py3-none-any.whl', 'setuptools-36.0.0-py2.py3-none-any.whl'])
+            self.assertTrue(has_seed_wheels('3.6'))
+            self.assertFalse(has_seed_wheels('2.7'))
+            os.remove(os.path.join('house', 'pip-10.0.1-py2.py3-none-any.whl'))
+            refresh(['house', '-p', '3.6'])
+            self.assertEqual([os.path.split(u)[-1] for u in get_seed_wheels('3.6')],
+                             ['pip-9.0.1-py2.py3-none-any.whl', 'setuptools-36.0.0-py2.py3-none-any.whl'])
+
+    def test_seed_environment(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_SEED_WHEELS_DIR=os.path.join(t.path, 'seeds')), Quiet():
+            os.mkdir('house')
+            make_wheel('house', 'pip', '10.0.1', 'py2.py3-none-any', files={'pip/__init__.py': ''},
+                       entry_points='[console_scripts]\npip = pip:main\n')
+            refresh_seed_wheels('house', [VERSION])
+            site_packages = make_virtualenv('env')
+            seed_environment('env', VERSION)
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'pip', '__init__.py')))
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'pip-10.0.1.dist-info', 'RECORD')))
+
+    def test_seed_environment_without_pip(self):
+        calls = []
+        call = seed.subprocess.call
+        seed.subprocess.call = lambda argv, **kwargs: calls.append(argv) or 0
+        try:
+            with TemporaryDirectory() as t, TemporaryEnvironment(VENV_SEED_WHEELS_DIR=os.path.join(t.path, 'seeds')), Quiet():
+                os.mkdir('house')
+                make_wheel('house', 'setuptools', '36.0.0', 'py2.py3-none-any')
+                refresh_seed_wheels('house', [VERSION])
+                site_packages = make_virtualenv('env')
+                self.assertEqual(seed_environment('env', VERSION), 0)
+                self.assertEqual([argv[1:] for argv in calls], [['-m', 'ensurepip', '--default-pip']])
+                self.assertEqual(os.listdir(site_packages), [])
+        finally:
+            seed.subprocess.call = call
+
+    def test_seed_environment_bad_wheel(self):
+        calls = []
+        call = seed.subprocess.call
+        seed.subprocess.call = lambda argv, **kwargs: calls.append(argv) or 0
+        try:
+            with TemporaryDirectory() as t, TemporaryEnvironment(VENV_SEED_WHEELS_DIR=os.path.join(t.path, 'seeds')), Quiet():
+                os.mkdir('house')
+                make_wheel('house', 'pip', '10.0.1', 'py2.py3-none-any', files={'../pip.py': ''})
+                refresh_seed_wheels('house', [VERSION])
+                make_virtualenv('env')
+                self.assertEqual(seed_environment('env', VERSION), 0)
+                self.assertEqual([argv[1:] for argv in calls], [['-m', 'ensurepip', '--default-pip']])
+        finally:
+            seed.subprocess.call = call
+
+
+if __name__ == "__main__":
+    unittest.main()
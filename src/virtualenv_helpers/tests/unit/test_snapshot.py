@@ -0,0 +1,127 @@
+"""test_virtualenv_helpers/snapshot.py
+**************************************
+Provides unit tests for virtualenv_helpers/snapshot.py
+"""
+
+import unittest
+import os
+import io
+import sys
+import json
+import tarfile
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.snapshot import SNAPSHOT_MANIFEST
+from virtualenv_helpers.snapshot import get_compression
+from virtualenv_helpers.snapshot import snapshot
+from virtualenv_helpers.snapshot import restore
+from virtualenv_helpers.snapshot import snapshot_command
+from virtualenv_helpers.snapshot import restore_command
+from virtualenv_helpers.registry import read_environments
+
+
+def make_environment(path):
+    site_packages = make_virtualenv(path, '3.6')
+    script_dir = 'Scripts' if sys.platform.startswith('win') else 'bin'
+    prefix = os.path.abspath(path)
+    with open(os.path.join(path, script_dir, 'tool'), 'w') as f:
+        f.write('#!{}\nimport tool\n'.format(os.path.join(prefix, script_dir, 'python')))
+    os.chmod(os.path.join(path, script_dir, 'tool'), 0o755)
+    with open(os.path.join(path, 'pyvenv.cfg'), 'w') as f:
+        f.write('home = {}\ncommand = python -m venv {}\n'.format(os.path.dirname(sys.executable), prefix))
+    with open(os.path.join(site_packages, 'binary.so'), 'wb') as f:
+        f.write(b'\0' + prefix.encode('utf-8'))
+    with open(os.path.join(site_packages, 'module.py'), 'w') as f:
+        f.write('x = 1\n')
+    return script_dir
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def test_get_compression(self):
+        self.assertEqual(get_compression('a.tar.gz'), 'gz')
+        self.assertEqual(get_compression('a.tgz'), 'gz')
+        self.assertEqual(get_compression('a.tar.xz'), 'xz')
+        self.assertEqual(get_compression('a.tar'), '')
+        self.assertEqual(get_compression('-'), 'gz')
+
+    def test_snapshot_restore(self):
+        for archive in ('env.tar.gz', 'env.tar.bz2', 'env.tar'):
+            with TemporaryDirectory() as t, Quiet():
+                script_dir = make_environment('env')
+                manifest = snapshot('env', archive)
+                self.assertEqual(manifest['prefix'], os.path.join(t.path, 'env'))
+                with tarfile.open(archive) as tar:
+                    self.assertEqual(tar.getmembers()[0].name, SNAPSHOT_MANIFEST)
+                path, restored = restore(archive, 'moved')
+                self.assertEqual(path, os.path.join(t.path, 'moved'))
+                self.assertEqual(restored, manifest)
+                with open(os.path.join('moved', script_dir, 'tool')) as f:
+                    self.assertEqual(f.readline(), '#!{}\n'.format(os.path.join(t.path, 'moved', script_dir, 'python')))
+                if not sys.platform.startswith('win'):
+                    self.assertTrue(os.stat(os.path.join('moved', script_dir, 'tool')).st_mode & 0o100)
+                with open(os.path.join('moved', 'pyvenv.cfg')) as f:
+                    self.assertIn('venv {}\n'.format(os.path.join(t.path, 'moved')), f.read())
+                with open(os.path.join('moved', 'lib', 'python3.6', 'site-packages', 'binary.so'), 'rb') as f:
+                    self.assertEqual(f.read(), b'\0' + os.path.join(t.path, 'env').encode('utf-8'))
+                self.assertRaises(ValueError, restore, archive, 'moved')
+
+    def test_restore_not_snapshot(self):
+        with TemporaryDirectory():
+            with tarfile.open('other.tar', 'w') as tar:
+                tar.addfile(tarfile.TarInfo('abc'), io.BytesIO(b''))
+            self.assertRaises(ValueError, restore, 'other.tar', 'env')
+
+    def test_restore_unsafe(self):
+        with TemporaryDirectory():
+            data = json.dumps({'name': 'env', 'prefix': '/env', 'rewrite': []}).encode('utf-8')
+            with tarfile.open('unsafe.tar', 'w') as tar:
+                info = tarfile.TarInfo(SNAPSHOT_MANIFEST)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                tar.addfile(tarfile.TarInfo('../abc'), io.BytesIO(b''))
+            self.assertRaises(ValueError, restore, 'unsafe.tar', 'env')
+            self.assertFalse(os.path.exists('abc'))
+
+    def test_restore_symlink(self):
+        with TemporaryDirectory():
+            os.mkdir('outside')
+            data = json.dumps({'name': 'env', 'prefix': '/env', 'rewrite': ['lib/abc']}).encode('utf-8')
+            with tarfile.open('symlink.tar', 'w') as tar:
+                info = tarfile.TarInfo(SNAPSHOT_MANIFEST)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                info = tarfile.TarInfo('lib')
+                info.type = tarfile.SYMTYPE
+                info.linkname = os.path.join('..', 'outside')
+                tar.addfile(info)
+                info = tarfile.TarInfo('lib/abc')
+                info.size = 4
+                tar.addfile(info, io.BytesIO(b'/env'))
+            self.assertRaises(ValueError, restore, 'symlink.tar', 'env')
+            self.assertEqual(os.listdir('outside'), [])
+            # Removed so the restore can be retried
+            self.assertFalse(os.path.exists('env'))
+
+    def test_commands(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs'),
+                                                             VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')), Quiet():
+            make_environment(os.path.join('venvs', 'abc-3.6'))
+            self.assertEqual(snapshot_command(['abc.tgz', 'abc', '-p', '3.6']), 0)
+            self.assertEqual(restore_command(['abc.tgz', 'def-3.6']), 0)
+            self.assertTrue(os.path.exists(os.path.join('venvs', 'def-3.6', 'pyvenv.cfg')))
+            with open(os.path.join('venvs', '.venv_names')) as f:
+                self.assertIn('def', f.read().split())
+            self.assertEqual([e['path'] for e in read_environments()], [os.path.join(t.path, 'venvs', 'def-3.6')])
+            # Restored with the original name in another directory
+            self.assertEqual(restore_command(['abc.tgz', '-d', 'other']), 0)
+            self.assertTrue(os.path.exists(os.path.join('other', 'abc-3.6', 'pyvenv.cfg')))
+            self.assertEqual(restore_command(['abc.tgz', '-d', 'other']), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""test_virtualenv_helpers/stats.py
+***********************************
+Provides unit tests for virtualenv_helpers/stats.py
+"""
+
+import unittest
+import os
+import sys
+import subprocess
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+
+from virtualenv_helpers.stats import Stats
+from virtualenv_helpers.stats import collect
+from virtualenv_helpers.editors import Editor
+from virtualenv_helpers.find import find_local_env
+from virtualenv_helpers.find import find_virtualenv
+
+
+class _PythonEditor(Editor):
+    flags = ['-c', 'pass']
+
+    @property
+    def executable(self):
+        return sys.executable
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def test_collect_probes(self):
+        original_exists = os.path.exists
+        with TemporaryDirectory():
+            with collect() as stats:
+                find_local_env('2.7')
+                # Calls from outside the package are not counted
+                os.path.exists('abc')
+        self.assertIs(os.path.exists, original_exists)
+        self.assertEqual(stats.count('find.find_local_env', 'exists'), 2)
+        self.assertEqual(stats.probes('find.find_local_env'), 2)
+        self.assertEqual(stats.probes(), 2)
+        self.assertEqual(stats.subprocesses(), 0)
+
+    def test_collect_find_virtualenv_bounded(self):
+        with TemporaryDirectory(), TemporaryDirectory(change_directory=False) as virtualenv_dir:
+            with TemporaryEnvironment(VENV_DIR=virtualenv_dir.path, VENV_HELPERS_CACHE_DIR=os.path.join(virtualenv_dir.path, '.cache')):
+                os.makedirs(os.path.join('abc', 'def', 'ghi'))
+                os.chdir(os.path.join('abc', 'def', 'ghi'))
+                with collect() as stats:
+                    find_virtualenv('2.7', max_levels=3)
+        # Each strategy probes at most two paths per level checked
+        self.assertLessEqual(stats.probes(), 2*(1+2*3+2*3)+2)
+
+    def test_collect_subprocess(self):
+        with collect() as stats:
+            _PythonEditor().start(os.getcwd())
+            subprocess.call([sys.executable, '-c', 'pass'])
+        self.assertEqual(stats.subprocesses('editors.start'), 1)
+        self.assertEqual(stats.subprocesses(), 1)
+
+    def test_collect_nested(self):
+        with TemporaryDirectory():
+            with collect() as outer:
+                find_local_env('2.7')
+                with collect() as inner:
+                    find_local_env(None)
+        self.assertEqual(outer.probes(), 3)
+        self.assertEqual(inner.probes(), 1)
+
+    def test_summary(self):
+        stats = Stats()
+        stats.record('find.find_local_env', 'exists', 0.001)
+        stats.record('create.create', 'subprocess', 0.5)
+        summary = stats.summary()
+        self.assertIn('find.find_local_env', summary)
+        self.assertIn('1 filesystem probes, 1 subprocesses', summary)
+
+
+class StatsEnvironmentTestCase(unittest.TestCase):
+
+    def test_print_on_exit(self):
+        env = os.environ.copy()
+        env['VENV_HELPERS_STATS'] = '1'
+        source_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env['PYTHONPATH'] = os.pathsep.join([source_dir] + [u for u in [env.get('PYTHONPATH')] if u])
+        output = subprocess.check_output([sys.executable, '-c', 'from virtualenv_helpers.find import find_local_env; find_local_env(None)'],
+                                         env=env, stderr=subprocess.STDOUT)
+        output = output.decode()
+        self.assertIn('find.find_local_env', output)
+        self.assertIn('filesystem probes', output)
+
+
+if __name__ == "__main__":
+    unittest.main()
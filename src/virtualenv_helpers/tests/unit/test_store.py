@@ -0,0 +1,104 @@
+"""test_virtualenv_helpers/store.py
+***********************************
+Provides unit tests for virtualenv_helpers/store.py
+"""
+
+import unittest
+import os
+import sys
+import hashlib
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.store import get_store_dir
+from virtualenv_helpers.store import get_store_path
+from virtualenv_helpers.store import link_data
+from virtualenv_helpers.store import dedupe_file
+from virtualenv_helpers.store import dedupe
+from virtualenv_helpers.store import dedupe_command
+from virtualenv_helpers.wheels import install_wheel
+
+VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+def same_file(path1, path2):
+    stat1, stat2 = os.stat(path1), os.stat(path2)
+    return (stat1.st_dev, stat1.st_ino) == (stat2.st_dev, stat2.st_ino)
+
+
+class StoreTestCase(unittest.TestCase):
+
+    def test_get_store_dir(self):
+        with TemporaryEnvironment():
+            os.environ.pop('VENV_STORE_DIR', None)
+            self.assertIsNone(get_store_dir())
+            os.environ['VENV_STORE_DIR'] = 'store'
+            self.assertEqual(get_store_dir(), 'store')
+
+    def test_get_store_path(self):
+        self.assertEqual(get_store_path('store', 'abcdef'), os.path.join('store', 'ab', 'cdef'))
+        self.assertEqual(get_store_path('store', 'abcdef', True), os.path.join('store', 'ab', 'cdef.x'))
+
+    def test_link_data(self):
+        with TemporaryDirectory():
+            self.assertTrue(link_data('store', b'abc', 'a.py'))
+            self.assertTrue(link_data('store', b'abc', 'b.py'))
+            stored = get_store_path('store', hashlib.sha256(b'abc').hexdigest())
+            self.assertTrue(same_file('a.py', stored))
+            self.assertTrue(same_file('b.py', stored))
+            self.assertFalse(os.stat(stored).st_mode & 0o222)
+            # Replacing a linked file does not change the stored file
+            link_data('store', b'def', 'a.py')
+            with open(stored, 'rb') as f:
+                self.assertEqual(f.read(), b'abc')
+
+    def test_install_wheel_store(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_STORE_DIR=os.path.join(t.path, 'store')), Quiet():
+            wheel = make_wheel('.', 'abc', '1.0')
+            site_packages1 = make_virtualenv('env1')
+            site_packages2 = make_virtualenv('env2')
+            install_wheel(wheel, 'env1', VERSION)
+            install_wheel(wheel, 'env2', VERSION)
+            self.assertTrue(same_file(os.path.join(site_packages1, 'abc.py'), os.path.join(site_packages2, 'abc.py')))
+            # Upgrading one environment leaves the other unchanged
+            os.environ.pop('VENV_STORE_DIR')
+            install_wheel(make_wheel('.', 'abc', '1.1'), 'env1', VERSION)
+            with open(os.path.join(site_packages2, 'abc.py')) as f:
+                self.assertEqual(f.read(), "VALUE = '1.0'\n")
+
+    def test_dedupe_file(self):
+        with TemporaryDirectory():
+            for name in ('a.py', 'b.py', 'empty.py'):
+                with open(name, 'w') as f:
+                    f.write('abc' if name != 'empty.py' else '')
+            self.assertEqual(dedupe_file('store', 'a.py'), 0)
+            self.assertEqual(dedupe_file('store', 'b.py'), 3)
+            self.assertEqual(dedupe_file('store', 'b.py'), 0)
+            self.assertTrue(same_file('a.py', 'b.py'))
+            self.assertEqual(dedupe_file('store', 'empty.py'), 0)
+            self.assertEqual(os.listdir('store'), [hashlib.sha256(b'abc').hexdigest()[:2]])
+
+    def test_dedupe(self):
+        with TemporaryDirectory() as t, Quiet():
+            wheel = make_wheel('.', 'abc', '1.0', files={'abc.py': 'x' * 1000})
+            envs = [os.path.join(t.path, 'venvs', 'env{}'.format(i)) for i in range(3)]
+            for env in envs:
+                make_virtualenv(env, VERSION)
+                install_wheel(wheel, env, VERSION)
+            files, saved = dedupe(envs, 'store', workers=2)
+            self.assertEqual(files, 15)
+            self.assertGreaterEqual(saved, 2000)
+            if not sys.platform.startswith('win'):
+                self.assertTrue(same_file(os.path.join(envs[0], 'lib', 'python{}'.format(VERSION), 'site-packages', 'abc.py'),
+                                          os.path.join(envs[2], 'lib', 'python{}'.format(VERSION), 'site-packages', 'abc.py')))
+            with TemporaryEnvironment(VENV_DIR=os.path.join(t.path, 'venvs')):
+                dedupe_command(['-s', 'store'])
+            self.assertEqual(dedupe(envs, 'store'), (15, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""test_virtualenv_helpers/tracing.py
+*************************************
+Provides unit tests for virtualenv_helpers/tracing.py
+"""
+
+import unittest
+import os
+import json
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+
+from virtualenv_helpers.tracing import span
+from virtualenv_helpers.tracing import traced
+from virtualenv_helpers.tracing import start_trace
+from virtualenv_helpers.tracing import stop_trace
+from virtualenv_helpers.tracing import is_tracing
+from virtualenv_helpers.tracing import trace_to
+
+
+@traced
+def _traced_function(a, b=2):
+    return a+b
+
+
+class TracingTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        stop_trace()
+
+    def test_span_not_tracing(self):
+        self.assertFalse(is_tracing())
+        with span('abc', x=1):
+            pass
+        self.assertEqual(stop_trace(), [])
+
+    def test_span(self):
+        start_trace()
+        with span('outer', x=1, y=['a', object]):
+            with span('inner'):
+                pass
+        events = stop_trace()
+        self.assertEqual([u['name'] for u in events], ['inner', 'outer'])
+        outer = events[1]
+        self.assertEqual(outer['ph'], 'X')
+        self.assertEqual(outer['pid'], os.getpid())
+        self.assertGreaterEqual(outer['dur'], events[0]['dur'])
+        self.assertEqual(outer['args']['x'], 1)
+        self.assertEqual(outer['args']['y'][0], 'a')
+        self.assertIn('child_utime_s', outer['args'])
+        self.assertIn('child_stime_s', outer['args'])
+
+    def test_traced(self):
+        self.assertEqual(_traced_function(1), 3)
+        start_trace()
+        self.assertEqual(_traced_function(1, b=3), 4)
+        events = stop_trace()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['name'], '_traced_function')
+        self.assertEqual(events[0]['args']['a'], 1)
+        self.assertEqual(events[0]['args']['b'], 3)
+
+    def test_trace_to(self):
+        with TemporaryDirectory() as t:
+            trace_file = os.path.join(t.path, 'trace.json')
+            with trace_to(trace_file):
+                with span('abc'):
+                    pass
+            self.assertFalse(is_tracing())
+            with open(trace_file) as f:
+                trace = json.load(f)
+            self.assertEqual([u['name'] for u in trace['traceEvents']], ['abc'])
+
+    def test_trace_to_none(self):
+        with trace_to(None):
+            self.assertFalse(is_tracing())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""test_virtualenv_helpers/upgrade.py
+*************************************
+Provides unit tests for virtualenv_helpers/upgrade.py
+"""
+
+import unittest
+import os
+import sys
+import json
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.manifest import read_manifest
+from virtualenv_helpers.manifest import wheels_inputs
+from virtualenv_helpers.manifest import write_manifest
+from virtualenv_helpers.wheels import install_wheel
+from virtualenv_helpers.wheels import installed_distributions
+from virtualenv_helpers.upgrade import plan_upgrade
+from virtualenv_helpers.upgrade import upgrade_environments
+from virtualenv_helpers.upgrade import upgrade_command
+from virtualenv_helpers import upgrade
+
+VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+class UpgradeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.temp_dir.__enter__()
+        self.wheels_dir = os.path.join(self.temp_dir.path, 'wheels')
+        os.makedirs(self.wheels_dir)
+        os.makedirs('old')
+        self.environment = TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(self.temp_dir.path, 'cache'),
+                                                VENV_DEFAULT_WHEELS_DIR=self.wheels_dir,
+                                                VENV_DIR=os.path.join(self.temp_dir.path, 'venvs'))
+        self.environment.__enter__()
+
+    def tearDown(self):
+        self.environment.__exit__()
+        self.temp_dir.__exit__()
+
+    def make_environment(self, name, distributions):
+        path = os.path.join(self.temp_dir.path, 'venvs', name)
+        site_packages = make_virtualenv(path, VERSION)
+        for distribution, version in distributions:
+            install_wheel(make_wheel('old', distribution, version), path, VERSION)
+        return path, site_packages
+
+    def test_plan_upgrade(self):
+        path, site_packages = self.make_environment('project-{}'.format(VERSION), [('abc', '1.0'), ('def', '2.0')])
+        wheels = [make_wheel(self.wheels_dir, 'abc', '1.1'), make_wheel(self.wheels_dir, 'def', '2.0'),
+                  make_wheel(self.wheels_dir, 'ghi', '1.0')]
+        changes = plan_upgrade(path, wheels)
+        self.assertEqual([(u['name'], u['old'], u['new']) for u in changes], [('abc', '1.0', '1.1')])
+        # Environments created with the default wheels get the missing ones too
+        write_manifest(path, {'wheels': {}})
+        changes = plan_upgrade(path, wheels)
+        self.assertEqual([(u['name'], u['old'], u['new']) for u in changes], [('abc', '1.0', '1.1'), ('ghi', None, '1.0')])
+
+    def test_upgrade_environments(self):
+        behind, site_packages = self.make_environment('behind-{}'.format(VERSION), [('abc', '1.0')])
+        current = self.make_environment('current-{}'.format(VERSION), [('abc', '1.1')])[0]
+        other = self.make_environment('other-{}'.format(VERSION), [('xyz', '1.0')])[0]
+        write_manifest(behind, {'wheels': {}})
+        make_wheel(self.wheels_dir, 'abc', '1.1', files={'abc_new.py': ''})
+        make_wheel(self.wheels_dir, 'abc', '0.9')
+        results = upgrade_environments([behind, current, other], workers=2)
+        self.assertEqual([u['status'] for u in results], ['upgraded', 'current', 'current'])
+        self.assertEqual([(u['name'], u['old'], u['new'], u['ok']) for u in results[0]['changes']], [('abc', '1.0', '1.1', True)])
+        self.assertEqual(sorted(os.listdir(site_packages)), ['abc-1.1.dist-info', 'abc_new.py'])
+        self.assertEqual(read_manifest(behind)['wheels'], wheels_inputs(self.wheels_dir, VERSION))
+        self.assertEqual(installed_distributions(site_packages), {'abc': '1.1'})
+
+    def test_upgrade_current_runs_nothing(self):
+        path = self.make_environment('project-{}'.format(VERSION), [('abc', '1.1')])[0]
+        make_wheel(self.wheels_dir, 'abc', '1.1')
+        calls = []
+        pip_install = upgrade.pip_install
+        upgrade.pip_install = lambda *args: calls.append(args)
+        try:
+            results = upgrade_environments([path])
+        finally:
+            upgrade.pip_install = pip_install
+        self.assertEqual(results[0]['status'], 'current')
+        self.assertEqual(calls, [])
+
+    def test_upgrade_pip_fallback(self):
+        path, site_packages = self.make_environment('project-{}'.format(VERSION), [])
+        # Installed without a RECORD, so it is upgraded with pip
+        os.mkdir(os.path.join(site_packages, 'abc-1.0-py{}.egg-info'.format(VERSION)))
+        wheel = make_wheel(self.wheels_dir, 'abc', '1.1')
+        calls = []
+        pip_install = upgrade.pip_install
+        upgrade.pip_install = lambda *args: calls.append(args) or (1, 'pip failed')
+        try:
+            results = upgrade_environments([path])
+        finally:
+            upgrade.pip_install = pip_install
+        self.assertEqual(calls, [(path, [wheel], self.wheels_dir)])
+        self.assertEqual(results[0]['status'], 'failed')
+        self.assertEqual(results[0]['changes'][0]['output'], 'pip failed')
+
+    def test_upgrade_dry_run(self):
+        path, site_packages = self.make_environment('project-{}'.format(VERSION), [('abc', '1.0')])
+        make_wheel(self.wheels_dir, 'abc', '1.1')
+        results = upgrade_environments([path], dry_run=True)
+        self.assertEqual(results[0]['status'], 'behind')
+        self.assertEqual(installed_distributions(site_packages), {'abc': '1.0'})
+
+    def test_upgrade_command(self):
+        path, site_packages = self.make_environment('project-{}'.format(VERSION), [('abc', '1.0')])
+        make_wheel(self.wheels_dir, 'abc', '1.1')
+        with open('out', 'w') as f:
+            stdout, sys.stdout = sys.stdout, f
+            try:
+                self.assertEqual(upgrade_command(['--json', '-n']), 0)
+            finally:
+                sys.stdout = stdout
+        with open('out') as f:
+            self.assertEqual([u['status'] for u in json.load(f)], ['behind'])
+        with Quiet():
+            self.assertEqual(upgrade_command([]), 0)
+        self.assertEqual(installed_distributions(site_packages), {'abc': '1.1'})
+        with TemporaryEnvironment(VENV_DEFAULT_WHEELS_DIR=os.path.join(self.temp_dir.path, 'missing')), Quiet():
+            self.assertEqual(upgrade_command([]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+"""test_virtualenv_helpers/wheels.py
+************************************
+Provides unit tests for virtualenv_helpers/wheels.py
+"""
+
+import unittest
+import os
+import sys
+import csv
+
+from virtualenv_helpers.tests.contexts import TemporaryDirectory
+from virtualenv_helpers.tests.contexts import Quiet
+from virtualenv_helpers.tests.contexts import TemporaryEnvironment
+from virtualenv_helpers.tests.builders import make_wheel
+from virtualenv_helpers.tests.builders import make_virtualenv
+
+from virtualenv_helpers.wheels import UnsupportedWheel
+from virtualenv_helpers.wheels import canonical_name
+from virtualenv_helpers.wheels import parse_wheel_filename
+from virtualenv_helpers.wheels import is_compatible_wheel
+from virtualenv_helpers.wheels import get_site_packages
+from virtualenv_helpers.wheels import record_hash
+from virtualenv_helpers.wheels import install_wheel
+from virtualenv_helpers.wheels import install_wheels
+from virtualenv_helpers.wheels import uninstall_distribution
+from virtualenv_helpers.wheels import parse_installer_filename
+from virtualenv_helpers.wheels import installed_distributions
+from virtualenv_helpers.wheels import needs_install
+from virtualenv_helpers.wheels import parse_version
+from virtualenv_helpers.wheels import read_requires
+from virtualenv_helpers.wheels import get_wheel_requires
+from virtualenv_helpers.wheels import requirement_name
+from virtualenv_helpers.wheels import marker_applies
+from virtualenv_helpers.wheels import newest_wheels
+from virtualenv_helpers.wheels import dependency_levels
+
+VERSION = '{}.{}'.format(sys.version_info.major, sys.version_info.minor)
+
+
+class WheelsTestCase(unittest.TestCase):
+
+    def test_canonical_name(self):
+        self.assertEqual(canonical_name('Foo_Bar.baz'), 'foo-bar-baz')
+
+    def test_parse_wheel_filename(self):
+        self.assertEqual(parse_wheel_filename('/a/numpy-1.12.1-cp36-cp36m-win_amd64.whl'),
+                         ('numpy', '1.12.1', 'cp36-cp36m-win_amd64'))
+        self.assertEqual(parse_wheel_filename('abc-1.0-1-py3-none-any.whl'), ('abc', '1.0', 'py3-none-any'))
+        with self.assertRaises(UnsupportedWheel):
+            parse_wheel_filename('abc-1.0.whl')
+
+    def test_is_compatible_wheel(self):
+        self.assertTrue(is_compatible_wheel('numpy-1.12.1-cp36-cp36m-win_amd64.whl', '3.6'))
+        self.assertFalse(is_compatible_wheel('numpy-1.12.1-cp36-cp36m-win_amd64.whl', '2.7'))
+        self.assertTrue(is_compatible_wheel('abc-1.0-py2.py3-none-any.whl', '2.7'))
+        self.assertTrue(is_compatible_wheel('abc-1.0-py2.py3-none-any.whl', '3.6'))
+        self.assertFalse(is_compatible_wheel('abc-1.0-py2-none-any.whl', '3.6'))
+
+    def test_get_site_packages(self):
+        if sys.platform.startswith('win'):
+            self.assertEqual(get_site_packages('env', '3.6'), os.path.join('env', 'Lib', 'site-packages'))
+        else:
+            self.assertEqual(get_site_packages('env', '3.6'), os.path.join('env', 'lib', 'python3.6', 'site-packages'))
+
+    def test_record_hash(self):
+        self.assertEqual(record_hash(b''), 'sha256=47DEQpj8HBSa-_TImW-5JCeuQeRkm5NMpJWZG3hSuFU')
+
+    def test_install_wheel(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_virtualenv(os.path.join(t.path, 'env'))
+            wheel = make_wheel(t.path, 'abc', '1.0',
+                               files={'abc/__init__.py': 'def main():\n    return 0\n',
+                                      'abc-1.0.data/scripts/abc-tool': '#!python\nprint(1)\n'},
+                               entry_points='[console_scripts]\nabc = abc:main\n')
+            dist_info = install_wheel(wheel, os.path.join(t.path, 'env'), VERSION)
+            self.assertEqual(dist_info, os.path.join(site_packages, 'abc-1.0.dist-info'))
+            self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc', '__init__.py')))
+            with open(os.path.join(dist_info, 'INSTALLER')) as f:
+                self.assertEqual(f.read(), 'virtualenv_helpers\n')
+            with open(os.path.join(dist_info, 'RECORD')) as f:
+                records = dict((u[0], u[1:]) for u in csv.reader(f))
+            self.assertEqual(records['abc/__init__.py'][0], record_hash(b'def main():\n    return 0\n'))
+            self.assertEqual(records['abc-1.0.dist-info/RECORD'], ['', ''])
+            if not sys.platform.startswith('win'):
+                python = os.path.join(t.path, 'env', 'bin', 'python')
+                with open(os.path.join(t.path, 'env', 'bin', 'abc-tool')) as f:
+                    self.assertEqual(f.readline().strip(), '#!{}'.format(python))
+                with open(os.path.join(t.path, 'env', 'bin', 'abc')) as f:
+                    script = f.read()
+                self.assertTrue(script.startswith('#!{}\n'.format(python)))
+                self.assertIn('from abc import main', script)
+                self.assertTrue(os.access(os.path.join(t.path, 'env', 'bin', 'abc'), os.X_OK))
+                self.assertIn('../../../bin/abc', records)
+
+    def test_install_wheel_unsafe_path(self):
+        with TemporaryDirectory() as t:
+            site_packages = make_virtualenv(os.path.join(t.path, 'env'))
+            wheel = make_wheel(t.path, 'abc', '1.0', files={'../abc.py': ''})
+            with self.assertRaises(UnsupportedWheel):
+                install_wheel(wheel, os.path.join(t.path, 'env'), VERSION)
+            # Nothing is written if a later member is unsafe
+            wheel = make_wheel(t.path, 'def', '1.0', files={'def.py': '', 'zzz/../def.py': ''})
+            with self.assertRaises(UnsupportedWheel):
+                install_wheel(wheel, os.path.join(t.path, 'env'), VERSION)
+            self.assertEqual(os.listdir(site_packages), [])
+
+    def test_install_wheels(self):
+        with TemporaryDirectory() as t, Quiet():
+            site_packages = make_virtualenv(os.path.join(t.path, 'env'))
+            wheels = [make_wheel(t.path, 'abc{}'.format(i), '1.0', files={'abc{}/__init__.py'.format(i): ''}) for i in range(8)]
+            wheels.insert(3, make_wheel(t.path, 'unsafe', '1.0', files={'/unsafe.py': ''}))
+            unsupported = install_wheels(wheels, os.path.join(t.path, 'env'), VERSION, workers=4)
+            self.assertEqual(unsupported, [wheels[3]])
+            for i in range(8):
+                self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc{}'.format(i), '__init__.py')))
+                self.assertTrue(os.path.exists(os.path.join(site_packages, 'abc{}-1.0.dist-info'.format(i), 'RECORD')))
+
+    def test_uninstall_distribution(self):
+        with TemporaryDirectory() as t:
+            env = os.path.join(t.path, 'env')
+            site_packages = make_virtualenv(env)
+            wheel = make_wheel(t.path, 'abc', '1.0', files={'abc/__init__.py': '', 'abc/sub/x.py': ''},
+                               entry_points='[console_scripts]\nabc = abc:main\n')
+            install_wheel(wheel, env, VERSION)
+            os.makedirs(os.path.join(site_packages, 'abc', '__pycache__'))
+            with open(os.path.join(site_packages, 'abc', '__pycache__', '__init__.cpython-36.pyc'), 'w') as f:
+                f.write('')
+            self.assertTrue(uninstall_distribution('ABC', env, VERSION))
+            self.assertEqual(os.listdir(site_packages), [])
+            self.assertFalse(os.path.exists(os.path.join(env, 'Scripts' if sys.platform.startswith('win') else 'bin', 'abc')))
+            os.mkdir(os.path.join(site_packages, 'egg-1.0.egg-info'))
+            self.assertFalse(uninstall_distribution('egg', env, VERSION))
+            self.assertFalse(uninstall_distribution('missing', env, VERSION))
+
+    def test_install_wheels_none(self):
+        self.assertEqual(install_wheels([], 'env', VERSION), [])
+
+    def test_parse_installer_filename(self):
+        self.assertEqual(parse_installer_filename('numpy-1.12.1+mkl-cp36-cp36m-win_amd64.whl'), ('numpy', '1.12.1+mkl'))
+        self.assertEqual(parse_installer_filename('pywin32-221.win-amd64-py3.6.exe'), ('pywin32', '221'))
+        self.assertIsNone(parse_installer_filename('abc.exe'))
+        self.assertIsNone(parse_installer_filename('abc.whl'))
+
+    def test_installed_distributions(self):
+        with TemporaryDirectory() as t:
+            os.mkdir('Foo_Bar-1.0.dist-info')
+            os.mkdir('baz-2.0-py3.6.egg-info')
+            os.mkdir('foo_bar')
+            self.assertEqual(installed_distributions(t.path), {'foo-bar': '1.0', 'baz': '2.0'})
+            self.assertEqual(installed_distributions(os.path.join(t.path, 'missing')), {})
+
+    def test_needs_install(self):
+        installed = {'foo-bar': '1.0', 'baz': '2.0'}
+        self.assertFalse(needs_install('Foo_Bar-1.0-py3-none-any.whl', installed))
+        self.assertTrue(needs_install('foo_bar-1.10-py3-none-any.whl', installed))
+        self.assertFalse(needs_install('baz-1.9-py3-none-any.whl', installed))
+        self.assertTrue(needs_install('other-1.0-py3-none-any.whl', installed))
+        self.assertTrue(needs_install('other.exe', installed))
+
+    def test_parse_version(self):
+        self.assertLess(parse_version('1.9'), parse_version('1.10'))
+        self.assertLess(parse_version('1.0rc1'), parse_version('1.0'))
+        self.assertLess(parse_version('not a version'), parse_version('0.1'))
+
+    def test_read_requires(self):
+        with TemporaryDirectory():
+            wheel = make_wheel('.', 'abc', '1.0', requires=['six', 'enum34; python_version < "3.4"'])
+            self.assertEqual(read_requires(wheel), ['six', 'enum34; python_version < "3.4"'])
+
+    def test_get_wheel_requires_cached(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            wheel = make_wheel('.', 'abc', '1.0', requires=['six'])
+            self.assertEqual(get_wheel_requires([wheel]), {wheel: ['six']})
+            self.assertTrue(os.path.exists(os.path.join('cache', 'wheel_requires.json')))
+            # The cached requirements are used while the wheel is unchanged
+            stat = os.stat(wheel)
+            make_wheel('.', 'abc', '1.0', requires=['other'])
+            os.utime(wheel, (stat.st_atime, stat.st_mtime))
+            if os.stat(wheel).st_size == stat.st_size:
+                self.assertEqual(get_wheel_requires([wheel]), {wheel: ['six']})
+            os.utime(wheel, (stat.st_atime, stat.st_mtime + 10))
+            self.assertEqual(get_wheel_requires([wheel]), {wheel: ['other']})
+
+    def test_requirement_name(self):
+        self.assertEqual(requirement_name('requests>=2.0; python_version < "3"'), 'requests')
+        self.assertEqual(requirement_name('zope.interface (>=4.0)'), 'zope.interface')
+        self.assertIsNone(requirement_name('>=1.0'))
+
+    def test_marker_applies(self):
+        self.assertTrue(marker_applies('python_version < "3"', '2.7'))
+        self.assertFalse(marker_applies('python_version < "3"', '3.6'))
+        self.assertFalse(marker_applies('extra == "test"', '3.6'))
+
+    def test_newest_wheels(self):
+        wheels = ['abc-1.10-py3-none-any.whl', 'abc-1.9-py3-none-any.whl', 'xyz-1.0-py3-none-any.whl']
+        self.assertEqual(newest_wheels(wheels), ['abc-1.10-py3-none-any.whl', 'xyz-1.0-py3-none-any.whl'])
+
+    def test_dependency_levels(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            app = make_wheel('.', 'app', '1.0', requires=['Lib_A>=1.0', 'lib-b', 'missing'])
+            lib_a = make_wheel('.', 'lib_a', '1.0', requires=['base'])
+            lib_b = make_wheel('.', 'lib_b', '1.0', requires=['base', 'py2only; python_version < "3"'])
+            base = make_wheel('.', 'base', '1.0')
+            py2only = make_wheel('.', 'py2only', '1.0', requires=['app'])
+            self.assertEqual(dependency_levels([app, lib_a, lib_b, base, py2only], '3.6'),
+                             [[base], [lib_a, lib_b], [app], [py2only]])
+
+    def test_dependency_levels_cycle(self):
+        with TemporaryDirectory() as t, TemporaryEnvironment(VENV_HELPERS_CACHE_DIR=os.path.join(t.path, 'cache')):
+            a = make_wheel('.', 'a', '1.0', requires=['b'])
+            b = make_wheel('.', 'b', '1.0', requires=['a'])
+            c = make_wheel('.', 'c', '1.0')
+            self.assertEqual(dependency_levels([a, b, c], '3.6'), [[c], [a, b]])
+
+
+if __name__ == "__main__":
+    unittest.main()
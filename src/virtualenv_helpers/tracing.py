@@ -0,0 +1,140 @@
+"""
+tracing.py
+**********
+Record spans for the phases of creating and activating virtual environments
+and write them as Chrome trace-event JSON, which can be loaded in
+chrome://tracing or https://ui.perfetto.dev
+
+Spans are only recorded while a trace is active (e.g. using the --trace
+option), otherwise span and traced have no effect.
+"""
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+_events = None
+_lock = threading.Lock()
+
+
+def start_trace():
+    """Start recording spans"""
+    global _events
+    _events = []
+
+
+def stop_trace():
+    """Stop recording spans and return the recorded trace events"""
+    global _events
+    events, _events = _events, None
+    return events or []
+
+
+def is_tracing():
+    """Check if spans are being recorded"""
+    return _events is not None
+
+
+def _child_rusage():
+    """Get the user and system time used by terminated child processes"""
+    if resource is None:
+        return 0.0, 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime, usage.ru_stime
+
+
+def _jsonable(value):
+    """Convert a span argument to something that can be written as JSON"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(u) for u in value]
+    return repr(value)
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """
+    Record a span covering the with block, including the wall time and the
+    user/system time used by child processes that finished during it
+
+    Args:
+        name: name of the span
+
+    Keyword Args:
+        Any additional keyword arguments are recorded as the span arguments
+    """
+    if _events is None:
+        yield
+        return
+    child_utime, child_stime = _child_rusage()
+    start = time.time()
+    try:
+        yield
+    finally:
+        end = time.time()
+        end_child_utime, end_child_stime = _child_rusage()
+        event_args = dict((key, _jsonable(value)) for key, value in args.items())
+        event_args['child_utime_s'] = end_child_utime - child_utime
+        event_args['child_stime_s'] = end_child_stime - child_stime
+        event = {'name': name, 'cat': 'virtualenv_helpers', 'ph': 'X',
+                 'ts': start*1e6, 'dur': (end-start)*1e6,
+                 'pid': os.getpid(), 'tid': threading.current_thread().ident,
+                 'args': event_args}
+        with _lock:
+            if _events is not None:
+                _events.append(event)
+
+
+def traced(function):
+    """Decorator to record a span for each call of a function, with the call arguments"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _events is None:
+            return function(*args, **kwargs)
+        try:
+            call_args = inspect.getcallargs(function, *args, **kwargs)
+        except TypeError:
+            call_args = {}
+        with span(function.__name__, **call_args):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def write_trace(path, events):
+    """
+    Write trace events to a Chrome trace-event JSON file
+
+    Args:
+        path: path of the file to write
+        events: list of trace events
+    """
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+@contextlib.contextmanager
+def trace_to(path):
+    """
+    Record spans during the with block and write them to a file
+
+    Args:
+        path: path of the trace file to write, if None, spans are not recorded
+    """
+    if path is None:
+        yield
+        return
+    start_trace()
+    try:
+        yield
+    finally:
+        write_trace(path, stop_trace())
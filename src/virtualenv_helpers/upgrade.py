@@ -0,0 +1,246 @@
+"""
+upgrade.py
+**********
+Upgrade the default wheels (~/virtualenv_default_wheels or
+VENV_DEFAULT_WHEELS_DIR) in existing virtual environments, e.g. after a newer
+numpy wheel has been added to the directory.
+
+The environments that are behind are found without running anything: the
+newest compatible wheel of each distribution is compared with the versions
+in the .dist-info (and .egg-info) directory names of each environment's
+site-packages, which is a single listdir per environment. Only the installed
+distributions that are older are upgraded, and for environments created with
+the default wheels (recorded in their manifest) the missing ones are
+installed too.
+
+The environments that are behind are upgraded concurrently using a thread
+pool: the old distribution is removed using its RECORD and the new wheel is
+unpacked (see wheels.py), pip is only run for wheels that cannot be unpacked
+or distributions without a RECORD. Exe installers are not upgraded.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from . import __version__
+from .create import get_default_wheels
+from .create import get_default_wheels_dir
+from .health import get_environment_paths
+from .health import get_environment_version
+from .manifest import read_manifest
+from .manifest import wheels_inputs
+from .manifest import write_manifest
+from .wheels import canonical_name
+from .wheels import dependency_levels
+from .wheels import get_site_packages
+from .wheels import install_wheels
+from .wheels import installed_distributions
+from .wheels import needs_install
+from .wheels import parse_wheel_filename
+from .wheels import uninstall_distribution
+
+is_windows = sys.platform.startswith('win')
+
+if is_windows:
+    PIP = os.path.join('Scripts', 'pip.exe')
+else:
+    PIP = os.path.join('bin', 'pip')
+
+
+def plan_upgrade(version_virtualenv_dir, wheels, installed=None):
+    """
+    Work out which default wheels a virtual environment is behind on
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        wheels: the newest default wheels for the environment's python version
+
+    Keyword Args:
+        installed: dictionary of canonical distribution name to installed
+                   version (read from site-packages if None)
+
+    Returns a list of dictionaries of the distribution name, installed
+    version (None if missing), new version and wheel path
+    """
+    if installed is None:
+        installed = installed_distributions(get_site_packages(version_virtualenv_dir, get_environment_version(version_virtualenv_dir)))
+    changes = []
+    uses_default_wheels = None
+    for wheel in wheels:
+        name, version = parse_wheel_filename(wheel)[:2]
+        installed_version = installed.get(canonical_name(name), None)
+        if installed_version is None:
+            if uses_default_wheels is None:
+                uses_default_wheels = 'wheels' in read_manifest(version_virtualenv_dir)
+            if not uses_default_wheels:
+                continue
+        if needs_install(wheel, installed):
+            changes.append({'name': name, 'old': installed_version, 'new': version, 'wheel': wheel})
+    return changes
+
+
+def pip_install(version_virtualenv_dir, wheel_paths, wheels_dir):
+    """
+    Install wheels into a virtual environment with pip (upgrading the
+    installed versions)
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        wheel_paths: list of paths to the wheels
+        wheels_dir: the default wheels directory
+
+    Returns a tuple of the exit code and the output
+    """
+    argv = [os.path.join(version_virtualenv_dir, PIP), 'install'] + list(wheel_paths)
+    argv += ['--no-deps', '--no-index', '--find-links='+wheels_dir, '--prefix='+version_virtualenv_dir, '-U']
+    try:
+        process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except OSError as e:
+        return 1, str(e)
+    output = process.communicate()[0]
+    return process.returncode, output.decode('utf-8', 'replace')
+
+
+def upgrade_environment(version_virtualenv_dir, version, changes, wheels_dir):
+    """
+    Upgrade the default wheels in a virtual environment, level by level of the
+    Requires-Dist dependencies between the wheels
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+        changes: the changes from plan_upgrade
+        wheels_dir: the default wheels directory
+
+    Returns the list of changes with ok set for each, and the pip output for
+    the changes that failed
+    """
+    by_wheel = dict((u['wheel'], u) for u in changes)
+    pip_wheels = []
+    for level in dependency_levels(list(by_wheel), version):
+        unpack = []
+        for wheel in level:
+            change = by_wheel[wheel]
+            if change['old'] is None or uninstall_distribution(change['name'], version_virtualenv_dir, version):
+                unpack.append(wheel)
+            else:
+                pip_wheels.append(wheel)
+        # The environments are upgraded concurrently, so unpack one wheel at a time
+        pip_wheels += install_wheels(unpack, version_virtualenv_dir, version, workers=1)
+    output = ''
+    if pip_wheels:
+        output = pip_install(version_virtualenv_dir, pip_wheels, wheels_dir)[1]
+    installed = installed_distributions(get_site_packages(version_virtualenv_dir, version))
+    for change in changes:
+        change['ok'] = not needs_install(change['wheel'], installed)
+        if not change['ok'] and output:
+            change['output'] = output
+    if all(u['ok'] for u in changes):
+        manifest = read_manifest(version_virtualenv_dir)
+        if 'wheels' in manifest:
+            # So create does not reinstall the default wheels
+            manifest['wheels'] = wheels_inputs(wheels_dir, version)
+            write_manifest(version_virtualenv_dir, manifest)
+    return changes
+
+
+def upgrade_environments(version_virtualenv_dirs, wheels_dir=None, dry_run=False, workers=None):
+    """
+    Upgrade the default wheels in the virtual environments that are behind,
+    using a thread pool, skipping the environments that are current
+
+    Args:
+        version_virtualenv_dirs: list of virtual environment directories
+
+    Keyword Args:
+        wheels_dir: the default wheels directory (defaults to get_default_wheels_dir())
+        dry_run: only work out the changes
+        workers: number of environments to upgrade at once (defaults to the CPU count)
+
+    Returns a list of dictionaries of the path, python version, status
+    (current, behind, upgraded or failed) and changes of each environment
+    """
+    wheels_dir = wheels_dir or get_default_wheels_dir()
+    default_wheels = {}
+    results = []
+    for path in version_virtualenv_dirs:
+        path = os.path.abspath(path)
+        version = get_environment_version(path)
+        if version is None:
+            continue
+        if version not in default_wheels:
+            default_wheels[version] = get_default_wheels(version, wheels_dir)
+        changes = plan_upgrade(path, default_wheels[version], installed_distributions(get_site_packages(path, version)))
+        results.append({'path': path, 'version': version, 'status': 'behind' if changes else 'current', 'changes': changes})
+    behind = [u for u in results if u['status'] == 'behind']
+    if dry_run or not behind:
+        return results
+
+    def upgrade(result):
+        try:
+            upgrade_environment(result['path'], result['version'], result['changes'], wheels_dir)
+        except (IOError, OSError) as e:
+            result['error'] = str(e)
+        ok = 'error' not in result and all(u.get('ok', False) for u in result['changes'])
+        result['status'] = 'upgraded' if ok else 'failed'
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(behind)))
+    try:
+        pool.map(upgrade, behind)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def create_parser():
+    """Create the command line parser"""
+    parser = argparse.ArgumentParser(description='Upgrade the default wheels (~/virtualenv_default_wheels or VENV_DEFAULT_WHEELS_DIR) in the virtual environments that are behind')
+    parser.add_argument(dest='paths', metavar='Path', type=str, nargs='*', help='Virtual environments to upgrade (default all the environments in VENV_DIR and the registry)')
+    parser.add_argument('-d', '--directory', dest='virtualenv_dir', help="Directory of the virtual environments to upgrade (default VENV_DIR)", default=None)
+    parser.add_argument('-n', '--dry-run', dest='dry_run', action="store_true", help="Show the environments that are behind without upgrading them", default=False)
+    parser.add_argument('--json', dest='json', action="store_true", help="Print a JSON report", default=False)
+    parser.add_argument('-j', '--jobs', dest='workers', type=int, help="Number of environments to upgrade at once (default the CPU count)", default=None)
+    parser.add_argument('-V', '--version', action="version", version="%(prog)s {}".format(__version__))
+    return parser
+
+
+def upgrade_command(args=None):
+    """
+    Upgrade the default wheels in virtual environments
+
+    Keyword Arguments:
+        args: list/tuple of arguments, if None, then the command line
+              arguments (sys.argv) are used
+
+    Returns 0 if every environment is current or upgraded, 1 otherwise
+    """
+    options = create_parser().parse_args(args)
+    wheels_dir = get_default_wheels_dir()
+    if not os.path.isdir(wheels_dir):
+        print('Default wheels directory {} not found'.format(wheels_dir))
+        return 1
+    paths = options.paths or get_environment_paths(options.virtualenv_dir)
+    results = upgrade_environments(paths, wheels_dir, options.dry_run, options.workers)
+    if options.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        for result in results:
+            if result['status'] == 'current':
+                continue
+            print('{}: {}'.format(result['path'], result['status']))
+            for change in result['changes']:
+                status = '' if change.get('ok', True) else ' (failed)'
+                print('    {} {} -> {}{}'.format(change['name'], change['old'] or '(not installed)', change['new'], status))
+            if 'error' in result:
+                print('    {}'.format(result['error']))
+        counts = dict((status, len([u for u in results if u['status'] == status])) for status in ('current', 'behind', 'upgraded', 'failed'))
+        print('{upgraded} upgraded, {behind} behind, {failed} failed, {current} current'.format(**counts))
+    return 1 if any(u['status'] == 'failed' for u in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(upgrade_command(sys.argv[1:]))
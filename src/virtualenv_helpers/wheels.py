@@ -0,0 +1,649 @@
+"""
+wheels.py
+*********
+Install wheels from a trusted local directory straight into a virtual
+environment by unpacking them, without running pip.
+
+Only what is needed for local wheels is supported: the files are unpacked into
+site-packages (or the scheme folders for .data directories), console and gui
+script launchers are generated from entry_points.txt, and INSTALLER and RECORD
+are written so pip can uninstall or upgrade the distribution later.
+
+When the content-addressed store is enabled (VENV_STORE_DIR), the unpacked
+files are hardlinked from the store instead of written (see store.py).
+"""
+import io
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import base64
+import struct
+import hashlib
+import shutil
+import zipfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    from configparser import RawConfigParser
+except ImportError:
+    from ConfigParser import RawConfigParser
+
+from .cache import get_cache_dir
+from .store import get_store_dir
+from .store import link_data
+
+is_windows = sys.platform.startswith('win')
+INSTALLER = 'virtualenv_helpers'
+REQUIRES_CACHE = 'wheel_requires.json'
+_requirement_name = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+
+if is_windows:
+    SCRIPT_DIR = 'Scripts'
+    PYTHON = 'python.exe'
+else:
+    SCRIPT_DIR = 'bin'
+    PYTHON = 'python'
+
+SCRIPT_TEMPLATE = """# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({function}())
+"""
+
+
+class UnsupportedWheel(Exception):
+    """Raised when a wheel cannot be installed by unpacking it"""
+
+
+def canonical_name(name):
+    """
+    Normalise a distribution name for comparison (PEP 503)
+
+    Args:
+        name: distribution name
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def parse_wheel_filename(wheel_path):
+    """
+    Get the distribution name, version and tags from a wheel filename
+
+    Args:
+        wheel_path: path to the wheel
+    """
+    parts = os.path.split(wheel_path)[-1][:-len('.whl')].split('-')
+    if len(parts) not in (5, 6):
+        raise UnsupportedWheel('Invalid wheel filename {}'.format(wheel_path))
+    return parts[0], parts[1], '-'.join(parts[-3:])
+
+
+def is_compatible_wheel(wheel_path, version):
+    """
+    Check if a wheel (or exe installer) filename targets a python version
+
+    Args:
+        wheel_path: path to the wheel
+        version: python version string
+    """
+    filename = os.path.split(wheel_path)[-1]
+    cpy_version = '-cp{}'.format(version.replace('.', ''))
+    py_version = '-py{}'.format(version.split('.')[0])
+    py_version2 = '.py{}-'.format(version.split('.')[0])
+    return cpy_version in filename or py_version in filename or py_version2 in filename
+
+
+def parse_installer_filename(installer_path):
+    """
+    Get the distribution name and version from a wheel or exe installer
+    filename (e.g. numpy-1.12.1+mkl-cp36-cp36m-win_amd64.whl or
+    pywin32-221.win-amd64-py3.6.exe), returning None if it cannot be parsed
+
+    Args:
+        installer_path: path to the wheel or exe installer
+    """
+    filename = os.path.split(installer_path)[-1]
+    if filename.endswith('.whl'):
+        try:
+            return parse_wheel_filename(filename)[:2]
+        except UnsupportedWheel:
+            return None
+    match = re.match(r'^(?P<name>[^-]+)-(?P<version>[^-]+?)\.win', filename)
+    if match is None:
+        return None
+    return match.group('name'), match.group('version')
+
+
+def installed_distributions(site_packages):
+    """
+    Scan a site-packages directory once for the installed distributions,
+    using the .dist-info and .egg-info directory names
+
+    Args:
+        site_packages: the virtual environment site-packages directory
+
+    Returns a dictionary of canonical distribution name to version
+    """
+    installed = {}
+    try:
+        entries = os.listdir(site_packages)
+    except OSError:
+        return installed
+    for entry in entries:
+        if entry.endswith('.dist-info'):
+            parts = entry[:-len('.dist-info')].split('-')
+        elif entry.endswith('.egg-info'):
+            parts = entry[:-len('.egg-info')].split('-')
+        else:
+            continue
+        if len(parts) >= 2:
+            installed[canonical_name(parts[0])] = parts[1]
+    return installed
+
+
+def parse_version(version):
+    """
+    Parse a version string into a key for comparing versions, invalid
+    (non PEP 440) versions sort before the valid ones
+
+    Args:
+        version: the version string
+    """
+    try:
+        from packaging.version import InvalidVersion, Version
+    except ImportError:
+        from pkg_resources.extern.packaging.version import InvalidVersion, Version
+    try:
+        return (1, Version(version))
+    except InvalidVersion:
+        return (0, version)
+
+
+def needs_install(installer_path, installed):
+    """
+    Check if a wheel (or exe installer) is missing from, or newer than the
+    version in, the installed distributions
+
+    Args:
+        installer_path: path to the wheel or exe installer
+        installed: dictionary of canonical distribution name to version
+    """
+    parsed = parse_installer_filename(installer_path)
+    if parsed is None:
+        return True
+    name, version = parsed
+    installed_version = installed.get(canonical_name(name), None)
+    if installed_version is None:
+        return True
+    if installed_version == version:
+        return False
+    return parse_version(version) > parse_version(installed_version)
+
+
+def get_site_packages(version_virtualenv_dir, version):
+    """
+    Get the site-packages directory of a virtual environment
+
+    Args:
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+    """
+    if is_windows:
+        return os.path.join(version_virtualenv_dir, 'Lib', 'site-packages')
+    return os.path.join(version_virtualenv_dir, 'lib', 'python{}'.format(version), 'site-packages')
+
+
+def record_hash(data):
+    """
+    Get the RECORD hash of file contents
+
+    Args:
+        data: file contents (bytes)
+    """
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=')
+    return 'sha256={}'.format(digest.decode('ascii'))
+
+
+def _find_dist_info(names):
+    """Find the .dist-info directory in a wheel's file list"""
+    dist_infos = set(u.split('/')[0] for u in names if u.split('/')[0].endswith('.dist-info') and u.count('/') == 1)
+    if len(dist_infos) != 1:
+        raise UnsupportedWheel('Expected one .dist-info directory, found {}'.format(len(dist_infos)))
+    return dist_infos.pop()
+
+
+def read_entry_points(wheel, dist_info):
+    """
+    Read the console and gui scripts from a wheel's entry_points.txt
+
+    Args:
+        wheel: open zipfile.ZipFile of the wheel
+        dist_info: name of the .dist-info directory
+
+    Returns a list of (name, entry point, gui) tuples
+    """
+    try:
+        content = wheel.read('{}/entry_points.txt'.format(dist_info)).decode('utf-8')
+    except KeyError:
+        return []
+    parser = RawConfigParser()
+    parser.optionxform = str
+    if hasattr(parser, 'read_string'):
+        parser.read_string(content)
+    else:
+        parser.readfp(io.StringIO(content))
+    scripts = []
+    for section, gui in [('console_scripts', False), ('gui_scripts', True)]:
+        if parser.has_section(section):
+            scripts += [(name, value, gui) for name, value in parser.items(section)]
+    return scripts
+
+
+def read_requires(wheel_path):
+    """
+    Read the Requires-Dist requirements from a wheel's METADATA
+
+    Args:
+        wheel_path: path to the wheel
+    """
+    with zipfile.ZipFile(wheel_path) as wheel:
+        dist_info = _find_dist_info(wheel.namelist())
+        content = wheel.read('{}/METADATA'.format(dist_info)).decode('utf-8')
+    requires = []
+    for line in content.splitlines():
+        if not line.strip():
+            # The headers end at the first blank line
+            break
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'requires-dist':
+            requires.append(value.strip())
+    return requires
+
+
+def _wheel_key(wheel_path):
+    """Get the cache key of a wheel from its name, size and mtime"""
+    stat = os.stat(wheel_path)
+    key = '{}\0{}\0{}'.format(os.path.split(wheel_path)[-1], stat.st_size, stat.st_mtime)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def get_wheel_requires(wheel_paths):
+    """
+    Get the Requires-Dist requirements of several wheels, reading each wheel's
+    METADATA once and caching the requirements by the wheel's hash
+
+    Args:
+        wheel_paths: list of paths to the wheels
+
+    Returns a dictionary of wheel path to list of requirement strings
+    """
+    cache_path = os.path.join(get_cache_dir(), REQUIRES_CACHE)
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        cache = {}
+    requires = {}
+    updated = False
+    for wheel_path in wheel_paths:
+        key = _wheel_key(wheel_path)
+        if key not in cache:
+            try:
+                cache[key] = read_requires(wheel_path)
+            except (UnsupportedWheel, zipfile.BadZipfile, KeyError):
+                cache[key] = []
+            updated = True
+        requires[wheel_path] = cache[key]
+    if updated:
+        try:
+            temp_path = '{}.{}'.format(cache_path, os.getpid())
+            with open(temp_path, 'w') as f:
+                json.dump(cache, f)
+            getattr(os, 'replace', os.rename)(temp_path, cache_path)
+        except (IOError, OSError):
+            pass
+    return requires
+
+
+def requirement_name(requirement):
+    """
+    Get the distribution name of a requirement string, or None if it cannot
+    be parsed
+
+    Args:
+        requirement: requirement string (e.g. requests>=2.0; python_version < "3")
+    """
+    match = _requirement_name.match(requirement.partition(';')[0])
+    return None if match is None else match.group(1)
+
+
+def marker_applies(marker, version):
+    """
+    Evaluate a requirement marker for a python version, extras are not
+    installed so markers that need one do not apply
+
+    Args:
+        marker: the requirement marker
+        version: python version string for the virtual environment
+    """
+    try:
+        try:
+            from packaging.markers import Marker
+        except ImportError:
+            from pkg_resources.extern.packaging.markers import Marker
+        return Marker(marker).evaluate({'python_version': version, 'extra': ''})
+    except Exception:
+        # If it cannot be evaluated, assume it is needed
+        return True
+
+
+def newest_wheels(wheel_paths):
+    """
+    Select the newest wheel of each distribution, keeping the order given
+
+    Args:
+        wheel_paths: list of paths to the wheels
+    """
+    newest = {}
+    for wheel_path in wheel_paths:
+        name, version = parse_wheel_filename(wheel_path)[:2]
+        current = newest.get(canonical_name(name), None)
+        if current is None or parse_version(version) > parse_version(parse_wheel_filename(current)[1]):
+            newest[canonical_name(name)] = wheel_path
+    selected = set(newest.values())
+    return [u for u in wheel_paths if u in selected]
+
+
+def dependency_levels(wheel_paths, version):
+    """
+    Order wheels by their dependencies on each other: each level only
+    depends on wheels in the levels before it, so the wheels in a level can
+    be installed in parallel
+
+    Args:
+        wheel_paths: list of paths to the wheels (one per distribution)
+        version: python version string for the virtual environment
+
+    Returns a list of levels (lists of wheel paths), wheels in a dependency
+    cycle are put in the last level
+    """
+    if not wheel_paths:
+        return []
+    names = dict((canonical_name(parse_wheel_filename(u)[0]), u) for u in wheel_paths)
+    requires = get_wheel_requires(wheel_paths)
+    dependencies = {}
+    for wheel_path in wheel_paths:
+        dependencies[wheel_path] = set()
+        for requirement in requires[wheel_path]:
+            name = requirement_name(requirement)
+            marker = requirement.partition(';')[2].strip()
+            if name is None or (marker and not marker_applies(marker, version)):
+                continue
+            dependency = names.get(canonical_name(name), None)
+            if dependency is not None and dependency != wheel_path:
+                dependencies[wheel_path].add(dependency)
+    levels = []
+    remaining = list(wheel_paths)
+    done = set()
+    while remaining:
+        level = [u for u in remaining if dependencies[u] <= done]
+        if not level:
+            level = remaining
+        levels.append(level)
+        done.update(level)
+        remaining = [u for u in remaining if u not in done]
+    return levels
+
+
+def _windows_launcher(site_packages, gui):
+    """Find the simple launcher executable bundled in pip's vendored distlib"""
+    launcher = '{}{}.exe'.format('w' if gui else 't', struct.calcsize('P')*8)
+    candidates = [os.path.join(site_packages, 'pip', '_vendor', 'distlib', launcher)]
+    try:
+        import pip
+        candidates.append(os.path.join(os.path.dirname(pip.__file__), '_vendor', 'distlib', launcher))
+    except ImportError:
+        pass
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            with open(candidate, 'rb') as f:
+                return f.read()
+    raise UnsupportedWheel('No script launcher available to create {}'.format(launcher))
+
+
+def write_script(scripts_dir, python, name, entry_point, gui, site_packages):
+    """
+    Write a launcher for a console or gui script entry point
+
+    Args:
+        scripts_dir: the virtual environment scripts directory
+        python: path to the virtual environment python
+        name: script name
+        entry_point: entry point (module:function [extras])
+        gui: True if this is a gui script
+        site_packages: the virtual environment site-packages directory
+
+    Returns a list of (path, data) for the files written
+    """
+    module, _, function = entry_point.split('[')[0].strip().partition(':')
+    if not function:
+        raise UnsupportedWheel('Unsupported entry point {} = {}'.format(name, entry_point))
+    script = SCRIPT_TEMPLATE.format(module=module.strip(), import_name=function.strip().split('.')[0],
+                                    function=function.strip())
+    if is_windows:
+        # An exe launcher followed by the shebang and a zip with the script as __main__.py
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as launcher_zip:
+            launcher_zip.writestr('__main__.py', script)
+        if gui:
+            python = os.path.join(os.path.dirname(python), 'pythonw.exe')
+        data = _windows_launcher(site_packages, gui) + '#!"{}"\r\n'.format(python).encode('utf-8') + archive.getvalue()
+        path = os.path.join(scripts_dir, '{}.exe'.format(name))
+    else:
+        data = '#!{}\n{}'.format(python, script).encode('utf-8')
+        path = os.path.join(scripts_dir, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.chmod(path, 0o755)
+    return [(path, data)]
+
+
+def _makedirs(path):
+    """Create a directory (and parents) if it does not exist, allowing for concurrent installs"""
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+
+
+def install_wheel(wheel_path, version_virtualenv_dir, version):
+    """
+    Install a wheel into a virtual environment by unpacking it
+
+    Args:
+        wheel_path: path to the wheel
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Raises UnsupportedWheel if the wheel cannot be installed by unpacking
+    """
+    name = parse_wheel_filename(wheel_path)[0]
+    store_dir = get_store_dir()
+    site_packages = get_site_packages(version_virtualenv_dir, version)
+    scripts_dir = os.path.join(version_virtualenv_dir, SCRIPT_DIR)
+    python = os.path.abspath(os.path.join(scripts_dir, PYTHON))
+    schemes = {'purelib': site_packages,
+               'platlib': site_packages,
+               'scripts': scripts_dir,
+               'data': version_virtualenv_dir,
+               'headers': os.path.join(version_virtualenv_dir, 'include', 'site', 'python{}'.format(version), name)}
+    records = []
+    with zipfile.ZipFile(wheel_path) as wheel:
+        names = wheel.namelist()
+        dist_info = _find_dist_info(names)
+        data_dir = dist_info[:-len('.dist-info')] + '.data'
+        # Check every member before writing any, so an unsupported wheel leaves nothing behind for pip
+        members = []
+        for info in wheel.infolist():
+            filename = info.filename
+            if filename.endswith('/') or filename in ('{}/RECORD'.format(dist_info), '{}/INSTALLER'.format(dist_info)):
+                continue
+            parts = filename.split('/')
+            if filename.startswith('/') or '..' in parts:
+                raise UnsupportedWheel('Unsafe path {} in {}'.format(filename, wheel_path))
+            if parts[0] == data_dir:
+                if len(parts) < 3 or parts[1] not in schemes:
+                    raise UnsupportedWheel('Unsupported data path {} in {}'.format(filename, wheel_path))
+                members.append((info, os.path.join(schemes[parts[1]], *parts[2:]), parts[1] == 'scripts'))
+            else:
+                members.append((info, os.path.join(site_packages, *parts), False))
+        for info, target, is_script in members:
+            data = wheel.read(info)
+            if is_script and data.startswith(b'#!python'):
+                data = '#!{}'.format(python).encode('utf-8') + data[len(b'#!python'):]
+            _makedirs(os.path.dirname(target))
+            executable = is_script or bool((info.external_attr >> 16) & 0o111)
+            if store_dir is not None and not is_script:
+                link_data(store_dir, data, target, executable)
+            else:
+                # Replace rather than overwrite, the file may be a hardlink into the store
+                if os.path.lexists(target):
+                    os.remove(target)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                if executable:
+                    os.chmod(target, 0o755)
+            records.append((target, data))
+        for script_name, entry_point, gui in read_entry_points(wheel, dist_info):
+            _makedirs(scripts_dir)
+            records += write_script(scripts_dir, python, script_name, entry_point, gui, site_packages)
+    installer_path = os.path.join(site_packages, dist_info, 'INSTALLER')
+    if os.path.lexists(installer_path):
+        os.remove(installer_path)
+    with open(installer_path, 'wb') as f:
+        f.write('{}\n'.format(INSTALLER).encode('utf-8'))
+    records.append((installer_path, '{}\n'.format(INSTALLER).encode('utf-8')))
+    write_record(os.path.join(site_packages, dist_info, 'RECORD'), records, site_packages)
+    return os.path.join(site_packages, dist_info)
+
+
+def write_record(record_path, records, site_packages):
+    """
+    Write the RECORD file for an installed distribution
+
+    Args:
+        record_path: path to the RECORD file
+        records: list of (path, data) of the installed files
+        site_packages: the virtual environment site-packages directory
+    """
+    if os.path.lexists(record_path):
+        os.remove(record_path)
+    if sys.version_info.major == 2:
+        f = open(record_path, 'wb')
+    else:
+        f = open(record_path, 'w', newline='')
+    with f:
+        writer = csv.writer(f)
+        for path, data in records:
+            writer.writerow([os.path.relpath(path, site_packages).replace(os.sep, '/'), record_hash(data), len(data)])
+        writer.writerow([os.path.relpath(record_path, site_packages).replace(os.sep, '/'), '', ''])
+
+
+def uninstall_distribution(name, version_virtualenv_dir, version):
+    """
+    Remove an installed distribution using the files listed in its RECORD
+    (e.g. before unpacking a newer version), removing the directories left
+    empty
+
+    Args:
+        name: distribution name
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Returns False if the distribution is not installed from a .dist-info with
+    a RECORD (e.g. an .egg-info), these need uninstalling with pip
+    """
+    site_packages = get_site_packages(version_virtualenv_dir, version)
+    try:
+        entries = os.listdir(site_packages)
+    except OSError:
+        return False
+    dist_infos = [os.path.join(site_packages, u) for u in entries
+                  if u.endswith('.dist-info') and canonical_name(u.split('-')[0]) == canonical_name(name)]
+    if not dist_infos or not all(os.path.isfile(os.path.join(u, 'RECORD')) for u in dist_infos):
+        return False
+    root = os.path.abspath(version_virtualenv_dir) + os.sep
+    for dist_info in dist_infos:
+        if sys.version_info.major == 2:
+            f = open(os.path.join(dist_info, 'RECORD'), 'rb')
+        else:
+            f = open(os.path.join(dist_info, 'RECORD'), newline='')
+        with f:
+            paths = [os.path.abspath(os.path.join(site_packages, row[0])) for row in csv.reader(f) if row]
+        directories = set()
+        for path in paths:
+            # Only remove files inside the environment
+            if path.startswith(root) and os.path.lexists(path) and not os.path.isdir(path):
+                os.remove(path)
+                directories.add(os.path.dirname(path))
+                if path.endswith('.py'):
+                    # Bytecode compiled after installing (e.g. by precompile)
+                    stem = os.path.splitext(os.path.basename(path))[0]
+                    for pyc in glob.glob(os.path.join(os.path.dirname(path), '__pycache__', stem + '.*.pyc')) + [path + 'c']:
+                        if os.path.exists(pyc):
+                            os.remove(pyc)
+                            directories.add(os.path.dirname(pyc))
+        for directory in sorted(directories, key=len, reverse=True):
+            while directory.startswith(root) and directory != site_packages:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        if os.path.isdir(dist_info):
+            shutil.rmtree(dist_info)
+    return True
+
+
+def install_wheels(wheel_paths, version_virtualenv_dir, version, workers=None):
+    """
+    Install several wheels into a virtual environment concurrently using a
+    thread pool
+
+    Args:
+        wheel_paths: list of paths to the wheels
+        version_virtualenv_dir: Directory of the virtual environment directory
+        version: python version string for the virtual environment
+
+    Keyword Args:
+        workers: number of threads to use (defaults to the CPU count)
+
+    Returns the list of wheels that could not be installed by unpacking (in
+    the order given), these need installing with pip
+    """
+    if not wheel_paths:
+        return []
+
+    def install(wheel_path):
+        try:
+            install_wheel(wheel_path, version_virtualenv_dir, version)
+        except (UnsupportedWheel, zipfile.BadZipfile) as e:
+            print('Unable to unpack {}, falling back to pip: {}'.format(os.path.split(wheel_path)[-1], e))
+            return False
+        return True
+    pool = ThreadPool(min(workers or multiprocessing.cpu_count(), len(wheel_paths)))
+    try:
+        installed = pool.map(install, wheel_paths)
+    finally:
+        pool.close()
+        pool.join()
+    return [wheel_path for wheel_path, ok in zip(wheel_paths, installed) if not ok]